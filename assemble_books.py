@@ -0,0 +1,89 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = ["pypdf>=5"]
+# ///
+"""Assemble the books from their section PDFs (replaces pdftk).
+
+    ./assemble_books.py books.json
+
+books.json lists each book's sections in order, a section being a cover
+and the content that follows it:
+
+    {"book.pdf": [{"title": "Outer Dibblestan", "files": ["a_cover.pdf", "US.pdf"]},
+                  {"title": "Uncle J", "files": ["a_unclej.pdf", "J.pdf"]}, ...],
+     "book-2013-2019.pdf": [...]}
+
+Every section PDF is read once, however many books use it, and all the books
+are written in the same run. Objects that are identical across sections
+(fonts, images, color profiles, ...) are stored once per book. Each book gets
+an outline with an entry per section and, under it, one per year, pointing at
+the first post of that year (found through the day bookmarks WeasyPrint
+writes for each post heading).
+"""
+
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+YEAR = re.compile(r"^(\d{4})-\d{2}-\d{2}\b")
+
+
+def year_pages(reader):
+    """{year: index of its first page} from the document's top-level bookmarks"""
+    years = {}
+    for item in reader.outline:
+        if isinstance(item, list):  # children of the previous item
+            continue
+        m = YEAR.match(item.title or "")
+        page = reader.get_destination_page_number(item)
+        if m and page is not None and page >= 0:
+            years.setdefault(m.group(1), page)
+    return years
+
+
+def assemble(out, sections, readers, years):
+    writer = PdfWriter()
+    for section in sections:
+        start = len(writer.pages)
+        section_years = {}
+        for name in section["files"]:
+            offset = len(writer.pages)
+            writer.append(readers[name], import_outline=False)
+            for year, page in years[name].items():
+                section_years.setdefault(year, offset + page)
+        parent = writer.add_outline_item(section["title"], start)
+        for year, page in sorted(section_years.items()):
+            writer.add_outline_item(year, page, parent=parent, is_open=False)
+    writer.compress_identical_objects()
+    writer.page_mode = "/UseOutlines"
+    with open(out, "wb") as f:
+        writer.write(f)
+    return len(writer.pages)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: assemble_books.py <books.json>")
+        sys.exit(1)
+    books = json.loads(Path(sys.argv[1]).read_text(encoding="utf-8"))
+
+    readers, years = {}, {}
+    for sections in books.values():
+        for section in sections:
+            for name in section["files"]:
+                if name not in readers:
+                    readers[name] = PdfReader(name)
+                    years[name] = year_pages(readers[name])
+
+    for out, sections in books.items():
+        start = time.perf_counter()
+        pages = assemble(out, sections, readers, years)
+        print(f"Assembled {out}: {pages} pages in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
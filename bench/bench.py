@@ -0,0 +1,375 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#     "brotli>=1.1.0",
+#     "flask>=3.0.0",
+#     "markdown>=3.5.1",
+#     "textual>=0.50",
+#     "tqdm>=4.66.0",
+# ]
+# ///
+"""
+End-to-end benchmarks for the zoolog tools, on a synthetic corpus.
+
+    ./bench.py                              # 1k posts, every suite
+    ./bench.py --scale 100k --only index,search
+    ./bench.py --corpus ../posts            # the real corpus instead
+    ./bench.py --compare results/old.json   # and show what moved
+
+Suites:
+
+  index   web/app.py and tui.py index_posts(): the first run in the process
+          (cold) and the median of the reruns (warm). The OS page cache is
+          not dropped, so "cold" means cold Python/SQLite state, not cold disk.
+  search  query latency percentiles for a fixed set of queries (words,
+          rare words, phrases, prefixes, OR, exclusions, filters, and the
+          substring and fuzzy modes) through tui.query_posts() and
+          /api/posts?search= (date and relevance order)
+  api     latency percentiles for the web API endpoints, bodies read in full
+  pwa     pwa/build_data.py into a scratch data dir: from empty (cold) and
+          again over its own output (warm), plus the bundle file sizes
+  pdf     make_omnibus in a scratch copy of the repo; skipped unless pandoc
+          and uv are installed
+
+Generated corpora are kept under corpus/<scale>/ and reused. Results are
+written to results/<timestamp>-<commit>.json: a flat {metric: value} map
+(times in milliseconds, sizes in KB) plus the commit, machine and corpus they
+were measured on, so runs from different commits can be compared with
+--compare, which exits non-zero when a timing regressed past --threshold.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+RESULTS_DIR = BENCH_DIR / "results"
+
+sys.path.insert(0, str(BENCH_DIR))
+from generate_corpus import SCALES, generate
+
+SUITES = ("index", "search", "api", "pwa", "pdf")
+
+# Chosen from generate_corpus.py's vocabulary; on the real corpus they are
+# still ordinary journal words, so the same set works for both.
+QUERIES = {
+    "word": "park",
+    "rare": "kaleidoscope",
+    "phrase": '"the beach"',
+    "prefix": "dino*",
+    "or": "snowman OR pumpkins",
+    "exclude": "school -soccer",
+    "category": "category:J beach",
+    "date": "date:2019..2021 birthday",
+}
+# (mode, query) for the substring (trigram) and fuzzy (vocabulary) search modes
+MODE_QUERIES = {
+    "substring": ("substring", "inosau"),
+    "substring_short": ("substring", "zz"),
+    "fuzzy": ("fuzzy", "pumkins"),
+    "fuzzy_long": ("fuzzy", "kaleidoscpoe"),
+}
+
+PDF_TOOLS = ("pandoc", "uv")
+PDF_FILES = ("make_omnibus", "build_books.py", "build_trace.py", "assemble_books.py",
+             "generate_cover.py", "generate_content_pdf.py", "dow.py", "pandoc.css", "pwa/build_data.py")
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the tools' progress bars and summaries"""
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        yield
+
+
+def timed(fn, *args):
+    """Milliseconds taken by fn(*args)"""
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def summarize(prefix, samples, results):
+    """Record p50/p90/p99 and mean of samples (ms) under prefix"""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    results[f"{prefix}.p50_ms"] = round(cuts[49], 3)
+    results[f"{prefix}.p90_ms"] = round(cuts[89], 3)
+    results[f"{prefix}.p99_ms"] = round(cuts[98], 3)
+    results[f"{prefix}.mean_ms"] = round(statistics.fmean(samples), 3)
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return git("rev-parse", "--short", "HEAD") or None, bool(git("status", "--porcelain", "--untracked-files=no"))
+    except OSError:
+        return None, False
+
+
+def ensure_corpus(name, posts):
+    """corpus/<name>, generated unless it already holds the same corpus"""
+    out_dir = CORPUS_DIR / name
+    manifest_path = out_dir / "corpus.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("posts") == posts:
+            return out_dir, manifest
+        for path in out_dir.glob("*.txt"):
+            path.unlink()
+    print(f"Generating {posts} posts into {out_dir}...", file=sys.stderr)
+    return out_dir, generate(out_dir, posts)
+
+
+class Bench:
+    def __init__(self, corpus, repeat):
+        self.corpus = corpus
+        self.repeat = repeat
+        self.results = {}
+        self.skipped = {}
+        self._web = self._tui = None
+
+    @property
+    def web(self):
+        if self._web is None:
+            self._web = load_module("zoolog_web", ROOT / "web" / "app.py")
+            self._web.POSTS_DIR = self.corpus
+        return self._web
+
+    @property
+    def tui(self):
+        if self._tui is None:
+            self._tui = load_module("zoolog_tui", ROOT / "tui.py")
+            self._tui.POSTS_DIR = self.corpus
+        return self._tui
+
+    def warm_ms(self, fn):
+        runs = max(3, self.repeat // 10)
+        return round(statistics.median([timed(fn) for _ in range(runs)]), 3)
+
+    def bench_index(self):
+        for name, module in (("web", self.web), ("tui", self.tui)):
+            with quiet():
+                self.results[f"index.{name}.cold_ms"] = round(timed(module.index_posts), 3)
+                self.results[f"index.{name}.warm_ms"] = self.warm_ms(module.index_posts)
+
+    def bench_search(self):
+        with quiet():
+            self.web.index_posts()
+            self.tui.index_posts()
+        client = self.web.app.test_client()
+        for name, query in QUERIES.items():
+            samples = [timed(self.tui.query_posts, query) for _ in range(self.repeat)]
+            summarize(f"search.tui.{name}", samples, self.results)
+            for sort in ("date", "relevance"):
+                url = "/api/posts?" + urlencode({"search": query, "sort": sort, "limit": 50})
+                samples = [timed(self.get, client, url) for _ in range(self.repeat)]
+                summarize(f"search.api.{sort}.{name}", samples, self.results)
+            _, total = self.tui.query_posts(query, limit=1)
+            self.results[f"search.hits.{name}"] = total
+        for name, (mode, query) in MODE_QUERIES.items():
+            samples = [timed(lambda: self.tui.query_posts(query, mode=mode)) for _ in range(self.repeat)]
+            summarize(f"search.tui.{name}", samples, self.results)
+            url = "/api/posts?" + urlencode({"search": query, "mode": mode, "limit": 50})
+            samples = [timed(self.get, client, url) for _ in range(self.repeat)]
+            summarize(f"search.api.date.{name}", samples, self.results)
+            _, total = self.tui.query_posts(query, limit=1, mode=mode)
+            self.results[f"search.hits.{name}"] = total
+
+    def bench_api(self):
+        with quiet():
+            self.web.index_posts()
+        client = self.web.app.test_client()
+        total = client.get("/api/stats").get_json()["total_posts"]
+        middle = total // 2
+        # Ids keep growing across reindexes, so look one up
+        post_id = client.get(f"/api/posts?offset={middle}&limit=1&fields=id").get_json()["posts"][0]["id"]
+        endpoints = {
+            "posts": "/api/posts",
+            "posts_offset": f"/api/posts?offset={middle}",
+            "posts_all_fields": "/api/posts?fields=id,filename,date,category,title,excerpt,content",
+            "posts_brotli": ("/api/posts", {"Accept-Encoding": "br"}),
+            "post": f"/api/post/{post_id}",
+            "post_search_context": f"/api/post/{post_id}?search=park",
+            "timeline": "/api/timeline",
+            "stats": "/api/stats",
+            "on_this_day": "/api/on-this-day?date=07-04&range=week",
+            "suggestions": "/api/search/suggestions?q=pa",
+            "suggestions_trigram": "/api/search/suggestions?q=par",
+            "suggestions_typo": "/api/search/suggestions?q=pumkins",
+        }
+        for name, target in endpoints.items():
+            url, headers = target if isinstance(target, tuple) else (target, {})
+            samples = [timed(self.get, client, url, headers) for _ in range(self.repeat)]
+            summarize(f"api.{name}", samples, self.results)
+
+    @staticmethod
+    def get(client, url, headers=None):
+        response = client.get(url, headers=headers or {})
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    def bench_pwa(self):
+        build = load_module("zoolog_pwa_build", ROOT / "pwa" / "build_data.py")
+        build.POSTS_DIR = self.corpus
+        with tempfile.TemporaryDirectory() as tmp:
+            build.DATA_DIR = Path(tmp) / "data"
+            with quiet():
+                self.results["pwa.cold_ms"] = round(timed(build.main), 3)
+                self.results["pwa.warm_ms"] = self.warm_ms(build.main)
+            for name in ("list", "index", "positions"):
+                size = (build.DATA_DIR / f"{name}.json").stat().st_size
+                self.results[f"pwa.{name}_kb"] = round(size / 1024, 1)
+            years = sum(p.stat().st_size for p in (build.DATA_DIR / "years").glob("*.json"))
+            self.results["pwa.years_kb"] = round(years / 1024, 1)
+
+    def bench_pdf(self):
+        missing = [tool for tool in PDF_TOOLS if shutil.which(tool) is None]
+        if missing:
+            self.skipped["pdf"] = f"missing tools: {', '.join(missing)}"
+            return
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp)
+            for name in PDF_FILES:
+                (work / name).parent.mkdir(exist_ok=True)
+                shutil.copy2(ROOT / name, work / name)
+            (work / "posts").symlink_to(self.corpus.resolve())
+            start = time.perf_counter()
+            subprocess.run(["./make_omnibus"], cwd=work, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.results["pdf.omnibus_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            self.results["pdf.book_kb"] = round((work / "book.pdf").stat().st_size / 1024, 1)
+
+
+def compare(base_path, results, threshold):
+    """Print timings that moved between base_path and results; returns the regressions"""
+    base = json.loads(Path(base_path).read_text(encoding="utf-8"))
+    print(f"\nCompared with {base_path} ({base['meta'].get('commit')}):")
+    regressions = []
+    for metric, new in results.items():
+        old = base["results"].get(metric)
+        if not metric.endswith("_ms") or not old:
+            continue
+        change = (new - old) / old * 100
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(metric)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"  {metric:<40} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the zoolog tools on a synthetic corpus.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--scale", default="1k",
+                        help=f"posts to generate: one of {', '.join(SCALES)} or a number (default: 1k)")
+    source.add_argument("--corpus", type=Path, help="benchmark an existing posts directory instead")
+    parser.add_argument("--only", default=",".join(SUITES),
+                        help=f"comma-separated suites to run (default: {','.join(SUITES)})")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="samples per search/API measurement (default: 50)")
+    parser.add_argument("--output", type=Path, help="results file (default: results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown --compare reports as a regression (default: 10)")
+    args = parser.parse_args()
+
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = sorted(set(suites) - set(SUITES))
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+    if args.repeat < 2:
+        parser.error("--repeat must be at least 2")
+
+    if args.corpus:
+        if not args.corpus.is_dir():
+            parser.error(f"corpus not found: {args.corpus}")
+        corpus = args.corpus.resolve()
+        manifest_path = corpus / "corpus.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    else:
+        posts = SCALES.get(args.scale.lower())
+        if posts is None:
+            try:
+                posts = int(args.scale)
+            except ValueError:
+                parser.error(f"invalid scale '{args.scale}'")
+        corpus, manifest = ensure_corpus(args.scale.lower(), posts)
+
+    files = list(corpus.glob("*.txt"))
+    commit, dirty = git_commit()
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "corpus": {
+            "path": str(corpus),
+            "posts": len(files),
+            "bytes": sum(f.stat().st_size for f in files),
+            "seed": manifest.get("seed"),
+        },
+    }
+
+    bench = Bench(corpus, args.repeat)
+    for suite in SUITES:
+        if suite in suites:
+            print(f"Running {suite}...", file=sys.stderr)
+            getattr(bench, f"bench_{suite}")()
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{commit or 'nogit'}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "results": bench.results, "skipped": bench.skipped},
+                                 indent=2) + "\n", encoding="utf-8")
+
+    for metric, value in bench.results.items():
+        print(f"  {metric:<40} {value:>10}")
+    for suite, reason in bench.skipped.items():
+        print(f"  {suite}: skipped ({reason})")
+    print(f"Wrote {output}")
+
+    if args.compare:
+        regressions = compare(args.compare, bench.results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} timing(s) more than {args.threshold:g}% slower")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
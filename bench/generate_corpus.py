@@ -0,0 +1,198 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""
+Generate a synthetic, deterministic zoolog corpus for benchmarks.
+
+    ./generate_corpus.py corpus/10k --posts 10k
+    ./generate_corpus.py corpus/100k --posts 100k --seed 7
+
+Writes quoted-printable posts in the same shape as posts/: a "# YYYY-MM-DD X"
+header line and a hard-wrapped markdown body (paragraphs, the odd list, bold
+text, links, dialogue, accented words and emoji), named with every filename
+convention the tools parse:
+
+    YYYY-MM-DD-A-YYYY-MM-DD.txt      A     2013 on (second date: when it was sent)
+    YYYY-MM-DD-D-YYYY-MM-DD.txt      D     2013 on
+    YYYY-MM-DD-J-YYYY-MM-DD.txt      J     2020 on (Uncle J)
+    YYYY-MM-DD-G-YYYY-MM-DD.txt      G     2020 on (Grandpa)
+    YYYY-MM-DD-AHNS-YYYY-MM-DD.txt   AHNS  school days, Sep 2013 - Jun 2019
+
+The same seed and post count always produce byte-identical files. A
+corpus.json manifest (seed, counts, size) is written next to the posts.
+"""
+import argparse
+import json
+import quopri
+import random
+import sys
+import textwrap
+from datetime import date, timedelta
+from pathlib import Path
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+# (category, weight, first day, last day or None for --end-year)
+CATEGORIES = (
+    ("A", 42, date(2013, 1, 1), None),
+    ("D", 25, date(2013, 1, 1), None),
+    ("J", 15, date(2020, 1, 1), None),
+    ("G", 8, date(2020, 1, 1), None),
+    ("AHNS", 10, date(2013, 9, 1), date(2019, 6, 30)),
+)
+# AHNS header letter is a child's initial, not the category
+AHNS_INITIALS = ("S", "E", "T")
+
+WRAP = 74
+
+NAMES = ("Ellie", "Theo", "Nora", "Sam", "Mommy", "Daddy", "Grandpa", "Grandma",
+         "Uncle J", "the kids", "Biscuit", "Mrs. Patel", "Zoë", "José")
+DID = ("went to", "played at", "visited", "spent the morning at", "ran around",
+       "had a picnic at", "got lost at", "walked to", "biked to", "splashed at")
+PLACES = ("the beach", "the park", "school", "Grandma's house", "the museum",
+          "the pool", "the farmers market", "the library", "the zoo", "the lake",
+          "the playground", "the café", "soccer practice", "the orchard")
+MADE = ("built", "drew", "baked", "painted", "found", "lost", "read", "made",
+        "carved", "glued together", "planted", "traded")
+THINGS = ("a sandcastle", "pancakes", "a dinosaur book", "a snowman", "a lego tower",
+          "pumpkins", "a birthday cake", "a paper crown", "a bird feeder",
+          "a piñata", "crème brûlée", "a kite", "a fort out of couch cushions",
+          "a map of the neighborhood", "a volcano", "a pinecone owl")
+WHEN = ("This morning", "After school", "On Saturday", "Tonight", "At breakfast",
+        "Later", "Before bed", "At lunch", "After the rain", "On the way home")
+WHY = ("because it was raining", "while Daddy made coffee", "even though it was cold",
+       "until it got dark", "with the neighbors", "for almost an hour",
+       "without a single complaint", "after a long nap", "in their pajamas")
+SAYINGS = ("I want to be a paleontologist", "Can we do it again tomorrow?",
+           "That’s not a dinosaur, that’s a chicken", "I'm the fastest in the class",
+           "Why is the moon following us?", "My tummy says it's lunchtime",
+           "I didn't do it, Biscuit did", "When I grow up I'll have a zoo")
+EMOJI = ("🎉", "🦕", "🎃", "☀️", "❄️", "🍰", "🐶")
+RARE = ("paleontologist", "quesadilla", "xylophone", "kaleidoscope", "hullabaloo",
+        "stegosaurus", "marshmallow", "thunderstorm", "accordion", "periwinkle")
+
+
+def scale(value):
+    """argparse type: an integer or a scale name like 10k"""
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or one of {', '.join(SCALES)}")
+    if n < 1:
+        raise argparse.ArgumentTypeError("post count must be positive")
+    return n
+
+
+def sentence(rng):
+    kind = rng.random()
+    if kind < 0.35:
+        s = f"{rng.choice(WHEN)}, {rng.choice(NAMES)} {rng.choice(DID)} {rng.choice(PLACES)} {rng.choice(WHY)}."
+    elif kind < 0.65:
+        s = f"{rng.choice(NAMES)} {rng.choice(MADE)} {rng.choice(THINGS)} at {rng.choice(PLACES)}."
+    elif kind < 0.8:
+        s = f"“{rng.choice(SAYINGS)},” said {rng.choice(NAMES)}."
+    elif kind < 0.9:
+        s = f"We talked about {rng.choice(RARE)}s and {rng.choice(THINGS)} {rng.choice(WHY)}."
+    else:
+        s = f"{rng.choice(NAMES)} and {rng.choice(NAMES)} {rng.choice(MADE)} {rng.choice(THINGS)}."
+    s = s[0].upper() + s[1:]
+    if rng.random() < 0.08:
+        s = s.replace(rng.choice(PLACES), f"**{rng.choice(PLACES)}**", 1)
+    if rng.random() < 0.05:
+        s += " " + rng.choice(EMOJI)
+    return s
+
+
+def body(rng):
+    """A markdown body of a few hard-wrapped paragraphs"""
+    blocks = []
+    for _ in range(rng.choices((1, 2, 3, 4, 6), weights=(20, 35, 25, 15, 5))[0]):
+        roll = rng.random()
+        if roll < 0.08:
+            items = [f"- {rng.choice(THINGS)}" for _ in range(rng.randint(2, 5))]
+            blocks.append("\n".join(items))
+        elif roll < 0.12:
+            slug = rng.choice(PLACES).replace(" ", "-").replace("'", "")
+            blocks.append(f"More photos from [{rng.choice(PLACES)}](https://example.com/photos/{slug}).")
+        else:
+            text = " ".join(sentence(rng) for _ in range(rng.randint(1, 6)))
+            blocks.append(textwrap.fill(text, WRAP, break_long_words=False, break_on_hyphens=False))
+    return "\n\n".join(blocks)
+
+
+def school_day(day):
+    return day.weekday() < 5 and day.month not in (7, 8)
+
+
+def pick_date(rng, first, last, category):
+    span = (last - first).days
+    while True:
+        day = first + timedelta(days=rng.randint(0, span))
+        if category != "AHNS" or school_day(day):
+            return day
+
+
+def generate(out_dir, posts, seed=1, end_year=2025):
+    """Write `posts` synthetic posts into out_dir; returns the manifest dict"""
+    rng = random.Random(seed)
+    end = date(end_year, 12, 31)
+    cats = [c for c in CATEGORIES if c[2] <= end]
+    weights = [c[1] for c in cats]
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    names = set()
+    counts = {}
+    size = 0
+    for _ in range(posts):
+        category, _, first, last = rng.choices(cats, weights=weights)[0]
+        day = pick_date(rng, first, min(last or end, end), category)
+        sent = day + timedelta(days=rng.randint(0, 30) if category in ("A", "D") else 0)
+        name = f"{day}-{category}-{sent}.txt"
+        while name in names:
+            # Several posts on one day: they differ in the second date
+            sent += timedelta(days=1)
+            name = f"{day}-{category}-{sent}.txt"
+        names.add(name)
+
+        letter = rng.choice(AHNS_INITIALS) if category == "AHNS" else category
+        text = f"# {day} {letter}\n\n{body(rng)}\n"
+        raw = quopri.encodestring(text.encode("utf-8"))
+        (out_dir / name).write_bytes(raw)
+        counts[category] = counts.get(category, 0) + 1
+        size += len(raw)
+
+    manifest = {"seed": seed, "posts": posts, "end_year": end_year,
+                "categories": dict(sorted(counts.items())), "bytes": size}
+    (out_dir / "corpus.json").write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic zoolog corpus.")
+    parser.add_argument("out_dir", type=Path, help="directory to write posts into")
+    parser.add_argument("--posts", type=scale, default=SCALES["1k"],
+                        help=f"number of posts, or one of {', '.join(SCALES)} (default: 1k)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--end-year", type=int, default=2025,
+                        help="last year of posts (default: 2025; fixed so output is reproducible)")
+    parser.add_argument("--force", action="store_true", help="replace posts already in out_dir")
+    args = parser.parse_args()
+
+    existing = list(args.out_dir.glob("*.txt")) if args.out_dir.exists() else []
+    if existing and not args.force:
+        parser.error(f"{args.out_dir} already has {len(existing)} posts; use --force to replace them")
+    for path in existing:
+        path.unlink()
+
+    manifest = generate(args.out_dir, args.posts, args.seed, args.end_year)
+    print(f"Wrote {manifest['posts']} posts ({manifest['bytes'] / (1024 * 1024):.1f} MB) to {args.out_dir}")
+    print(f"Categories: {manifest['categories']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
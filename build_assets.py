@@ -0,0 +1,165 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = ["brotli", "rcssmin", "rjsmin"]
+# ///
+"""Fingerprint, minify and precompress the web and PWA front-end assets.
+
+    ./build_assets.py            # both sites
+    ./build_assets.py pwa        # just pwa/dist
+
+For each site the scripts and stylesheets are minified and renamed after a
+hash of their content (app.js -> app.1a2b3c4d5e.js), references to them in
+the other files (index.html, sw.js's shell list, app.js's worker) are
+rewritten to match, and every text file is written with .gz and .br
+siblings. A name that changes whenever its content does can be cached
+forever, so static_server.py (the PWA) and the web app's /assets/ route send
+them as immutable and pick the precompressed variant the browser accepts.
+
+    web/static -> web/assets    app.js, style.css; templates use asset_url()
+    pwa        -> pwa/dist      the app shell; data/ is linked, not copied
+
+assets.json in each output maps the source names to the fingerprinted ones.
+sw.js, index.html and the manifest keep their names (browsers look them up
+by name), and the service worker's cache VERSION gets the build's hash
+appended so a new build replaces the cached shell.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import brotli
+import rcssmin
+import rjsmin
+
+ROOT = Path(__file__).resolve().parent
+SITES = {
+    "web": {"src": ROOT / "web" / "static", "out": ROOT / "web" / "assets",
+            "files": ["app.js", "style.css"], "stable": [], "link": []},
+    "pwa": {"src": ROOT / "pwa", "out": ROOT / "pwa" / "dist",
+            "files": ["index.html", "app.js", "search-worker.js", "styles.css", "sw.js",
+                      "manifest.webmanifest", "icons"],
+            "stable": ["index.html", "sw.js", "manifest.webmanifest"], "link": ["data"]},
+}
+FINGERPRINT_LENGTH = 10
+TEXT_SUFFIXES = {".html", ".js", ".css", ".json", ".webmanifest", ".svg"}
+COMPRESS_MIN_SIZE = 1024
+SW_VERSION = re.compile(r"""(const VERSION = ['"])([^'"]+)(['"])""")
+
+
+def minify(name, text):
+    if name.endswith(".js"):
+        return rjsmin.jsmin(text)
+    if name.endswith(".css"):
+        return rcssmin.cssmin(text)
+    return text
+
+
+def reference(name):
+    """Matches name used as a path in HTML, CSS or JS (quoted, in url(), after a /)"""
+    return re.compile(r"(?<=[\"'(/])" + re.escape(name) + r"(?=[\"')?#])")
+
+
+def rewrite(text, mapping):
+    for name, hashed in mapping.items():
+        text = reference(name).sub(hashed, text)
+    return text
+
+
+def fingerprinted(name, data):
+    stem, _, suffix = name.rpartition(".")
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}.{suffix}"
+
+
+def precompress(path):
+    """Write path.gz and path.br when they are smaller than path"""
+    data = path.read_bytes()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return
+    for suffix, packed in ((".gz", gzip.compress(data, compresslevel=9, mtime=0)),
+                           (".br", brotli.compress(data, quality=11))):
+        if len(packed) < len(data):
+            path.with_name(path.name + suffix).write_bytes(packed)
+
+
+def build_site(name, site):
+    src, out = site["src"], site["out"]
+    present = [f for f in site["files"] if (src / f).exists()]
+    texts = {f: (src / f).read_text(encoding="utf-8") for f in present
+             if (src / f).is_file() and Path(f).suffix in TEXT_SUFFIXES}
+    assets = [f for f in texts if f not in site["stable"]]
+
+    # Fingerprint the assets, each after the ones it refers to (app.js names
+    # search-worker.js, so the worker's hash must be known first)
+    mapping, outputs = {}, {}
+    pending = set(assets)
+    while pending:
+        ready = [f for f in sorted(pending)
+                 if not any(o != f and o in pending and reference(o).search(texts[f]) for o in assets)]
+        if not ready:
+            sys.exit(f"build_assets.py: {name}: circular references between {', '.join(sorted(pending))}")
+        for f in ready:
+            data = minify(f, rewrite(texts[f], mapping)).encode("utf-8")
+            mapping[f] = fingerprinted(f, data)
+            outputs[mapping[f]] = data
+            pending.discard(f)
+
+    build_hash = hashlib.sha256(json.dumps(mapping, sort_keys=True).encode()).hexdigest()[:8]
+    for f in site["stable"]:
+        if f not in texts:
+            continue
+        text = rewrite(texts[f], mapping)
+        if f == "sw.js":
+            text = SW_VERSION.sub(lambda m: f"{m.group(1)}{m.group(2)}-{build_hash}{m.group(3)}", text, count=1)
+        outputs[f] = minify(f, text).encode("utf-8")
+
+    # Write into a fresh directory and swap it in, so a server never sees half a build
+    tmp = out.with_name(f".{out.name}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for filename, data in outputs.items():
+        (tmp / filename).write_bytes(data)
+        precompress(tmp / filename)
+    for f in present:
+        if f not in texts:  # icons and other binaries, unchanged
+            if (src / f).is_dir():
+                shutil.copytree(src / f, tmp / f)
+            else:
+                shutil.copy2(src / f, tmp / f)
+    for f in site["link"]:
+        (tmp / f).symlink_to(Path("..") / f)
+    (tmp / "assets.json").write_text(json.dumps(mapping, indent=1) + "\n", encoding="utf-8")
+
+    old = out.with_name(f".{out.name}.old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+
+    before = sum(len(t.encode("utf-8")) for t in texts.values())
+    after = sum(len(d) for d in outputs.values())
+    br = sum((out / f"{f}.br").stat().st_size if (out / f"{f}.br").exists() else len(d)
+             for f, d in outputs.items())
+    print(f"{name}: {len(mapping)} fingerprinted, {before / 1024:.0f} KB -> {after / 1024:.0f} KB minified"
+          f" -> {br / 1024:.0f} KB brotli, in {out.relative_to(ROOT)}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint, minify and precompress front-end assets.")
+    parser.add_argument("sites", nargs="*", metavar="SITE", help="web and/or pwa (default: both)")
+    args = parser.parse_args()
+    unknown = set(args.sites) - SITES.keys()
+    if unknown:
+        parser.error(f"unknown site {', '.join(sorted(unknown))}; choose from {', '.join(SITES)}")
+    for name in args.sites or SITES:
+        build_site(name, SITES[name])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
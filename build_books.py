@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+"""Build the books, the monthly compilations and the PWA bundle.
+
+    ./build_books.py                     # the books and the PWA (what make_omnibus runs)
+    ./build_books.py --only monthly      # just monthly/ (what make_monthlies runs)
+    ./build_books.py -j 2 --memory 3000  # at most 2 jobs and ~3000 MB at once
+    ./build_books.py --dry-run           # show the jobs, estimates and pool size
+
+The build is a graph of jobs (period/category text files, covers, one render
+per text file through pandoc and WeasyPrint, assemble_books.py writing the
+three books in one pass, the PWA bundle, and the monthlies when asked for),
+each depending only on what it reads, so a render starts as soon as its text
+file exists rather than after every cover.
+
+Jobs run on a bounded pool: at most --jobs at once (default: CPU count), and
+only while the memory they are expected to use fits in --memory (default: 80%
+of what is available when the build starts). A job too big for the budget
+still runs, alone. Ready jobs are started longest-first, ranked by their
+expected duration plus the longest chain of jobs waiting on them; durations
+and peak RSS come from earlier builds (.build-history.json), or from rough
+defaults scaled by input size on the first run.
+
+When a job fails the build stops: nothing new is started, running jobs are
+terminated, and the failure is reported with the tail of its log
+(build/logs/, kept on failure). With --keep-going only the jobs depending on
+the failed one are skipped. Every job and every command inside it is recorded
+as a build_trace.py span; the summary is printed at the end and written to
+build-trace.json.
+"""
+import argparse
+import json
+import os
+import queue
+import quopri
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import date
+from pathlib import Path
+
+import build_trace
+import monthly
+
+ROOT = Path(__file__).resolve().parent
+POSTS_DIR = ROOT / "posts"
+BUILD_DIR = ROOT / "build"
+LOG_DIR = BUILD_DIR / "logs"
+MONTHLY_DIR = ROOT / "monthly"
+HISTORY_PATH = ROOT / ".build-history.json"
+TRACE_PATH = ROOT / "build-trace.json"
+
+TARGETS = ("books", "monthly", "pwa")
+# The monthlies are served on demand (monthly.py, /api/monthly); the
+# directory is only written when asked for
+DEFAULT_TARGETS = ("books", "pwa")
+
+# Share of the memory available at start that running jobs may add up to
+MEMORY_HEADROOM = 0.8
+# Weight of the latest build when updating a job's remembered duration and RSS
+HISTORY_WEIGHT = 0.5
+# Margin on remembered peak RSS, which varies a little between builds
+RSS_MARGIN = 1.2
+# Seconds between SIGTERM and SIGKILL when cancelling running jobs
+TERMINATE_GRACE = 5
+LOG_TAIL = 20
+
+# Estimates for jobs with no history: (seconds, MB) plus (seconds, MB) per MB of input
+DEFAULT_COST = {
+    "text": ((0.5, 50), (0, 0)),
+    "cover": ((3, 250), (0, 0)),
+    "render": ((5, 300), (30, 400)),
+    "assemble": ((2, 150), (1, 60)),
+    "monthly": ((1, 50), (0, 0)),
+    "pwa": ((10, 300), (0, 0)),
+    "assets": ((2, 80), (0, 0)),
+}
+
+CATEGORIES = ("AHNS", "J", "G")
+# Filename fragments selecting each category for the period text files
+PERIOD_PATTERNS = {"US": ("-D-", "-A-"), "J": ("J",), "G": ("G",), "AHNS": ("AHNS",)}
+COVERS = {
+    # name: (title, subtitle); {year} is the current year
+    "a_ahns": ("AHNS", "2013 - 2019"),
+    "a_cover": ("Outer Dibblestan", ""),
+    "a_cover-2013-2019": ("Outer Dibblestan", "2013 - 2019"),
+    "a_cover-2020-{year}": ("Outer Dibblestan", "2020 - {year}"),
+    "a_unclej": ("Uncle J", "2020 - {year}"),
+    "a_grandpa": ("Grandpa", "2020 - {year}"),
+}
+# Each cover starts a section of the book (and of its outline)
+BOOKS = {
+    "book-2013-2019.pdf": ("a_cover-2013-2019", "US-2013-2019", "a_ahns", "AHNS"),
+    "book-2020-{year}.pdf": ("a_cover-2020-{year}", "US-2020-{year}", "a_unclej", "J-2020-{year}",
+                             "a_grandpa", "G-2020-{year}"),
+    "book.pdf": ("a_cover", "US", "a_unclej", "J", "a_grandpa", "G", "a_ahns", "AHNS"),
+}
+# Intermediate files kept next to the books
+KEPT = ("AHNS", "J", "G", "US")
+
+
+class Cmd:
+    """A command step; runs in build/ unless cwd is given"""
+
+    def __init__(self, name, argv, stdin=None, stdout=None, cwd=None, inputs=(), outputs=()):
+        self.name = name
+        self.argv = [str(a) for a in argv]
+        self.stdin = stdin
+        self.stdout = stdout
+        self.cwd = cwd or BUILD_DIR
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+class Call:
+    """An in-process step"""
+
+    def __init__(self, name, func, *args):
+        self.name = name
+        self.func = func
+        self.args = args
+
+
+class Job:
+    def __init__(self, name, kind, steps, deps=(), inputs=0, outputs=(), history_key=None):
+        self.name = name
+        self.kind = kind
+        self.steps = steps  # Cmd and Call steps, run in order
+        self.deps = list(deps)
+        self.inputs = inputs  # bytes read, for the estimates
+        self.outputs = outputs
+        self.history_key = history_key or name
+        self.dependents = []
+        self.state = "pending"
+        self.span = None
+        self.log = None
+        self.duration = self.memory = self.rank = 0.0
+
+    @property
+    def slug(self):
+        return re.sub(r"[^\w.-]+", "-", self.name)
+
+
+# --- the jobs --------------------------------------------------------------
+
+def post_names():
+    return sorted(p.name for p in POSTS_DIR.iterdir() if p.is_file() and p.name.endswith(".txt"))
+
+
+def period_posts(names, category, start_year, end_year):
+    selected = []
+    for name in names:
+        if not any(p in name for p in PERIOD_PATTERNS[category]):
+            continue
+        try:
+            year = int(name[:4])
+        except ValueError:
+            continue
+        if start_year <= year <= end_year:
+            selected.append(name)
+    return selected
+
+
+def all_time_posts(names, category):
+    if category == "US":
+        return [n for n in names if not any(c in n for c in CATEGORIES)]
+    return [n for n in names if category in n]
+
+
+def combine_posts(names, out):
+    """Concatenate posts, a blank line before each (awk 'FNR==1{print ""}1')"""
+    with open(BUILD_DIR / out, "wb") as f:
+        for name in names:
+            data = (POSTS_DIR / name).read_bytes()
+            if not data:
+                continue
+            f.write(b"\n" + data)
+            if not data.endswith(b"\n"):
+                f.write(b"\n")
+
+
+def decode(name):
+    path = BUILD_DIR / name
+    path.write_bytes(quopri.decodestring(path.read_bytes()))
+
+
+def tablefy(src, out):
+    """Wrap the day headings into table rows and prepend the stylesheet"""
+    html = (BUILD_DIR / src).read_text(encoding="utf-8")
+    html = re.sub(r"^<h1", "</td></tr><tr><td><h1", html, flags=re.M)
+    html = re.sub(r"/h1>$", "/h1></td><td>", html, flags=re.M)
+    css = (ROOT / "pandoc.css").read_text(encoding="utf-8")
+    (BUILD_DIR / out).write_text(css + html, encoding="utf-8")
+
+
+def build_monthlies():
+    """monthly/YYYY-MM.txt, rewriting only the months that changed"""
+    written, unchanged, removed = monthly.export(MONTHLY_DIR, POSTS_DIR)
+    print(f"monthly/: {written} written, {unchanged} unchanged, {removed} removed")
+
+
+def book_layout(year):
+    """{book: [{"title": cover title, "files": [cover, content...]}, ...]} for assemble_books.py"""
+    layout = {}
+    for book, parts in BOOKS.items():
+        sections = []
+        for part in parts:
+            if part in COVERS:
+                sections.append({"title": COVERS[part][0], "files": []})
+            sections[-1]["files"].append(f"{part.format(year=year)}.pdf")
+        layout[book.format(year=year)] = sections
+    return layout
+
+
+def write_json(data, name):
+    (BUILD_DIR / name).write_text(json.dumps(data, indent=1) + "\n", encoding="utf-8")
+
+
+def book_jobs(year):
+    """Text, cover, render and assemble jobs for the three books"""
+    names = post_names()
+    sizes = {n: (POSTS_DIR / n).stat().st_size for n in names}
+    generic = lambda name: name.replace(str(year), "YYYY")  # noqa: E731 - history survives new years
+    jobs = {}
+
+    texts = {
+        "US-2013-2019": period_posts(names, "US", 2013, 2019),
+        f"J-2020-{year}": period_posts(names, "J", 2020, year),
+        f"G-2020-{year}": period_posts(names, "G", 2020, year),
+        f"US-2020-{year}": period_posts(names, "US", 2020, year),
+    }
+    for category in KEPT:
+        texts[category] = all_time_posts(names, category)
+    for text, selected in texts.items():
+        jobs[f"text {text}"] = Job(
+            f"text {text}", "text", [Call(f"combine {text}", combine_posts, selected, f"{text}.txt")],
+            inputs=sum(sizes[n] for n in selected), outputs=[f"{text}.txt"],
+            history_key=f"text {generic(text)}")
+
+    for name, (title, subtitle) in COVERS.items():
+        name = name.format(year=year)
+        jobs[f"cover {name}"] = Job(
+            f"cover {name}", "cover",
+            [Cmd(f"generate_cover {name}",
+                 ["../generate_cover.py", title, subtitle.format(year=year), f"{name}.pdf"])],
+            outputs=[f"{name}.pdf"], history_key=f"cover {generic(name)}")
+
+    for text in texts:
+        steps = [
+            Call(f"decode {text}", decode, f"{text}.txt"),
+            Cmd(f"pandoc {text}", ["pandoc", "-f", "markdown", "-t", "html", f"{text}.txt", "-o", f"{text}.md.html"],
+                inputs=[f"{text}.txt"], outputs=[f"{text}.md.html"]),
+            Call(f"tablefy {text}", tablefy, f"{text}.md.html", f"{text}.src.html"),
+            Cmd(f"dow {text}", ["python3", "../dow.py"], stdin=f"{text}.src.html", stdout=f"{text}.html"),
+            Cmd(f"weasyprint {text}", ["../generate_content_pdf.py", f"{text}.html", f"{text}.pdf"],
+                inputs=[f"{text}.html"], outputs=[f"{text}.pdf"]),
+        ]
+        jobs[f"render {text}"] = Job(
+            f"render {text}", "render", steps, deps=[jobs[f"text {text}"]],
+            inputs=jobs[f"text {text}"].inputs, outputs=[f"{text}.pdf"],
+            history_key=f"render {generic(text)}")
+
+    layout = book_layout(year)
+    parts = sorted({name for sections in layout.values() for section in sections for name in section["files"]})
+    deps = [jobs[f"cover {p[:-4]}"] if p.startswith("a_") else jobs[f"render {p[:-4]}"] for p in parts]
+    books = list(layout)
+    jobs["assemble books"] = Job(
+        "assemble books", "assemble",
+        [Call("write books.json", write_json, layout, "books.json"),
+         Cmd("assemble_books", ["../assemble_books.py", "books.json"], inputs=parts, outputs=books)],
+        deps=deps, inputs=sum(d.inputs for d in deps), outputs=books)
+    return list(jobs.values())
+
+
+def plan(targets, year):
+    jobs = []
+    if "books" in targets:
+        jobs += book_jobs(year)
+    if "monthly" in targets:
+        jobs.append(Job("monthly", "monthly", [Call("build_monthlies", build_monthlies)]))
+    if "pwa" in targets:
+        data = Job("pwa build_data.py", "pwa",
+                   [Cmd("build_data.py", [ROOT / "pwa" / "build_data.py"], cwd=ROOT)],
+                   outputs=[ROOT / "pwa" / "data" / "list.json"])
+        # dist/ links data/, so fingerprint the shell once the data is in place
+        jobs += [data, Job("pwa build_assets.py", "assets",
+                           [Cmd("build_assets.py", [ROOT / "build_assets.py"], cwd=ROOT)],
+                           deps=[data], outputs=[ROOT / "pwa" / "dist" / "assets.json"])]
+    for job in jobs:
+        for dep in job.deps:
+            dep.dependents.append(job)
+    return jobs
+
+
+# --- estimates -------------------------------------------------------------
+
+def available_memory_mb():
+    """Memory available for new processes, in MB, or None if unknown"""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    if sys.platform == "darwin":
+        try:
+            out = subprocess.run(["vm_stat"], capture_output=True, text=True, check=True).stdout
+            page = int(re.search(r"page size of (\d+)", out).group(1))
+            pages = sum(int(n) for n in re.findall(r"Pages (?:free|inactive|speculative|purgeable):\s+(\d+)", out))
+            return page * pages // 2**20
+        except (OSError, subprocess.CalledProcessError, AttributeError, ValueError):
+            pass
+    return None
+
+
+def load_history():
+    try:
+        return json.loads(HISTORY_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_history(history, jobs):
+    for job in jobs:
+        if job.state != "done":
+            continue
+        seen = {"duration": job.span["duration"], "peak_rss_mb": job.span["peak_rss"] / 2**20}
+        old = history.get(job.history_key)
+        if old:
+            seen = {k: old.get(k, v) * (1 - HISTORY_WEIGHT) + v * HISTORY_WEIGHT for k, v in seen.items()}
+        history[job.history_key] = {k: round(v, 3) for k, v in seen.items()}
+    tmp = HISTORY_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(history, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, HISTORY_PATH)
+
+
+def estimate(jobs, history):
+    """Expected duration and memory per job, and its rank (longest chain from it)"""
+    for job in jobs:
+        (seconds, mb), (per_s, per_mb) = DEFAULT_COST[job.kind]
+        input_mb = job.inputs / 2**20
+        job.duration = seconds + per_s * input_mb
+        job.memory = mb + per_mb * input_mb
+        seen = history.get(job.history_key)
+        if seen:
+            job.duration = seen["duration"]
+            if seen["peak_rss_mb"]:
+                job.memory = seen["peak_rss_mb"] * RSS_MARGIN
+    for job in reversed(topological(jobs)):
+        job.rank = job.duration + max((d.rank for d in job.dependents), default=0)
+
+
+def topological(jobs):
+    order, seen = [], set()
+
+    def visit(job):
+        if job.name in seen:
+            return
+        seen.add(job.name)
+        for dep in job.deps:
+            visit(dep)
+        order.append(job)
+    for job in jobs:
+        visit(job)
+    return order
+
+
+# --- running ---------------------------------------------------------------
+
+class Runner:
+    """Runs one job's steps on a thread, tracking its child processes for cancel"""
+
+    def __init__(self, done):
+        self.done = done
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.procs = set()
+
+    def start(self, job):
+        threading.Thread(target=self.run, args=(job,), daemon=True).start()
+
+    def run(self, job):
+        job.log = LOG_DIR / f"{job.slug}.log"
+        span = new_span(job.name, job.kind, None)
+        span["input_bytes"] = job.inputs
+        span["after"] = [d.span["id"] for d in job.deps]
+        job.span = span
+        children = []
+        returncode = 0
+        try:
+            with open(job.log, "wb") as log:
+                for step in job.steps:
+                    if self.cancelled.is_set():
+                        returncode = -signal.SIGTERM
+                        break
+                    run = self.run_command if isinstance(step, Cmd) else run_call
+                    child = run(step, span, log)
+                    children.append(child)
+                    returncode = child["returncode"]
+                    if returncode:
+                        break
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            finish_span(span, job.outputs, returncode)
+            span["cpu"] = sum(c["cpu"] for c in children)
+            span["peak_rss"] = max((c["peak_rss"] for c in children), default=0)
+            self.done.put((job, children))
+
+    def run_command(self, cmd, parent, log):
+        span = new_span(cmd.name, parent["phase"], parent["id"])
+        span["input_bytes"] = sum(build_trace.file_size(cmd.cwd / p) for p in cmd.inputs)
+        log.write(f"$ {' '.join(cmd.argv)}\n".encode())
+        log.flush()
+        stdin, stdout = subprocess.DEVNULL, log
+        try:
+            if cmd.stdin:
+                stdin = open(cmd.cwd / cmd.stdin, "rb")
+            if cmd.stdout:
+                stdout = open(cmd.cwd / cmd.stdout, "wb")
+            with self.lock:
+                if self.cancelled.is_set():
+                    raise InterruptedError
+                proc = subprocess.Popen(cmd.argv, cwd=cmd.cwd, stdin=stdin, stdout=stdout, stderr=log,
+                                        start_new_session=True)
+                self.procs.add(proc)
+            # wait4 rather than proc.wait() for this command's own resource usage
+            _, status, usage = os.wait4(proc.pid, 0)
+            with self.lock:
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                self.procs.discard(proc)
+            span["cpu"] = usage.ru_utime + usage.ru_stime
+            span["peak_rss"] = usage.ru_maxrss * build_trace.MAXRSS_BYTES
+            returncode = proc.returncode
+        except InterruptedError:
+            returncode = -signal.SIGTERM
+        except OSError as exc:
+            log.write(f"{exc}\n".encode())
+            returncode = 127
+        finally:
+            for f in (stdin, stdout):
+                if f not in (subprocess.DEVNULL, log):
+                    f.close()
+        finish_span(span, [cmd.cwd / p for p in cmd.outputs], returncode)
+        return span
+
+    def cancel(self):
+        """Stop starting steps and terminate running commands (SIGTERM, then SIGKILL)"""
+        self.cancelled.set()
+        self.signal_all(signal.SIGTERM)
+        timer = threading.Timer(TERMINATE_GRACE, self.signal_all, args=(signal.SIGKILL,))
+        timer.daemon = True
+        timer.start()
+
+    def signal_all(self, sig):
+        with self.lock:
+            for proc in self.procs:
+                try:
+                    os.killpg(proc.pid, sig)
+                except ProcessLookupError:
+                    pass
+
+
+def run_call(call, parent, log):
+    span = new_span(call.name, parent["phase"], parent["id"])
+    cpu = time.thread_time()
+    try:
+        call.func(*call.args)
+        returncode = 0
+    except Exception:
+        log.write(traceback.format_exc().encode())
+        returncode = 1
+    span["cpu"] = time.thread_time() - cpu
+    finish_span(span, [], returncode)
+    return span
+
+
+def new_span(name, phase, parent):
+    return {"id": uuid.uuid4().hex[:12], "parent": parent, "name": name, "phase": phase,
+            "start": time.time(), "cpu": 0.0, "peak_rss": 0, "input_bytes": 0}
+
+
+def finish_span(span, outputs, returncode):
+    span["duration"] = time.time() - span["start"]
+    span["outputs"] = {}
+    for path in outputs:
+        path = BUILD_DIR / path  # no-op for absolute paths
+        if path.is_file():
+            info = {"bytes": build_trace.file_size(path)}
+            if path.suffix.lower() == ".pdf":
+                info["pages"] = build_trace.pdf_page_count(path)
+            span["outputs"][path.name] = info
+    span["returncode"] = returncode
+
+
+def schedule(jobs, slots, memory, keep_going):
+    """Run jobs on at most `slots` workers within `memory` MB; returns the spans"""
+    done = queue.Queue()
+    runner = Runner(done)
+    waiting = {job.name: len(job.deps) for job in jobs}
+    ready = [job for job in jobs if not job.deps]
+    running = []
+    spans = []
+    stopping = False
+
+    def skip_dependents(job):
+        for d in job.dependents:
+            if d.state == "pending":
+                d.state = "skipped"
+                skip_dependents(d)
+
+    while ready or running:
+        if not stopping:
+            ready.sort(key=lambda j: -j.rank)
+            for job in list(ready):
+                if len(running) >= slots:
+                    break
+                in_use = sum(j.memory for j in running)
+                if running and memory and in_use + job.memory > memory:
+                    continue  # try a smaller one
+                ready.remove(job)
+                running.append(job)
+                job.state = "running"
+                print(f"[{time.strftime('%H:%M:%S')}] start  {job.name}")
+                runner.start(job)
+        if not running:
+            break
+        try:
+            job, children = done.get()
+        except KeyboardInterrupt:
+            print("Interrupted; stopping running jobs...", file=sys.stderr)
+            stopping = True
+            runner.cancel()
+            continue
+        running.remove(job)
+        spans += [job.span] + children
+        if job.span["returncode"] == 0:
+            job.state = "done"
+            print(f"[{time.strftime('%H:%M:%S')}] done   {job.name} ({job.span['duration']:.1f}s)")
+            for d in job.dependents:
+                waiting[d.name] -= 1
+                if waiting[d.name] == 0 and d.state == "pending":
+                    ready.append(d)
+            continue
+        if stopping or job.span["returncode"] < 0:
+            job.state = "cancelled"
+            continue
+        job.state = "failed"
+        print(f"[{time.strftime('%H:%M:%S')}] FAILED {job.name} (exit {job.span['returncode']})", file=sys.stderr)
+        skip_dependents(job)
+        if not keep_going:
+            stopping = True
+            ready.clear()
+            runner.cancel()
+    for job in jobs:
+        if job.state == "pending":
+            job.state = "not started"
+    spans.sort(key=lambda s: s["start"])
+    return spans
+
+
+def print_failures(jobs):
+    failed = [j for j in jobs if j.state == "failed"]
+    for job in failed:
+        print(f"\n{job.name} failed; last lines of {job.log.relative_to(ROOT)}:", file=sys.stderr)
+        lines = job.log.read_text(encoding="utf-8", errors="replace").splitlines()
+        for line in lines[-LOG_TAIL:]:
+            print(f"  {line}", file=sys.stderr)
+    for state in ("cancelled", "skipped", "not started"):
+        names = [j.name for j in jobs if j.state == state]
+        if names:
+            print(f"{state.capitalize()}: {', '.join(names)}", file=sys.stderr)
+
+
+def finish_books(year):
+    """Move the books and the category files next to the posts and drop build/"""
+    for book in BOOKS:
+        shutil.move(BUILD_DIR / book.format(year=year), ROOT / book.format(year=year))
+    for name in KEPT:
+        for ext in ("html", "pdf", "txt"):
+            os.replace(BUILD_DIR / f"{name}.{ext}", ROOT / f"{name}.{ext}")
+    shutil.rmtree(BUILD_DIR)
+
+
+def write_trace(spans):
+    lanes = build_trace.assign_lanes(spans)
+    print()
+    build_trace.report(spans)
+    TRACE_PATH.write_text(json.dumps(build_trace.chrome_trace(spans, lanes)), encoding="utf-8")
+    print(f"Wrote {TRACE_PATH.name} (open in https://ui.perfetto.dev or chrome://tracing)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the books, monthly compilations and PWA bundle.")
+    parser.add_argument("--only", action="append", choices=TARGETS,
+                        help="build only this (repeatable; default: books and pwa)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="jobs to run at once (default: CPU count)")
+    parser.add_argument("--memory", type=int,
+                        help=f"MB the running jobs may use together (default: {MEMORY_HEADROOM:.0%} of available)")
+    parser.add_argument("-k", "--keep-going", action="store_true",
+                        help="after a failure, keep running jobs that don't depend on it")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="print the plan and exit")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    year = date.today().year
+    jobs = plan(args.only or DEFAULT_TARGETS, year)
+    history = load_history()
+    estimate(jobs, history)
+    memory = args.memory
+    if memory is None:
+        available = available_memory_mb()
+        memory = int(available * MEMORY_HEADROOM) if available else None
+
+    budget = f"{memory} MB" if memory else "unknown memory"
+    print(f"{len(jobs)} jobs on up to {args.jobs} workers within {budget}")
+    if args.dry_run:
+        print(f"{'Job':<36} {'Needs':<28} {'Est s':>7} {'Est MB':>7} {'Rank s':>7}")
+        for job in sorted(jobs, key=lambda j: -j.rank):
+            needs = ", ".join(d.name for d in job.deps)
+            print(f"{job.name:<36} {needs[:28]:<28} {job.duration:>7.1f} {job.memory:>7.0f} {job.rank:>7.1f}")
+        return 0
+
+    BUILD_DIR.mkdir(exist_ok=True)
+    LOG_DIR.mkdir(exist_ok=True)
+    spans = schedule(jobs, args.jobs, memory, args.keep_going)
+    if spans:
+        write_trace(spans)
+    save_history(history, jobs)
+
+    if any(j.state != "done" for j in jobs):
+        print_failures(jobs)
+        print(f"\nBuild failed; intermediate files and logs are in {BUILD_DIR.relative_to(ROOT)}/", file=sys.stderr)
+        return 1
+    if "books" in (args.only or DEFAULT_TARGETS):
+        finish_books(year)
+    else:
+        shutil.rmtree(LOG_DIR)
+        if not any(BUILD_DIR.iterdir()):
+            BUILD_DIR.rmdir()
+    print("Build finished successfully.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Stage-level tracing for the book build: the summary and Chrome trace.
+
+build_books.py records a span for every job in its graph (with the ids of
+the jobs it waited for) and one for each command inside it, nested under
+the job: start time and duration, CPU time, peak RSS, total size of the
+inputs, and size and page count of each output (for PDFs). When the build
+ends it hands them to the functions below.
+
+report() prints a summary table (per stage, per phase, the critical path
+and how busy the CPUs were) and chrome_trace() builds a Chrome trace /
+Perfetto JSON file; open it at https://ui.perfetto.dev or chrome://tracing.
+Concurrent stages get their own lanes and a "running" counter track shows
+how many were in flight.
+"""
+import os
+import re
+import sys
+import zlib
+from pathlib import Path
+
+# ru_maxrss is kilobytes on Linux, bytes on macOS
+MAXRSS_BYTES = 1 if sys.platform == "darwin" else 1024
+
+PAGES_RE = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b")
+STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+
+
+def pdf_page_count(path):
+    """Page count from the PDF's page tree root, or None.
+
+    The /Pages dictionaries may sit in compressed object streams (WeasyPrint,
+    pdftk), so those are inflated and searched too.
+    """
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return None
+    counts = [int(a or b) for a, b in PAGES_RE.findall(data)]
+    if not counts:
+        for stream in STREAM_RE.findall(data):
+            try:
+                counts += [int(a or b) for a, b in PAGES_RE.findall(zlib.decompress(stream))]
+            except zlib.error:
+                continue
+    return max(counts) if counts else None
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def end(span):
+    return span["start"] + span["duration"]
+
+
+def assign_lanes(spans):
+    """Lane per top-level span so concurrent ones don't overlap; children share their parent's"""
+    by_id = {s["id"]: s for s in spans}
+    lane_free = []  # end time per lane
+    for span in spans:
+        span["nested"] = span["parent"] in by_id
+        if span["nested"]:
+            continue
+        for lane, free_at in enumerate(lane_free):
+            if free_at <= span["start"]:
+                lane_free[lane] = end(span)
+                break
+        else:
+            lane = len(lane_free)
+            lane_free.append(end(span))
+        span["lane"] = lane
+    for span in spans:
+        if "lane" not in span:
+            parent = by_id[span["parent"]]
+            while "lane" not in parent:
+                parent = by_id[parent["parent"]]
+            span["lane"] = parent["lane"]
+    return len(lane_free)
+
+
+def page_count(span):
+    pages = [o.get("pages") for o in span["outputs"].values() if o.get("pages") is not None]
+    return sum(pages) if pages else None
+
+
+def chrome_trace(spans, lanes):
+    """Chrome trace event format (JSON object form)"""
+    t0 = spans[0]["start"]
+    us = lambda t: round((t - t0) * 1e6)  # noqa: E731
+    events = [{"ph": "M", "pid": 1, "name": "process_name", "args": {"name": "book build"}}]
+    events += [{"ph": "M", "pid": 1, "tid": lane, "name": "thread_name", "args": {"name": f"slot {lane + 1}"}}
+               for lane in range(lanes)]
+    edges = []
+    for span in spans:
+        events.append({
+            "ph": "X", "pid": 1, "tid": span["lane"],
+            "name": span["name"], "cat": span["phase"] or "build",
+            "ts": us(span["start"]), "dur": round(span["duration"] * 1e6),
+            "args": {
+                "cpu_s": round(span["cpu"], 3),
+                "peak_rss_mb": round(span["peak_rss"] / 2**20, 1),
+                "input_kb": round(span["input_bytes"] / 1024, 1),
+                "outputs": span["outputs"],
+                "returncode": span["returncode"],
+            },
+        })
+        if not span["nested"]:
+            edges += [(span["start"], 1), (end(span), -1)]
+    running = 0
+    for t, delta in sorted(edges):
+        running += delta
+        events.append({"ph": "C", "pid": 1, "name": "running", "ts": us(t), "args": {"stages": running}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def critical_path(top):
+    """The chain of stages that bounded the build, in order: walk back from the
+    last stage to finish through whichever of the stages it waited for
+    ("after") finished last."""
+    by_id = {span["id"]: span for span in top}
+    chain = [max(top, key=end)]
+    while True:
+        waited = [by_id[i] for i in chain[-1].get("after", []) if i in by_id]
+        if not waited:
+            return chain[::-1]
+        chain.append(max(waited, key=end))
+
+
+def report(spans):
+    top = [s for s in spans if not s["nested"]]
+    children = {}
+    for span in spans:
+        if span["nested"]:
+            children.setdefault(span["parent"], []).append(span)
+    t0 = min(s["start"] for s in spans)
+    wall = max(end(s) for s in spans) - t0
+
+    print(f"{'Stage':<36} {'Phase':<10} {'Start':>7} {'Wall s':>7} {'CPU s':>7} "
+          f"{'RSS MB':>7} {'In KB':>8} {'Pages':>6}")
+
+    def row(span, depth):
+        pages = page_count(span)
+        failed = "  FAILED" if span["returncode"] > 0 else "  KILLED" if span["returncode"] < 0 else ""
+        print(f"{('  ' * depth + span['name'])[:36]:<36} {(span['phase'] or '-'):<10} "
+              f"{span['start'] - t0:>7.2f} {span['duration']:>7.2f} {span['cpu']:>7.2f} "
+              f"{span['peak_rss'] / 2**20:>7.0f} {span['input_bytes'] / 1024:>8.0f} "
+              f"{pages if pages is not None else '':>6}{failed}")
+        for child in children.get(span["id"], []):
+            row(child, depth + 1)
+
+    for span in top:
+        row(span, 0)
+
+    phases = {}
+    for span in top:
+        phases.setdefault(span["phase"] or "-", []).append(span)
+    print("\nPhases:")
+    for phase, members in phases.items():
+        longest = max(members, key=lambda s: s["duration"])
+        print(f"  {phase:<10} {max(end(s) for s in members) - min(s['start'] for s in members):>7.2f}s wall, "
+              f"{len(members):>2} stages, {sum(s['cpu'] for s in members):>7.2f}s CPU, "
+              f"longest: {longest['name']}")
+    print("\nCritical path: " + " -> ".join(f"{s['name']} ({s['duration']:.1f}s)" for s in critical_path(top)))
+
+    cpu = sum(s["cpu"] for s in top)
+    cores = os.cpu_count() or 1
+    peak = max(spans, key=lambda s: s["peak_rss"])
+    print(f"Build: {wall:.1f}s wall, {cpu:.1f}s CPU across {cores} cores "
+          f"({cpu / (wall * cores) * 100 if wall else 0:.0f}% busy); "
+          f"peak RSS {peak['peak_rss'] / 2**20:.0f} MB ({peak['name']})")
+    failures = [s["name"] for s in spans if s["returncode"] > 0]
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+    cancelled = [s["name"] for s in spans if s["returncode"] < 0]
+    if cancelled:
+        print(f"Killed by a signal: {', '.join(cancelled)}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = ["markdown", "weasyprint"]
+# ///
+"""Render a book (cover + posts) for any list of posts.
+
+    ./custom_book.py beach.pdf --title "Outer Dibblestan" --subtitle '"beach"' posts/*-A-*.txt
+    ... | ./custom_book.py out.pdf --title T --texts-json - --progress
+
+The posts are laid out exactly like preview.py renders them (the book CSS,
+table layout and weekday headings), after a cover in generate_cover.py's
+style. The web app runs this as a separate process for its /api/books job
+queue, passing the raw post texts as a JSON list in a temp file
+(--texts-json FILE; '-' reads it from stdin instead); with --progress
+each stage is reported as a JSON line on stdout:
+
+    {"stage": "markdown", "posts": 120}
+    {"stage": "layout", "posts": 120}
+    {"stage": "writing", "pages": 85}
+    {"stage": "done", "pages": 86, "bytes": 412345}
+
+The PDF is written to a temp file next to the output and renamed into place.
+"""
+import argparse
+import html
+import json
+import os
+import sys
+from pathlib import Path
+
+from preview import page_css, render_html
+
+PROGRESS = False
+
+
+def report(stage, **info):
+    if PROGRESS:
+        print(json.dumps({"stage": stage, **info}), flush=True)
+
+
+def render_book(texts, output, title, subtitle=""):
+    """Write the book to output; returns its page count"""
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+    from generate_cover import cover_html
+
+    report("markdown", posts=len(texts))
+    content_html = render_html(texts)
+    report("layout", posts=len(texts))
+    font_config = FontConfiguration()
+    cover = HTML(string=cover_html(html.escape(title), html.escape(subtitle) or None)).render(
+        font_config=font_config)
+    content = HTML(string=content_html).render(stylesheets=[page_css()], font_config=font_config)
+    pages = [*cover.pages, *content.pages]
+    report("writing", pages=len(pages))
+
+    output = Path(output)
+    tmp = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        content.copy(pages).write_pdf(tmp)
+        os.replace(tmp, output)
+    finally:
+        tmp.unlink(missing_ok=True)
+    report("done", pages=len(pages), bytes=output.stat().st_size)
+    return len(pages)
+
+
+def main():
+    global PROGRESS
+    parser = argparse.ArgumentParser(description="Render a book PDF for a list of posts.")
+    parser.add_argument("output", type=Path, help="PDF to write")
+    parser.add_argument("posts", nargs="*", type=Path, help="post files, in order")
+    parser.add_argument("--title", required=True, help="cover title")
+    parser.add_argument("--subtitle", default="", help="cover subtitle")
+    parser.add_argument("--texts-json", metavar="FILE",
+                        help="read a JSON list of raw post texts from FILE ('-' for stdin) instead")
+    parser.add_argument("--progress", action="store_true", help="report each stage as a JSON line")
+    args = parser.parse_args()
+    PROGRESS = args.progress
+
+    if args.texts_json:
+        source = sys.stdin if args.texts_json == "-" else open(args.texts_json, encoding="utf-8")
+        with source:
+            texts = json.load(source)
+    else:
+        texts = [p.read_text(encoding="utf-8", errors="replace") for p in args.posts]
+    if not texts:
+        parser.error("no posts to render")
+
+    pages = render_book(texts, args.output, args.title, args.subtitle)
+    if not PROGRESS:
+        print(f"Generated {args.output} ({len(texts)} posts, {pages} pages)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
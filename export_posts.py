@@ -0,0 +1,243 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = []
+# ///
+"""Export a filtered set of posts as NDJSON, Markdown or a zip of the files.
+
+    ./export_posts.py --category J --from 2022-01-01 --to 2022-12-31 > j-2022.md
+    ./export_posts.py --format ndjson --search 'beach -rain' -o beach.ndjson
+    ./export_posts.py --format zip -o posts.zip     # the whole archive
+
+Formats:
+    markdown  the decoded posts concatenated the way make_omnibus does it
+              (awk 'FNR==1{print ""}1': a blank line before each file)
+    ndjson    one JSON object per post (RECORD_FIELDS): filename, date
+              (YYYY-MM-DD), category, title and the decoded text without its
+              "# date category" heading, as the web app indexes them
+    zip       the original post files, unchanged
+
+--search takes the web app's query syntax and --mode its search modes: the
+selected posts are indexed in memory the way web/app.py indexes them and
+searched through query_parser, so a filter picks the same posts here as at
+/api/export.
+
+Every format is produced by a generator that reads one post at a time and
+yields its output as it goes, so memory stays flat however many posts are
+exported and the first bytes are out before the last post is read. The web
+app streams the same generators from /api/export.
+"""
+import argparse
+import json
+import os
+import quopri
+import sqlite3
+import sys
+import time
+import zipfile
+from datetime import date
+from pathlib import Path
+
+from preview import CATEGORIES, post_category, select_posts
+from query_parser import SEARCH_MODES, QueryError, Vocabulary, parse_query
+
+FORMATS = {
+    "markdown": ("text/markdown", "md"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "zip": ("application/zip", "zip"),
+}
+READ_CHUNK = 64 * 1024
+# The NDJSON record of a post, here and (by default) at /api/export
+RECORD_FIELDS = ("filename", "date", "category", "title", "content")
+# As web/app.py indexes posts, so --search matches what the search box does
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
+
+
+def decode(text):
+    """Quoted-printable post text as plain text"""
+    return quopri.decodestring(text.encode("utf-8")).decode("utf-8", errors="replace")
+
+
+def post_record(name, text):
+    """The export record of a post file's raw text, with web/app.py's title and content"""
+    try:
+        decoded = quopri.decodestring(text.encode("utf-8")).decode("utf-8")
+    except UnicodeDecodeError:
+        decoded = text
+    lines = decoded.strip().split("\n")
+    skip = 1 if lines[0].startswith("#") else 0
+    content = "\n".join(lines[skip:]).strip()
+    category = post_category(name)
+    if content:
+        title = content[:50].replace("\n", " ").strip() + ("..." if len(content) > 50 else "")
+    else:
+        title = f"{name[:10]} {category}"
+    return {"filename": name, "date": name[:10], "category": category, "title": title, "content": content}
+
+
+def ndjson_lines(records):
+    """One line per record (a dict), as bytes"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def markdown_chunks(texts):
+    """Raw post texts decoded and joined like make_omnibus: a blank line before each"""
+    for text in texts:
+        if text:
+            text = decode(text)
+            yield ("\n" + text + ("" if text.endswith("\n") else "\n")).encode("utf-8")
+
+
+class _ZipSink:
+    """Write-only, unseekable file for ZipFile; drain() hands back what it got.
+
+    ZipFile falls back to data descriptors when it can't seek, so entries are
+    written front to back and the archive can be streamed as it is built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.pending = 0
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.pending += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks, self.pending = [], 0
+        return data
+
+
+def zip_chunks(files):
+    """A zip of (name, path) files, yielded as it is written"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for name, path in files:
+            try:
+                source = open(path, "rb")
+            except FileNotFoundError:  # removed since it was selected
+                continue
+            with source:
+                mtime = time.localtime(os.fstat(source.fileno()).st_mtime)[:6]
+                info = zipfile.ZipInfo(name, date_time=mtime)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w") as entry:
+                    while chunk := source.read(READ_CHUNK):
+                        entry.write(chunk)
+                        if sink.pending >= READ_CHUNK:
+                            yield sink.drain()
+            if sink.pending:
+                yield sink.drain()
+    yield sink.drain()  # the central directory
+
+
+def read_texts(paths):
+    """(path, raw text) for each post that still exists"""
+    for path in paths:
+        try:
+            yield path, path.read_text(encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            continue
+
+
+def search_index(posts):
+    """An in-memory index of (path, raw text) posts, laid out like web/app.py's"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE posts (
+        id INTEGER PRIMARY KEY, filename TEXT NOT NULL, date TEXT NOT NULL,
+        category TEXT NOT NULL, title TEXT, content TEXT)""")
+    conn.execute(f"""CREATE VIRTUAL TABLE posts_fts USING fts5(
+        filename, title, content, category,
+        content='posts', content_rowid='id', tokenize='{FTS_TOKENIZER}')""")
+    conn.execute("""CREATE VIRTUAL TABLE posts_trigram USING fts5(
+        title, content, content='posts', content_rowid='id', tokenize='trigram')""")
+    conn.execute("CREATE VIRTUAL TABLE posts_vocab USING fts5vocab(posts_fts, row)")
+    for path, text in posts:
+        record = post_record(path.name, text)
+        rowid = conn.execute("INSERT INTO posts (filename, date, category, title, content) VALUES (?, ?, ?, ?, ?)",
+                             [record[f] for f in RECORD_FIELDS]).lastrowid
+        conn.execute("INSERT INTO posts_fts (rowid, filename, title, content, category) VALUES (?, ?, ?, ?, ?)",
+                     [rowid, record["filename"], record["title"], record["content"], record["category"]])
+        conn.execute("INSERT INTO posts_trigram (rowid, title, content) VALUES (?, ?, ?)",
+                     [rowid, record["title"], record["content"]])
+    return conn
+
+
+def matching(paths, search, mode="words"):
+    """The paths whose posts match a search-box query, in filename order.
+
+    Raises QueryError for an invalid query.
+    """
+    paths = {path.name: path for path in paths}
+    conn = search_index(read_texts(paths.values()))
+    try:
+        vocabulary = Vocabulary(conn.execute("SELECT term, doc FROM posts_vocab")) if mode == "fuzzy" else None
+        parsed = parse_query(search, mode, vocabulary)
+        conditions, params = list(parsed["conditions"]), list(parsed["params"])
+        if not parsed["match"] and not conditions:
+            conditions.append("0")  # nothing searchable left, as in web/app.py
+        if parsed["match"]:
+            source = "posts_fts JOIN posts ON posts.id = posts_fts.rowid WHERE posts_fts MATCH ?"
+            params.insert(0, parsed["match"])
+        else:
+            source = "posts WHERE 1"
+        rows = conn.execute("SELECT posts.filename FROM " + source
+                            + "".join(" AND " + c for c in conditions) + " ORDER BY posts.filename", params)
+        return [paths[name] for name, in rows]
+    finally:
+        conn.close()
+
+
+def export(fmt, posts):
+    """(path, raw text) posts exported in format fmt, as an iterator of bytes"""
+    if fmt == "markdown":
+        return markdown_chunks(text for _, text in posts)
+    if fmt == "ndjson":
+        return ndjson_lines(post_record(path.name, text) for path, text in posts)
+    return zip_chunks((path.name, path) for path, _ in posts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a filtered set of posts.")
+    parser.add_argument("--format", choices=FORMATS, default="markdown", help="output format (default: markdown)")
+    parser.add_argument("--category", choices=CATEGORIES, help="only this category (US = A and D)")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=date.min,
+                        help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=date.max,
+                        help="last day, YYYY-MM-DD")
+    parser.add_argument("--search", help="only posts matching this query (the web app's search syntax)")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="words",
+                        help="how --search matches: whole words (default), substrings or fuzzy")
+    parser.add_argument("-o", "--output", type=Path, help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    if args.format == "zip" and not args.output and sys.stdout.isatty():
+        parser.error("refusing to write a zip to a terminal; use -o or a redirect")
+
+    paths = select_posts(args.start, args.end, args.category)
+    if args.search:
+        try:
+            paths = matching(paths, args.search, args.mode)
+        except QueryError as exc:
+            parser.error(str(exc))
+    posts = read_texts(paths)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    with out:
+        for chunk in export(args.format, posts):
+            out.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
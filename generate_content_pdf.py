@@ -7,12 +7,8 @@ import sys
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
 
-
-def generate_content_pdf(html_file, pdf_file):
-    """Generate a content PDF with proper dimensions and margins."""
-
-    # Additional CSS for page layout
-    additional_css = """
+# Page layout for the content PDFs (also used by preview.py)
+CONTENT_CSS = """
     @page {
         size: 8in 10in;
         margin: 30pt 40pt 30pt 40pt;
@@ -39,6 +35,10 @@ def generate_content_pdf(html_file, pdf_file):
     }
     """
 
+
+def generate_content_pdf(html_file, pdf_file):
+    """Generate a content PDF with proper dimensions and margins."""
+
     # Read the HTML file
     with open(html_file, "r", encoding="utf-8") as f:
         html_content = f.read()
@@ -46,7 +46,7 @@ def generate_content_pdf(html_file, pdf_file):
     # Generate PDF with additional CSS
     font_config = FontConfiguration()
     html_doc = HTML(string=html_content)
-    css = CSS(string=additional_css)
+    css = CSS(string=CONTENT_CSS)
 
     html_doc.write_pdf(pdf_file, stylesheets=[css], font_config=font_config)
     print(f"Generated {pdf_file}")
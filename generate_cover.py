@@ -8,11 +8,11 @@ from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
 
 
-def generate_cover(title, subtitle, output_path):
-    """Generate a PDF cover with proper centering."""
+def cover_html(title, subtitle):
+    """HTML for a centered cover page (also used by custom_book.py)."""
 
     # HTML template with CSS
-    html_content = f"""
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -61,9 +61,13 @@ def generate_cover(title, subtitle, output_path):
     </html>
     """
 
+
+def generate_cover(title, subtitle, output_path):
+    """Generate a PDF cover with proper centering."""
+
     # Generate PDF
     font_config = FontConfiguration()
-    html_doc = HTML(string=html_content)
+    html_doc = HTML(string=cover_html(title, subtitle))
     html_doc.write_pdf(output_path, font_config=font_config)
     print(f"Generated {output_path}")
 
@@ -0,0 +1,108 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = []
+# ///
+"""Monthly compilations: a month's -A- and -D- posts, concatenated and decoded.
+
+    ./monthly.py 2024-05              # print May 2024
+    ./monthly.py --list               # every month with its post count
+    ./monthly.py --export             # write monthly/YYYY-MM.txt (what make_monthlies runs)
+
+A compilation is cheap to produce from the posts, so it no longer has to be
+kept on disk: the web app serves any month at /api/monthly/YYYY-MM, streamed
+post by post with an ETag, and this script prints one. --export still writes
+the monthly/ directory for reading offline, but only rewrites the months
+whose compilation changed and removes months that no longer have posts.
+"""
+import argparse
+import quopri
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+POSTS_DIR = ROOT / "posts"
+MONTHLY_DIR = ROOT / "monthly"
+
+MONTH = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def in_monthly(name):
+    """Whether a post file belongs in the monthly compilations (US: -A- and -D-)"""
+    return name.endswith(".txt") and ("-A-" in name or "-D-" in name)
+
+
+def months(posts_dir=POSTS_DIR):
+    """{YYYY-MM: [post paths in order]} for every month with posts"""
+    found = {}
+    for path in sorted(posts_dir.glob("*.txt")):
+        if in_monthly(path.name):
+            found.setdefault(path.name[:7], []).append(path)
+    return found
+
+
+def compile_month(paths):
+    """The compilation of a month's post files, yielded one decoded post at a time"""
+    for path in paths:
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:  # removed since it was listed
+            continue
+        yield quopri.decodestring(raw)
+
+
+def export(directory=MONTHLY_DIR, posts_dir=POSTS_DIR):
+    """Write directory/YYYY-MM.txt for every month; returns (written, unchanged, removed)"""
+    directory.mkdir(exist_ok=True)
+    written = unchanged = removed = 0
+    wanted = months(posts_dir)
+    for month, paths in wanted.items():
+        target = directory / f"{month}.txt"
+        data = b"".join(compile_month(paths))
+        try:
+            if target.read_bytes() == data:
+                unchanged += 1
+                continue
+        except FileNotFoundError:
+            pass
+        tmp = target.with_name(f".{target.name}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(target)
+        written += 1
+    for old in directory.glob("*.txt"):
+        if old.stem not in wanted:
+            old.unlink()
+            removed += 1
+    return written, unchanged, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print or export monthly compilations.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("month", nargs="?", help="month to print, YYYY-MM")
+    action.add_argument("--list", action="store_true", help="list the months and their post counts")
+    action.add_argument("--export", nargs="?", const=MONTHLY_DIR, type=Path, metavar="DIR",
+                        help="write every month to DIR (default: monthly/)")
+    args = parser.parse_args()
+
+    if args.export:
+        written, unchanged, removed = export(args.export)
+        print(f"{args.export}: {written} written, {unchanged} unchanged, {removed} removed")
+        return 0
+    found = months()
+    if args.list:
+        for month, paths in found.items():
+            print(f"{month}  {len(paths)}")
+        return 0
+    if not MONTH.match(args.month):
+        parser.error(f"invalid month {args.month!r}, expected YYYY-MM")
+    if args.month not in found:
+        print(f"monthly.py: no posts in {args.month}", file=sys.stderr)
+        return 1
+    for chunk in compile_month(found[args.month]):
+        sys.stdout.buffer.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Photo renditions shared by the web app's photo cache and zoomail's photo store.
+
+Every photo is kept as a progressive JPEG in each of PHOTO_SIZES, laid out as
+<store>/<date>/<size>/<name>; the web app lists a date's DEFAULT_PHOTO_SIZE
+directory and serves the others by name. Names are DATE-N-<hash>.jpg, the hash
+covering the original and the rendition settings, so a name always means the
+same image (see PHOTO_NAME_RE).
+"""
+import hashlib
+import re
+import shutil
+import subprocess
+from contextlib import nullcontext
+
+# Largest first: each one is resized from the previous so ImageMagick only
+# decodes the original once. 'medium' is the historical 1000px-wide image and
+# remains the default when no size is requested.
+PHOTO_SIZES = {
+    "full": "2000x2000>",
+    "medium": "1000x",
+    "thumb": "300x300^",
+}
+DEFAULT_PHOTO_SIZE = "medium"
+PHOTO_NAME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}-\d+-[0-9a-f]{10}\.jpg$")
+READ_CHUNK = 256 * 1024
+
+
+class RenditionError(Exception):
+    """ImageMagick failed on a photo; the message is its stderr"""
+
+
+def photo_name(date_str, n, src):
+    """DATE-N-<hash>.jpg for the original at src, the nth photo of its date"""
+    digest = hashlib.sha256()
+    with open(src, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            digest.update(chunk)
+    digest.update(repr(PHOTO_SIZES).encode())
+    return f"{date_str}-{n}-{digest.hexdigest()[:10]}.jpg"
+
+
+def render(src, name, work_dir, timeout=None, timed=nullcontext):
+    """Write every rendition of src as work_dir/<size>/name.
+
+    timed() wraps each ImageMagick run (e.g. a metrics stage). Raises
+    FileNotFoundError when `magick` is missing, subprocess.TimeoutExpired,
+    or RenditionError.
+    """
+    source = src
+    for size, geometry in PHOTO_SIZES.items():
+        size_dir = work_dir / size
+        size_dir.mkdir(exist_ok=True)
+        dest = size_dir / name
+        with timed():
+            convert = subprocess.run(
+                ["magick", str(source), "-auto-orient", "-strip",
+                 "-resize", geometry, "-interlace", "Plane", "-quality", "82",
+                 str(dest)],
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        if convert.returncode != 0:
+            raise RenditionError(convert.stderr.strip() if convert.stderr else "Unknown ImageMagick error.")
+        source = dest
+
+
+def install(work_dir, names, date_dir):
+    """Move rendered names from work_dir into date_dir/<size>/.
+
+    The default size goes last: its presence is what lists a photo.
+    """
+    for size in sorted(PHOTO_SIZES, key=lambda s: s == DEFAULT_PHOTO_SIZE):
+        size_dir = date_dir / size
+        size_dir.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            shutil.move(str(work_dir / size / name), size_dir / name)
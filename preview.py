@@ -0,0 +1,211 @@
+#!/usr/bin/env -S uv run --python-preference only-system
+# /// script
+# dependencies = ["markdown", "weasyprint"]
+# ///
+"""Render a quick preview PDF of a few weeks of posts, laid out like the books.
+
+    ./preview.py                          # the last 4 weeks -> preview.pdf
+    ./preview.py --weeks 2 --category J
+    ./preview.py --month 2024-05 -o may.pdf
+    ./preview.py --from 2024-05-01 --to 2024-05-10 --watch
+
+Posts in the window go through the book pipeline (blank line between posts,
+quoted-printable decoding, markdown, the table layout, pandoc.css, dow.py's
+weekday headings and generate_content_pdf.py's page CSS) in a single
+process, with python-markdown standing in for pandoc. With --watch the
+process stays warm and re-renders whenever a post in the window changes, so
+checking a new entry takes about a second instead of a make_omnibus run.
+The web app serves the same render at /api/preview.pdf.
+"""
+import argparse
+import calendar
+import quopri
+import re
+import sys
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+POSTS_DIR = ROOT / "posts"
+CSS_PATH = ROOT / "pandoc.css"
+
+DEFAULT_WEEKS = 4
+# Keeps a preview a preview; whole years are what make_omnibus is for
+MAX_POSTS = 400
+WATCH_INTERVAL = 0.5
+
+CATEGORIES = ("US", "A", "D", "J", "G", "AHNS")
+
+
+def post_category(name):
+    """A, D, J, G or AHNS for a post filename, like the web app's indexer"""
+    for category in ("AHNS", "J", "G"):
+        if category in name:
+            return category
+    if "-D-" in name:
+        return "D"
+    if "-A-" in name:
+        return "A"
+    return "US"
+
+
+def window(today, weeks=None, month=None, start=None, end=None):
+    """(first, last) day of the preview; raises ValueError for bad arguments.
+
+    month is YYYY-MM, start/end are YYYY-MM-DD (either may be left open);
+    otherwise the last `weeks` weeks up to today.
+    """
+    if month:
+        m = re.fullmatch(r"(\d{4})-(\d{2})", month)
+        if not m or not 1 <= int(m.group(2)) <= 12:
+            raise ValueError(f"invalid month {month!r}, expected YYYY-MM")
+        year, mon = int(m.group(1)), int(m.group(2))
+        return date(year, mon, 1), date(year, mon, calendar.monthrange(year, mon)[1])
+    if start or end:
+        first = date.fromisoformat(start) if start else date.min
+        last = date.fromisoformat(end) if end else today
+        if first > last:
+            raise ValueError("the window starts after it ends")
+        return first, last
+    weeks = DEFAULT_WEEKS if weeks is None else weeks
+    if weeks < 1:
+        raise ValueError("weeks must be at least 1")
+    return today - timedelta(weeks=weeks) + timedelta(days=1), today
+
+
+def select_posts(first, last, category=None, posts_dir=POSTS_DIR):
+    """Post files dated first..last (inclusive), in book order"""
+    selected = []
+    for path in sorted(posts_dir.glob("*.txt")):
+        try:
+            day = date.fromisoformat(path.name[:10])
+        except ValueError:
+            continue
+        if not first <= day <= last:
+            continue
+        if category:
+            found = post_category(path.name)
+            if found != category and not (category == "US" and found in ("A", "D")):
+                continue
+        selected.append(path)
+    return selected
+
+
+def add_day_of_week(html):
+    from dow import add_day_of_week_line
+    return "".join(add_day_of_week_line(line) for line in html.splitlines(keepends=True))
+
+
+def render_html(texts):
+    """Book HTML for raw (quoted-printable) post texts, in order"""
+    import markdown
+
+    combined = "".join("\n" + text + ("" if text.endswith("\n") else "\n") for text in texts if text)
+    body = markdown.markdown(quopri.decodestring(combined.encode("utf-8")).decode("utf-8", errors="replace"))
+    body = re.sub(r"^<h1", "</td></tr><tr><td><h1", body, flags=re.M)
+    body = re.sub(r"/h1>$", "/h1></td><td>", body, flags=re.M)
+    return add_day_of_week(CSS_PATH.read_text(encoding="utf-8") + body)
+
+
+def pdf_unavailable():
+    """Why WeasyPrint can't render here (not installed, no pango), or None"""
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as exc:
+        return str(exc).strip().splitlines()[0]
+    return None
+
+
+@lru_cache(maxsize=None)
+def page_css():
+    """generate_content_pdf.py's page CSS, parsed once per process"""
+    from weasyprint import CSS
+    from generate_content_pdf import CONTENT_CSS
+    return CSS(string=CONTENT_CSS)
+
+
+def render_pdf(html):
+    """(PDF bytes, page count)"""
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    document = HTML(string=html, base_url=str(ROOT)).render(
+        stylesheets=[page_css()], font_config=FontConfiguration())
+    return document.write_pdf(), len(document.pages)
+
+
+def render(paths, output):
+    start = time.perf_counter()
+    texts = [p.read_text(encoding="utf-8", errors="replace") for p in paths]
+    pdf, pages = render_pdf(render_html(texts))
+    tmp = output.with_name(f".{output.name}.tmp")
+    tmp.write_bytes(pdf)
+    tmp.replace(output)  # viewers that auto-reload never see half a file
+    print(f"Rendered {output}: {len(paths)} posts, {pages} pages in {time.perf_counter() - start:.2f}s")
+
+
+def snapshot(paths):
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = path.stat().st_mtime_ns
+        except OSError:  # removed since it was listed
+            pass
+    return mtimes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a preview PDF of recent posts.")
+    when = parser.add_mutually_exclusive_group()
+    when.add_argument("--weeks", type=int, help=f"the last N weeks (default: {DEFAULT_WEEKS})")
+    when.add_argument("--month", help="one month, YYYY-MM")
+    when.add_argument("--from", dest="start", help="first day, YYYY-MM-DD (with or without --to)")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--category", choices=CATEGORIES, help="only this category (US = A and D)")
+    parser.add_argument("-o", "--output", type=Path, default=Path("preview.pdf"),
+                        help="PDF to write (default: preview.pdf)")
+    parser.add_argument("--watch", action="store_true", help="re-render when a post in the window changes")
+    args = parser.parse_args()
+
+    if args.end and (args.weeks or args.month):
+        parser.error("--to goes with --from (or alone), not with --weeks or --month")
+    try:
+        first, last = window(date.today(), args.weeks, args.month, args.start, args.end)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    def posts():
+        found = select_posts(first, last, args.category)
+        if len(found) > MAX_POSTS:
+            parser.error(f"{len(found)} posts between {first} and {last}; "
+                         f"a preview is limited to {MAX_POSTS}, narrow the window")
+        return found
+
+    unavailable = pdf_unavailable()
+    if unavailable:
+        sys.exit(f"preview.py: can't load WeasyPrint: {unavailable}")
+
+    paths = posts()
+    print(f"Previewing {first} to {last}" + (f", category {args.category}" if args.category else ""))
+    render(paths, args.output)
+    if not args.watch:
+        return 0
+
+    seen = snapshot(paths)
+    print("Watching for changes (Ctrl-C to stop)...")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            paths = posts()
+            current = snapshot(paths)
+            if current != seen:
+                seen = current
+                render(paths, args.output)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
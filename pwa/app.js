@@ -1,6 +1,9 @@
 /* ============================================================
    Zoolog PWA
    Client-side journal reader + full-text search. No backend.
+   The page keeps only the entry list (id, date, category, excerpt); the
+   reader requests an entry's prebuilt HTML from the search worker, which
+   keeps the bodies in IndexedDB.
    ============================================================ */
 'use strict';
 
@@ -12,132 +15,83 @@ const CATS = {
   AHNS: { tag: 'AHNS',  label: 'AHNS',    color: 'var(--cat-AHNS)' },
   G:    { tag: 'G',     label: 'Grandpa', color: 'var(--cat-G)' },
 };
-// Filter chips: value -> predicate over category code.
+// Filter chips: value -> the category codes it shows (null = all).
 const FILTERS = [
-  { key: 'all', label: 'All',     match: () => true },
-  { key: 'US',  label: 'Us',      match: c => c === 'A' || c === 'D' },
-  { key: 'A',   label: 'A',       match: c => c === 'A' },
-  { key: 'D',   label: 'D',       match: c => c === 'D' },
-  { key: 'J',   label: 'Uncle J', match: c => c === 'J' },
-  { key: 'AHNS',label: 'AHNS',    match: c => c === 'AHNS' },
-  { key: 'G',   label: 'Grandpa', match: c => c === 'G' },
+  { key: 'all', label: 'All',     cats: null },
+  { key: 'US',  label: 'Us',      cats: ['A', 'D'] },
+  { key: 'A',   label: 'A',       cats: ['A'] },
+  { key: 'D',   label: 'D',       cats: ['D'] },
+  { key: 'J',   label: 'Uncle J', cats: ['J'] },
+  { key: 'AHNS',label: 'AHNS',    cats: ['AHNS'] },
+  { key: 'G',   label: 'Grandpa', cats: ['G'] },
 ];
 
 /* ---------- State ---------- */
-let ALL = [];              // all entries, ascending by date
-let display = [];          // current filtered list, in display order
-let ascList = [];          // current filtered list, ascending by date (reader nav)
-let ascPos = new Map();    // entry.i -> index within ascList
+let ALL = [];              // all entries as { i, d, c, x } (x: excerpt; no bodies), ascending by date
+let display = [];          // current result ids, newest first (ids ascend with date)
+let resultsDone = true;    // false while the worker is still streaming `display`
 let renderedCount = 0;
-let lastMonthRendered = null;
+let lastMonthRendered = null; // MONTHS index of the last heading in the feed
 
 const state = {
   filter: localStorage.getItem('zl.filter') || 'all',
   query: '',
 };
-let queryParsed = { terms: [], phrases: [] };
 let highlightRe = null;
 
-/* ---------- Search index (lazy) ---------- */
-let index = null;          // Map: token -> int[] (entry indices, ascending)
-let indexBuilding = false;
+/* ---------- Search worker ---------- */
+// Searching and filtering run in search-worker.js; results stream back as
+// batches of entry ids, newest first. Each request carries a sequence number
+// and replies for anything but the latest are dropped.
+const worker = new Worker('search-worker.js');
+let seq = 0;
 
-const TOKEN_RE = /[\p{L}\p{N}]+(?:['’][\p{L}\p{N}]+)*/gu;
-
-function tokenize(text) {
-  const out = [];
-  let m;
-  TOKEN_RE.lastIndex = 0;
-  while ((m = TOKEN_RE.exec(text)) !== null) out.push(m[0].toLowerCase());
-  return out;
-}
-
-function buildIndex() {
-  if (index || indexBuilding) return;
-  indexBuilding = true;
-  const idx = new Map();
-  for (const e of ALL) {
-    const seen = new Set(tokenize(e.b));
-    for (const tok of seen) {
-      let arr = idx.get(tok);
-      if (!arr) { arr = []; idx.set(tok, arr); }
-      arr.push(e.i);
-    }
-  }
-  index = idx;
-  indexBuilding = false;
+function requestResults() {
+  const f = FILTERS.find(x => x.key === state.filter) || FILTERS[0];
+  worker.postMessage({ type: 'search', seq: ++seq, query: state.query, cats: f.cats });
 }
 
-/* ---------- Query parsing & search ---------- */
-function parseQuery(q) {
-  const phrases = [];
-  const terms = [];
-  // Pull out "quoted phrases" first.
-  const re = /"([^"]+)"/g;
-  let m;
-  let rest = q;
-  while ((m = re.exec(q)) !== null) {
-    const p = m[1].trim().toLowerCase();
-    if (p) phrases.push(p);
-  }
-  rest = q.replace(/"[^"]*"/g, ' ');
-  for (const t of tokenize(rest)) terms.push(t);
-  return { terms, phrases };
-}
+// Full entries ({ i, d, c, b, h }) for ids, in order, read by the worker from
+// IndexedDB (or the network on first use).
+const pendingEntries = new Map(); // req -> { resolve, reject }
+let entriesReq = 0;
 
-function postingsForPrefix(prefix) {
-  // Union of postings for every indexed token starting with `prefix`.
-  const exact = index.get(prefix);
-  const set = new Set(exact || []);
-  // Also include longer tokens with this prefix (search-as-you-type).
-  for (const [tok, arr] of index) {
-    if (tok.length > prefix.length && tok.startsWith(prefix)) {
-      for (const id of arr) set.add(id);
-    }
-  }
-  return set;
+function fetchEntries(ids) {
+  return new Promise((resolve, reject) => {
+    const req = ++entriesReq;
+    pendingEntries.set(req, { resolve, reject });
+    worker.postMessage({ type: 'entries', req, ids });
+  });
 }
 
-function runSearch() {
-  // Returns a Set of entry indices, or null for "no query".
-  const { terms, phrases } = queryParsed;
-  if (!terms.length && !phrases.length) return null;
-  if (!index) buildIndex();
-
-  let candidate = null; // Set of ids
-  for (const term of terms) {
-    const docs = postingsForPrefix(term);
-    if (candidate === null) candidate = docs;
-    else candidate = intersect(candidate, docs);
-    if (candidate.size === 0) return candidate;
-  }
-
-  if (phrases.length) {
-    const ids = candidate === null ? ALL.map(e => e.i) : [...candidate];
-    const result = new Set();
-    for (const id of ids) {
-      const body = ALL[id].b.toLowerCase();
-      if (phrases.every(p => body.includes(p))) result.add(id);
-    }
-    return result;
+worker.onmessage = ev => {
+  const m = ev.data;
+  if (m.type === 'entries') {
+    const p = pendingEntries.get(m.req);
+    pendingEntries.delete(m.req);
+    if (p) m.error ? p.reject(new Error(m.error)) : p.resolve(m.entries);
+    return;
   }
-  return candidate;
-}
-
-function intersect(a, b) {
-  const [small, big] = a.size <= b.size ? [a, b] : [b, a];
-  const out = new Set();
-  for (const x of small) if (big.has(x)) out.add(x);
-  return out;
-}
+  if (m.type !== 'results' || m.seq !== seq) return;
+  if (m.first) startFeed(m.parsed);
+  for (const id of m.ids) display.push(id);
+  resultsDone = m.done;
+  if (renderedCount < BATCH) appendBatch();
+  else io.observe(sentinel);
+  if (m.done) updateFeedStatus();
+};
 
 /* ---------- Highlight ---------- */
 function escapeRe(s) { return s.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'); }
 
-function buildHighlightRe() {
-  const { terms, phrases } = queryParsed;
+function buildHighlightRe({ terms, phrases }) {
   const parts = [];
-  for (const p of phrases) parts.push(escapeRe(p));
+  for (const p of phrases) {
+    // An exact phrase may be split by punctuation or a line wrap; a loose one
+    // just highlights its words.
+    if (p.slop) for (const t of p.toks) parts.push(escapeRe(t));
+    else parts.push(p.toks.map(escapeRe).join("[^\\p{L}\\p{N}]+"));
+  }
   for (const t of terms) parts.push(escapeRe(t) + "[\\p{L}\\p{N}'’]*"); // prefix
   if (!parts.length) { highlightRe = null; return; }
   // Longest first so phrases win over their constituent words.
@@ -179,74 +133,23 @@ function parseDate(s) {
 const fmtCard = new Intl.DateTimeFormat(undefined, { weekday: 'short', month: 'short', day: 'numeric', year: 'numeric' });
 const fmtFull = new Intl.DateTimeFormat(undefined, { weekday: 'long', month: 'long', day: 'numeric', year: 'numeric' });
 const fmtMonth = new Intl.DateTimeFormat(undefined, { month: 'long', year: 'numeric' });
-function monthKey(s) { return s.slice(0, 7); }
 
-/* ---------- Markdown-ish renderer ---------- */
-function escapeHtml(s) {
-  return s.replace(/[&<>"]/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;' }[c]));
-}
-function inlineMd(s) {
-  s = escapeHtml(s);
-  s = s.replace(/\[([^\]]+)\]\((https?:\/\/[^\s)]+)\)/g,
-    '<a href="$2" target="_blank" rel="noopener">$1</a>');
-  s = s.replace(/\*\*([^*]+)\*\*/g, '<strong>$1</strong>');
-  s = s.replace(/(^|[^*])\*([^*\n]+)\*(?!\*)/g, '$1<em>$2</em>');
-  return s;
-}
-// The source text is hard-wrapped at ~74 chars. A line is a *soft wrap*
-// (continuation of the same sentence) when it is "full"; a noticeably short
-// line is an intentional break — a list item, a line of dialogue, or the end
-// of a paragraph. We rejoin soft wraps with spaces and keep intentional breaks.
-const WRAP = 64;
-
-function dewrap(lines) {
-  const out = [];
-  let cur = '';
-  for (let i = 0; i < lines.length; i++) {
-    const line = lines[i].replace(/\s+$/, '');
-    cur += (cur ? ' ' : '') + line.trim();
-    const full = line.length >= WRAP;
-    if (i === lines.length - 1 || !full) {
-      out.push(cur);
-      cur = '';
-    }
-  }
-  return out.filter(s => s.length);
-}
+// Month groups from list.json, oldest-first: { start: first entry id, label }.
+let MONTHS = [];
 
-function renderBody(text) {
-  const blocks = text.replace(/\r/g, '').split(/\n{2,}/);
-  const html = [];
-  for (const block of blocks) {
-    if (!block.trim()) continue;
-    const lines = block.split('\n');
-    if (lines.every(l => /^\s*[-*]\s+/.test(l))) {
-      html.push('<ul>' + lines.map(l =>
-        '<li>' + inlineMd(l.replace(/^\s*[-*]\s+/, '').trim()) + '</li>').join('') + '</ul>');
-    } else if (/^#{1,6}\s+/.test(lines[0])) {
-      html.push('<h3>' + inlineMd(lines[0].replace(/^#{1,6}\s+/, '').trim()) + '</h3>');
-    } else {
-      html.push('<p>' + dewrap(lines).map(inlineMd).join('<br>') + '</p>');
-    }
-  }
-  return html.join('');
-}
-function excerpt(text, n = 180) {
-  const flat = text.replace(/\s+/g, ' ').trim();
-  return flat.length > n ? flat.slice(0, n).trimEnd() + '…' : flat;
+function buildMonths(groups) {
+  MONTHS = groups.map(([key, start]) => ({ start, label: fmtMonth.format(parseDate(key + '-01')) }));
 }
 
-/* ---------- List computation ---------- */
-function recompute() {
-  const f = FILTERS.find(x => x.key === state.filter) || FILTERS[0];
-  const searchSet = runSearch();
-  let list = ALL.filter(e => f.match(e.c) && (searchSet === null || searchSet.has(e.i)));
-  // ascending list for reader navigation
-  ascList = list;
-  ascPos = new Map();
-  ascList.forEach((e, i) => ascPos.set(e.i, i));
-  // Feed always shows newest first; ascList stays ascending for reader nav.
-  display = [...list].reverse();
+// Index into MONTHS of the group containing entry id.
+function monthOf(id) {
+  let lo = 0, hi = MONTHS.length - 1;
+  while (lo < hi) {
+    const mid = (lo + hi + 1) >>> 1;
+    if (MONTHS[mid].start <= id) lo = mid;
+    else hi = mid - 1;
+  }
+  return lo;
 }
 
 /* ---------- Feed rendering ---------- */
@@ -273,7 +176,7 @@ function cardEl(e) {
   meta.append(date, tag);
   const ex = document.createElement('p');
   ex.className = 'card__excerpt';
-  ex.textContent = excerpt(e.b);
+  ex.textContent = e.x;
   if (highlightRe) highlightInto(ex);
   btn.append(meta, ex);
   return btn;
@@ -290,27 +193,39 @@ function appendBatch() {
   const frag = document.createDocumentFragment();
   const end = Math.min(renderedCount + BATCH, display.length);
   for (let i = renderedCount; i < end; i++) {
-    const e = display[i];
-    const mk = monthKey(e.d);
-    if (mk !== lastMonthRendered) {
-      lastMonthRendered = mk;
-      frag.appendChild(monthHeadEl(fmtMonth.format(parseDate(e.d))));
+    const e = ALL[display[i]];
+    const month = monthOf(e.i);
+    if (month !== lastMonthRendered) {
+      lastMonthRendered = month;
+      frag.appendChild(monthHeadEl(MONTHS[month].label));
     }
     frag.appendChild(cardEl(e));
   }
   feedList.appendChild(frag);
   renderedCount = end;
-  if (renderedCount >= display.length) io.unobserve(sentinel);
+  if (renderedCount >= display.length && resultsDone) io.unobserve(sentinel);
   else io.observe(sentinel);
 }
 
+// Ask the worker for the current query/filter. The old feed stays up until
+// the first batch of new results arrives (startFeed).
 function renderFeed() {
-  recompute();
+  resultsDone = false;
+  requestResults();
+}
+
+function startFeed(parsed) {
+  display = [];
+  buildHighlightRe(parsed);
   feedList.innerHTML = '';
   renderedCount = 0;
   lastMonthRendered = null;
   io.unobserve(sentinel);
+  feedStatus.textContent = '';
+  feedEmpty.hidden = true;
+}
 
+function updateFeedStatus() {
   const n = display.length;
   if (state.query) {
     feedStatus.textContent = n
@@ -324,7 +239,6 @@ function renderFeed() {
     document.getElementById('feed-empty-text').textContent =
       `Nothing matches “${state.query.trim()}”.`;
   }
-  appendBatch();
 }
 
 const io = new IntersectionObserver(entries => {
@@ -336,7 +250,7 @@ const reader = document.getElementById('reader');
 const readerScroll = document.getElementById('reader-scroll');
 let currentId = null;
 
-function openReader(id) {
+async function openReader(id) {
   const e = ALL[id];
   if (!e) return;
   currentId = id;
@@ -355,22 +269,47 @@ function openReader(id) {
 
   document.getElementById('reader-date').textContent = fmtFull.format(parseDate(e.d));
   const body = document.getElementById('reader-body');
-  body.innerHTML = renderBody(e.b);
-  if (highlightRe) highlightInto(body);
+  body.innerHTML = '';
 
-  // Position + neighbors within the current ascending list.
-  const pos = ascPos.has(id) ? ascPos.get(id) : -1;
+  // Position + neighbors within the current results (display is newest first).
+  const k = displayIndex(id);
+  const n = display.length;
   const posEl = document.getElementById('reader-pos');
-  posEl.textContent = pos >= 0 ? `${pos + 1} / ${ascList.length}` : '';
+  posEl.textContent = k >= 0 ? `${n - k} / ${n}` : '';
 
-  const prevEntry = pos > 0 ? ascList[pos - 1] : null;            // earlier (older)
-  const nextEntry = pos >= 0 && pos < ascList.length - 1 ? ascList[pos + 1] : null; // later (newer)
+  const prevEntry = k >= 0 && k < n - 1 ? ALL[display[k + 1]] : null; // earlier (older)
+  const nextEntry = k > 0 ? ALL[display[k - 1]] : null;               // later (newer)
   wireNav('reader-prev', 'reader-prev-date', prevEntry);
   wireNav('reader-next', 'reader-next-date', nextEntry);
 
   reader.hidden = false;
   document.body.style.overflow = 'hidden';
   readerScroll.scrollTop = 0;
+
+  let full = null;
+  try {
+    [full] = await fetchEntries([id]);
+  } catch (err) {
+    // fall through to the message below
+  }
+  if (currentId !== id) return; // navigated away meanwhile
+  if (full) {
+    body.innerHTML = full.h;
+    if (highlightRe) highlightInto(body);
+  } else {
+    body.textContent = 'Could not load this entry.';
+  }
+}
+
+// Index of entry id in display (binary search; display descends), or -1.
+function displayIndex(id) {
+  let lo = 0, hi = display.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (display[mid] > id) lo = mid + 1;
+    else hi = mid;
+  }
+  return display[lo] === id ? lo : -1;
 }
 
 function wireNav(btnId, dateId, entry) {
@@ -466,8 +405,6 @@ function setupSearch() {
   let timer = null;
   function apply() {
     state.query = input.value;
-    queryParsed = parseQuery(state.query);
-    buildHighlightRe();
     clear.hidden = !input.value;
     renderFeed();
   }
@@ -531,18 +468,24 @@ async function boot() {
   setupSearch();
   wireGlobal();
 
+  let list;
   try {
     // no-cache => always revalidate with the server (cheap 304 when unchanged,
     // full download when the bundle was rebuilt). The service worker serves the
     // cached copy when offline.
-    const res = await fetch('data/posts.json', { cache: 'no-cache' });
-    ALL = await res.json();
+    const res = await fetch('data/list.json', { cache: 'no-cache' });
+    list = await res.json();
+    ALL = list.entries;
+    buildMonths(list.months);
   } catch (err) {
     feedStatus.textContent = 'Could not load the journal data.';
     document.getElementById('splash').classList.add('hide');
     return;
   }
 
+  // The worker loads bodies and the index itself, from IndexedDB when the
+  // stored copy matches this bundle version.
+  worker.postMessage({ type: 'init', version: list.version, years: list.years, cats: ALL.map(e => e.c) });
   renderFeed();
   initRoute(); // honor deep links
 
@@ -550,10 +493,6 @@ async function boot() {
   splash.classList.add('hide');
   setTimeout(() => splash.remove(), 450);
 
-  // Warm the search index during idle time so the first search is instant.
-  const idle = window.requestIdleCallback || (cb => setTimeout(cb, 200));
-  idle(buildIndex);
-
   if ('serviceWorker' in navigator && !/[?&]nosw/.test(location.search)) {
     navigator.serviceWorker.register('sw.js').catch(() => {});
   }
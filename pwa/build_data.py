@@ -9,12 +9,22 @@ Build the static data bundle for the Zoolog PWA.
 Reads every ../posts/*.txt entry, decodes quoted-printable, parses the
 date/category header, and emits:
 
-  data/posts.json  - array of entries [{i, d, c, b}, ...] sorted oldest-first
-  data/meta.json   - counts, category breakdown, date range, build time
+  data/list.json   - {version, years, months, entries: [{i, d, c, x}, ...]}
+                     sorted oldest-first; everything the feed needs (x is the
+                     card excerpt), no bodies. years maps each year to
+                     [first id, count, year version]
+  data/years/YYYY.json - {version, year, entries: [{i, d, c, b, h}, ...]}, the
+                     full entries of one year (h is the reader HTML); version
+                     is the year's own, so adding a post only changes its year
+  data/index.json  - inverted search index over the bodies (see build_index)
+  data/positions.json - token positions for phrase/proximity search
+  data/meta.json   - version, counts, category breakdown, date range, build time
 
-The PWA loads posts.json once, builds a client-side search index, and caches
-it for offline use. No server required.
+The PWA loads list.json at startup and fetches a year's bodies, the index and
+the positions only when needed, keeping them in IndexedDB tagged with the
+bundle version. No server required.
 """
+import hashlib
 import json
 import quopri
 import re
@@ -32,6 +42,26 @@ DATA_DIR = ROOT / "data"
 # on the filename for the category and only use the header for the date.
 CATEGORY_PRIORITY = ("AHNS", "J", "G", "D", "A")
 
+# Must match TOKEN_RE in search-worker.js: runs of letters/digits, with inner apostrophes.
+TOKEN_RE = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+
+# The source text is hard-wrapped at ~74 chars. A line is a *soft wrap*
+# (continuation of the same sentence) when it is "full"; a noticeably short
+# line is an intentional break — a list item, a line of dialogue, or the end
+# of a paragraph. render_body rejoins soft wraps and keeps intentional breaks.
+WRAP = 64
+EXCERPT_CHARS = 180
+
+# Part of every version hash: bump when the data layout or rendering changes so
+# unchanged entries still get rewritten and clients refetch them.
+BUNDLE_FORMAT = 1
+
+LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+BOLD_RE = re.compile(r"\*\*([^*]+)\*\*")
+EM_RE = re.compile(r"(^|[^*])\*([^*\n]+)\*(?!\*)")
+LIST_ITEM_RE = re.compile(r"^\s*[-*]\s+")
+HEADING_RE = re.compile(r"^#{1,6}\s+")
+
 HEADER_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
 DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
 
@@ -90,6 +120,132 @@ def parse_entry(path: Path):
     return date_str, category, body
 
 
+def escape_html(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def inline_md(s: str) -> str:
+    s = escape_html(s)
+    s = LINK_RE.sub(r'<a href="\2" target="_blank" rel="noopener">\1</a>', s)
+    s = BOLD_RE.sub(r"<strong>\1</strong>", s)
+    s = EM_RE.sub(r"\1<em>\2</em>", s)
+    return s
+
+
+def js_length(s: str) -> int:
+    """String length in UTF-16 code units, as the reader measured it in JS."""
+    return len(s.encode("utf-16-le")) // 2
+
+
+def dewrap(lines: list[str]) -> list[str]:
+    out, cur = [], ""
+    for n, line in enumerate(lines):
+        line = line.rstrip()
+        cur += (" " if cur else "") + line.strip()
+        if n == len(lines) - 1 or js_length(line) < WRAP:
+            out.append(cur)
+            cur = ""
+    return [s for s in out if s]
+
+
+def render_body(text: str) -> str:
+    """Reader HTML for a markdown-ish body: paragraphs, bullet lists, headings,
+    links, bold and italics."""
+    html = []
+    for block in re.split(r"\n{2,}", text.replace("\r", "")):
+        if not block.strip():
+            continue
+        lines = block.split("\n")
+        if all(LIST_ITEM_RE.match(line) for line in lines):
+            html.append("<ul>" + "".join(
+                "<li>" + inline_md(LIST_ITEM_RE.sub("", line, count=1).strip()) + "</li>"
+                for line in lines
+            ) + "</ul>")
+        elif HEADING_RE.match(lines[0]):
+            html.append("<h3>" + inline_md(HEADING_RE.sub("", lines[0], count=1).strip()) + "</h3>")
+        else:
+            html.append("<p>" + "<br>".join(inline_md(s) for s in dewrap(lines)) + "</p>")
+    return "".join(html)
+
+
+def excerpt(text: str, n: int = EXCERPT_CHARS) -> str:
+    flat = " ".join(text.split())
+    return flat[:n].rstrip() + "…" if len(flat) > n else flat
+
+
+def tokenize(text: str) -> list[str]:
+    return [m.group(0).lower() for m in TOKEN_RE.finditer(text)]
+
+
+def build_index(entries: list[dict]) -> tuple[dict, dict]:
+    """Inverted index over entry bodies, plus token positions.
+
+    The index has:
+      vocab     every distinct token, sorted by UTF-16 code units (the order JS
+                string comparison uses) so the client can binary-search a prefix
+                to a contiguous range
+      df        number of entries containing vocab[t]
+      postings  for each token in vocab order, its ascending entry ids as gaps
+                from the previous id (the first gap is from -1), all concatenated
+
+    The positions are aligned with the postings, one group per (token, entry):
+      tf        number of occurrences of the token in the entry
+      pos       the token's ordinal positions in the entry's token stream, as
+                gaps (the first from -1), all concatenated
+    """
+    index: dict[str, dict[int, list[int]]] = {}
+    for e in entries:
+        for position, tok in enumerate(tokenize(e["b"])):
+            index.setdefault(tok, {}).setdefault(e["i"], []).append(position)
+
+    vocab = sorted(index, key=lambda t: t.encode("utf-16-be"))
+    df, postings, tf, pos = [], [], [], []
+    for tok in vocab:
+        docs = index[tok]  # insertion order is ascending: entries are visited in id order
+        df.append(len(docs))
+        prev = -1
+        for i, positions in docs.items():
+            postings.append(i - prev)
+            prev = i
+            tf.append(len(positions))
+            last = -1
+            for p in positions:
+                pos.append(p - last)
+                last = p
+    return {"vocab": vocab, "df": df, "postings": postings}, {"tf": tf, "pos": pos}
+
+
+def bundle_version(entries: list[dict]) -> str:
+    """Content hash of the entries; clients drop cached data from other versions."""
+    digest = hashlib.sha256(f"{BUNDLE_FORMAT}\0".encode("utf-8"))
+    for e in entries:
+        digest.update(f"{e['i']}\0{e['d']}\0{e['c']}\0{e['b']}\0".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def group_years(entries: list[dict]) -> dict[str, list]:
+    """Year -> [first entry id, entry count, year version]. Ids ascend with
+    date, so each year is one contiguous id range."""
+    years: dict[str, list] = {}
+    for e in entries:
+        span = years.setdefault(e["d"][:4], [e["i"], 0])
+        span[1] += 1
+    for span in years.values():
+        span.append(bundle_version(entries[span[0]:span[0] + span[1]]))
+    return years
+
+
+def group_months(entries: list[dict]) -> list[list]:
+    """[["YYYY-MM", first entry id, entry count], ...] oldest-first; the feed
+    places its month headings from these instead of comparing dates."""
+    months: list[list] = []
+    for e in entries:
+        if not months or months[-1][0] != e["d"][:7]:
+            months.append([e["d"][:7], e["i"], 0])
+        months[-1][2] += 1
+    return months
+
+
 def main() -> int:
     if not POSTS_DIR.exists():
         print(f"Posts directory not found: {POSTS_DIR}")
@@ -111,18 +267,67 @@ def main() -> int:
         e_with_id = {"i": i, "d": e["d"], "c": e["c"], "b": e["b"]}
         entries[i] = e_with_id
 
+    version = bundle_version(entries)
+    years = group_years(entries)
+
     DATA_DIR.mkdir(exist_ok=True)
-    posts_path = DATA_DIR / "posts.json"
-    posts_path.write_text(
-        json.dumps(entries, ensure_ascii=False, separators=(",", ":")),
+    years_dir = DATA_DIR / "years"
+    years_dir.mkdir(exist_ok=True)
+    for stale in years_dir.glob("*.json"):
+        if stale.stem not in years:
+            stale.unlink()
+    rewritten = 0
+    for year, (first, count, year_version) in years.items():
+        year_path = years_dir / f"{year}.json"
+        if year_path.exists() and f'"version":"{year_version}"' in year_path.read_text(encoding="utf-8")[:64]:
+            continue  # unchanged: keep the file (and its cache validators) as is
+        full = [dict(e, h=render_body(e["b"])) for e in entries[first:first + count]]
+        year_path.write_text(
+            json.dumps(
+                {"version": year_version, "year": year, "entries": full},
+                ensure_ascii=False, separators=(",", ":"),
+            ),
+            encoding="utf-8",
+        )
+        rewritten += 1
+
+    list_path = DATA_DIR / "list.json"
+    index_path = DATA_DIR / "index.json"
+    positions_path = DATA_DIR / "positions.json"
+    meta_path = DATA_DIR / "meta.json"
+    if all(p.exists() for p in (list_path, index_path, positions_path)) and meta_path.exists() \
+            and json.loads(meta_path.read_text(encoding="utf-8")).get("version") == version:
+        # Nothing in the bundle changed (e.g. zoomail's batch held no new entries):
+        # leave list, index and positions alone so clients keep their cached copies
+        print(f"Bundle {version} unchanged ({len(entries)} entries, {rewritten} of {len(years)} year files rewritten)")
+        return 0
+
+    listing = {
+        "version": version,
+        "years": years,
+        "months": group_months(entries),
+        "entries": [{"i": e["i"], "d": e["d"], "c": e["c"], "x": excerpt(e["b"])} for e in entries],
+    }
+    list_path.write_text(
+        json.dumps(listing, ensure_ascii=False, separators=(",", ":")),
         encoding="utf-8",
     )
 
+    index, positions = build_index(entries)
+    index_path.write_text(
+        json.dumps(index, ensure_ascii=False, separators=(",", ":")),
+        encoding="utf-8",
+    )
+    positions_path.write_text(
+        json.dumps(positions, separators=(",", ":")), encoding="utf-8"
+    )
+
     counts: dict[str, int] = {}
     for e in entries:
         counts[e["c"]] = counts.get(e["c"], 0) + 1
 
     meta = {
+        "version": version,
         "count": len(entries),
         "categories": counts,
         "date_range": {
@@ -131,12 +336,18 @@ def main() -> int:
         },
         "built": datetime.now().isoformat(timespec="seconds"),
     }
-    (DATA_DIR / "meta.json").write_text(
+    meta_path.write_text(
         json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8"
     )
 
-    size_mb = posts_path.stat().st_size / (1024 * 1024)
-    print(f"Wrote {len(entries)} entries ({size_mb:.2f} MB) to {posts_path}")
+    list_kb = list_path.stat().st_size / 1024
+    print(f"Wrote {len(entries)} entries ({list_kb:.0f} KB) to {list_path}")
+    years_mb = sum(p.stat().st_size for p in years_dir.glob("*.json")) / (1024 * 1024)
+    print(f"Wrote {rewritten} of {len(years)} year files ({years_mb:.2f} MB total) to {years_dir}")
+    index_mb = index_path.stat().st_size / (1024 * 1024)
+    print(f"Wrote {len(index['vocab'])} index terms ({index_mb:.2f} MB) to {index_path}")
+    positions_mb = positions_path.stat().st_size / (1024 * 1024)
+    print(f"Wrote {len(positions['pos'])} token positions ({positions_mb:.2f} MB) to {positions_path}")
     print(f"Skipped {skipped} unparseable files")
     print(f"Categories: {counts}")
     print(f"Date range: {meta['date_range']['start']} .. {meta['date_range']['end']}")
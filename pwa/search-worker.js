@@ -0,0 +1,440 @@
+/* ============================================================
+   Zoolog PWA — search worker
+   Holds the search index off the main thread and owns the IndexedDB copy
+   of the corpus. The page sends the entry list once, then one message per
+   query; results stream back as batches of entry ids, newest first, and a
+   newer query cancels any older one still in progress. Entry bodies are
+   handed to the page only for the ids it asks for.
+   ============================================================ */
+'use strict';
+
+let CATS = [];             // entry id -> category code (sent by the page)
+let YEARS = {};            // year -> [first entry id, entry count, year version]
+let VERSION = null;        // bundle version from list.json
+let latestSeq = 0;         // seq of the newest query received
+
+const FIRST_BATCH = 60;    // enough to fill the first screen of cards
+const BATCH = 2000;
+
+/* ---------- Search index (prebuilt by build_data.py) ---------- */
+// vocab is sorted (UTF-16 order), so a prefix maps to a contiguous vocab range.
+// postings holds every token's ascending entry ids back to back; token t owns
+// postings[offsets[t] .. offsets[t + 1]).
+let index = null;          // { vocab: string[], offsets: Uint32Array, postings: Int32Array }
+let indexLoading = null;   // Promise while index.json is in flight
+// Token positions for phrase search, fetched on the first quoted query. Posting
+// k (an absolute index into index.postings) owns positions[posOffsets[k] .. posOffsets[k + 1]).
+let positions = null;      // { posOffsets: Uint32Array, positions: Int32Array }
+let positionsLoading = null;
+
+const TOKEN_RE = /[\p{L}\p{N}]+(?:['’][\p{L}\p{N}]+)*/gu;
+
+function tokenize(text) {
+  const out = [];
+  let m;
+  TOKEN_RE.lastIndex = 0;
+  while ((m = TOKEN_RE.exec(text)) !== null) out.push(m[0].toLowerCase());
+  return out;
+}
+
+function decodeIndex(raw) {
+  const { vocab, df, postings: gaps } = raw;
+  const offsets = new Uint32Array(vocab.length + 1);
+  for (let t = 0; t < vocab.length; t++) offsets[t + 1] = offsets[t] + df[t];
+  const postings = new Int32Array(gaps.length);
+  for (let t = 0; t < vocab.length; t++) {
+    let id = -1;
+    for (let k = offsets[t]; k < offsets[t + 1]; k++) postings[k] = (id += gaps[k]);
+  }
+  return { vocab, offsets, postings };
+}
+
+function decodePositions(raw) {
+  const { tf, pos: gaps } = raw;
+  const posOffsets = new Uint32Array(tf.length + 1);
+  for (let k = 0; k < tf.length; k++) posOffsets[k + 1] = posOffsets[k] + tf[k];
+  const out = new Int32Array(gaps.length);
+  for (let k = 0; k < tf.length; k++) {
+    let p = -1;
+    for (let j = posOffsets[k]; j < posOffsets[k + 1]; j++) out[j] = (p += gaps[j]);
+  }
+  return { posOffsets, positions: out };
+}
+
+// Fallback when index.json/positions.json are unavailable (e.g. offline with
+// an older cache): build the same structures from the loaded bodies.
+function buildLocal(entries) {
+  const idx = new Map(); // token -> Map(entry id -> positions)
+  for (const e of entries) {
+    tokenize(e.b).forEach((tok, p) => {
+      let docs = idx.get(tok);
+      if (!docs) { docs = new Map(); idx.set(tok, docs); }
+      let ps = docs.get(e.i);
+      if (!ps) { ps = []; docs.set(e.i, ps); }
+      ps.push(p);
+    });
+  }
+  const vocab = [...idx.keys()].sort();
+  const offsets = new Uint32Array(vocab.length + 1);
+  vocab.forEach((tok, t) => { offsets[t + 1] = offsets[t] + idx.get(tok).size; });
+  const postings = new Int32Array(offsets[vocab.length]);
+  const posOffsets = new Uint32Array(postings.length + 1);
+  const all = [];
+  let k = 0;
+  for (const tok of vocab) {
+    for (const [id, ps] of idx.get(tok)) {
+      postings[k] = id;
+      posOffsets[k + 1] = posOffsets[k] + ps.length;
+      for (const p of ps) all.push(p);
+      k++;
+    }
+  }
+  return { index: { vocab, offsets, postings }, positions: { posOffsets, positions: Int32Array.from(all) } };
+}
+
+// Index and positions must come from the same source to stay aligned.
+async function useLocal() {
+  const years = await Promise.all(Object.keys(YEARS).map(fetchYear));
+  const local = buildLocal(years.flat());
+  index = local.index;
+  positions = local.positions;
+  return index;
+}
+
+function fetchJson(url) {
+  return fetch(url, { cache: 'no-cache' })
+    .then(res => { if (!res.ok) throw new Error(res.status); return res.json(); });
+}
+
+function loadIndex() {
+  if (index) return Promise.resolve(index);
+  if (!indexLoading) {
+    indexLoading = stored('index', 'index', VERSION, () => fetchJson('data/index.json').then(decodeIndex))
+      .then(idx => (index = idx), useLocal)
+      .finally(() => { indexLoading = null; });
+  }
+  return indexLoading;
+}
+
+function loadPositions() {
+  if (positions) return Promise.resolve(positions);
+  if (!positionsLoading) {
+    positionsLoading = loadIndex()
+      .then(() => positions ||
+        stored('index', 'positions', VERSION, () => fetchJson('data/positions.json').then(decodePositions)))
+      .then(p => (positions = p), () => useLocal().then(() => positions))
+      .finally(() => { positionsLoading = null; });
+  }
+  return positionsLoading;
+}
+
+/* ---------- Storage (IndexedDB) ---------- */
+// The corpus and the decoded index persist in IndexedDB, so a launch neither
+// re-downloads nor re-parses them. Every record carries the version it was
+// built from — the year's own version for a year, the bundle version for the
+// index — so after a rebuild only what changed is refetched; stale records are
+// replaced on demand and purged at startup.
+//   years  { key: 'YYYY', version, data: [{ i, d, c, b }, ...] }
+//   index  { key: 'index' | 'positions', version, data: decoded typed arrays }
+// Without IndexedDB (some private modes) everything comes from the network.
+const DB_NAME = 'zoolog';
+const STORES = ['years', 'index'];
+let dbOpening = null;
+
+function openDb() {
+  if (!dbOpening) {
+    dbOpening = new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, 1);
+      req.onupgradeneeded = () => {
+        for (const name of STORES) req.result.createObjectStore(name, { keyPath: 'key' });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    }).catch(() => null);
+  }
+  return dbOpening;
+}
+
+// Run fn(objectStore) in a transaction; resolves to the request's result once
+// the transaction commits, or undefined if IndexedDB is unavailable.
+function idb(store, mode, fn) {
+  return openDb().then(db => db && new Promise((resolve, reject) => {
+    const tx = db.transaction(store, mode);
+    const req = fn(tx.objectStore(store));
+    tx.oncomplete = () => resolve(req ? req.result : undefined);
+    tx.onerror = () => reject(tx.error);
+  })).catch(() => undefined);
+}
+
+// The stored value for key if it is at version, else load() it and store the
+// result (in the background).
+async function stored(store, key, version, load) {
+  const rec = await idb(store, 'readonly', s => s.get(key));
+  if (rec && rec.version === version) return rec.data;
+  const data = await load();
+  idb(store, 'readwrite', s => s.put({ key, version, data }));
+  return data;
+}
+
+function currentVersion(store, key) {
+  if (store === 'index') return VERSION;
+  return YEARS[key] ? YEARS[key][2] : null;
+}
+
+function purgeStale() {
+  for (const store of STORES) {
+    idb(store, 'readwrite', s => {
+      s.openCursor().onsuccess = ev => {
+        const cur = ev.target.result;
+        if (!cur) return;
+        if (cur.value.version !== currentVersion(store, cur.value.key)) cur.delete();
+        cur.continue();
+      };
+    });
+  }
+}
+
+function fetchYear(year) {
+  return stored('years', year, YEARS[year][2], () => fetchJson(`data/years/${year}.json`).then(r => r.entries));
+}
+
+// A few recently read years stay in memory; the rest are read back from
+// IndexedDB when the feed or reader reaches them.
+const YEAR_CACHE = 3;
+const yearCache = new Map(); // year -> Promise of entries, least recently used first
+
+function loadYear(year) {
+  let p = yearCache.get(year);
+  if (p) {
+    yearCache.delete(year);
+  } else {
+    p = fetchYear(year);
+    p.catch(() => { if (yearCache.get(year) === p) yearCache.delete(year); });
+  }
+  yearCache.set(year, p);
+  if (yearCache.size > YEAR_CACHE) yearCache.delete(yearCache.keys().next().value);
+  return p;
+}
+
+function yearOf(id) {
+  for (const year in YEARS) {
+    const [first, count] = YEARS[year];
+    if (id >= first && id < first + count) return year;
+  }
+  return null;
+}
+
+// Full entries for the requested ids, in request order.
+async function entries({ req, ids }) {
+  try {
+    const years = [...new Set(ids.map(yearOf))];
+    if (years.includes(null)) throw new Error('unknown entry');
+    const loaded = new Map(await Promise.all(years.map(async y => [y, await loadYear(y)])));
+    const out = ids.map(id => { const y = yearOf(id); return loaded.get(y)[id - YEARS[y][0]]; });
+    self.postMessage({ type: 'entries', req, entries: out });
+  } catch (err) {
+    self.postMessage({ type: 'entries', req, error: String(err) });
+  }
+}
+
+/* ---------- Query parsing & search ---------- */
+
+// Returns { terms, phrases: [{ text, toks, slop }] }.
+function parseQuery(q) {
+  const phrases = [];
+  const terms = [];
+  // Pull out "quoted phrases" first; "a b"~N allows up to N words between each.
+  const re = /"([^"]+)"(?:~(\d+))?/g;
+  let m;
+  let rest = q;
+  while ((m = re.exec(q)) !== null) {
+    const toks = tokenize(m[1]);
+    if (toks.length) phrases.push({ text: m[1].trim(), toks, slop: Number(m[2] || 0) });
+  }
+  rest = q.replace(/"[^"]*"(?:~\d+)?/g, ' ');
+  for (const t of tokenize(rest)) terms.push(t);
+  return { terms, phrases };
+}
+
+// First vocab index for which pred(token) is false (pred must be monotone).
+function partitionPoint(pred) {
+  let lo = 0, hi = index.vocab.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (pred(index.vocab[mid])) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// vocab index of exactly `tok`, or -1.
+function exactTerm(tok) {
+  const t = partitionPoint(x => x < tok);
+  return index.vocab[t] === tok ? t : -1;
+}
+
+function postingsOf(t) {
+  return index.postings.subarray(index.offsets[t], index.offsets[t + 1]);
+}
+
+function postingsForPrefix(prefix) {
+  // Ascending ids of entries with any token starting with `prefix`
+  // (search-as-you-type): two binary searches bound the vocab range.
+  const lo = partitionPoint(tok => tok < prefix);
+  const hi = partitionPoint(tok => tok < prefix || tok.startsWith(prefix));
+  if (hi - lo === 1) return postingsOf(lo);
+  if (hi === lo) return new Int32Array(0);
+  // Union of many sorted lists: mark a bitmap over entry ids, then read it
+  // back in order, which is linear in postings + entries and yields a sorted array.
+  const seen = new Uint8Array(CATS.length);
+  let n = 0;
+  for (let t = lo; t < hi; t++) {
+    for (const id of postingsOf(t)) if (!seen[id]) { seen[id] = 1; n++; }
+  }
+  const out = new Int32Array(n);
+  for (let id = 0, k = 0; k < n; id++) if (seen[id]) out[k++] = id;
+  return out;
+}
+
+// Positions of token t in entry id (t's postings must contain id).
+function positionsIn(t, id) {
+  let lo = index.offsets[t], hi = index.offsets[t + 1];
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (index.postings[mid] < id) lo = mid + 1;
+    else hi = mid;
+  }
+  return positions.positions.subarray(positions.posOffsets[lo], positions.posOffsets[lo + 1]);
+}
+
+// Does entry `id` contain tokens ts in order, each within `gap` positions of
+// the previous one (gap 1 = an exact phrase)? Carries forward the positions
+// where the phrase so far can end, merging sorted position lists.
+function phraseAt(id, ts, gap) {
+  let reach = positionsIn(ts[0], id);
+  for (let j = 1; j < ts.length && reach.length; j++) {
+    const cur = positionsIn(ts[j], id);
+    const next = [];
+    let i = 0;
+    for (const p of cur) {
+      while (i < reach.length && reach[i] < p - gap) i++;
+      if (i < reach.length && reach[i] < p) next.push(p);
+    }
+    reach = next;
+  }
+  return reach.length > 0;
+}
+
+function runSearch({ terms, phrases }) {
+  // Returns ascending entry ids (Int32Array).
+
+  // Every phrase word must be present, so its exact postings narrow the
+  // candidates before any positions are read.
+  const lists = terms.map(postingsForPrefix);
+  const checks = [];
+  for (const p of phrases) {
+    const ts = p.toks.map(exactTerm);
+    if (ts.includes(-1)) return new Int32Array(0);
+    for (const t of ts) lists.push(postingsOf(t));
+    if (ts.length > 1) checks.push({ ts, gap: p.slop + 1 });
+  }
+
+  // Intersect the rarest lists first so the running result shrinks fastest.
+  lists.sort((a, b) => a.length - b.length);
+  let candidate = lists[0];
+  for (let i = 1; i < lists.length && candidate.length; i++) candidate = intersect(candidate, lists[i]);
+
+  if (checks.length && candidate.length) {
+    candidate = candidate.filter(id => checks.every(c => phraseAt(id, c.ts, c.gap)));
+  }
+  return candidate;
+}
+
+// Intersection of two ascending id arrays. Gallops through the longer list
+// when the sizes are lopsided, otherwise a plain merge.
+function intersect(a, b) {
+  const [small, big] = a.length <= b.length ? [a, b] : [b, a];
+  const out = new Int32Array(small.length);
+  let n = 0;
+  if (small.length * 8 < big.length) {
+    let lo = 0;
+    for (const x of small) {
+      let hi = big.length;
+      while (lo < hi) {
+        const mid = (lo + hi) >>> 1;
+        if (big[mid] < x) lo = mid + 1;
+        else hi = mid;
+      }
+      if (lo === big.length) break;
+      if (big[lo] === x) out[n++] = x;
+    }
+  } else {
+    let i = 0, j = 0;
+    while (i < small.length && j < big.length) {
+      if (small[i] < big[j]) i++;
+      else if (small[i] > big[j]) j++;
+      else { out[n++] = small[i]; i++; j++; }
+    }
+  }
+  return out.subarray(0, n);
+}
+
+/* ---------- Query handling ---------- */
+const tick = () => new Promise(resolve => setTimeout(resolve, 0));
+
+// Post ids (ascending) back newest-first in batches. Yields between batches
+// so a newer query's message can arrive and cancel this one.
+async function stream(seq, hits, cats, parsed) {
+  const keep = cats ? new Set(cats) : null;
+  const size = hits ? hits.length : CATS.length;
+  const idAt = hits ? (k => hits[k]) : (k => k);
+  let k = size - 1;
+  let first = true;
+  let total = 0;
+  do {
+    const want = first ? FIRST_BATCH : BATCH;
+    const out = new Int32Array(want);
+    let n = 0;
+    for (; k >= 0 && n < want; k--) {
+      const id = idAt(k);
+      if (!keep || keep.has(CATS[id])) out[n++] = id;
+    }
+    total += n;
+    const ids = out.slice(0, n);
+    const done = k < 0;
+    self.postMessage({ type: 'results', seq, first, done, total, ids, parsed: first ? parsed : undefined },
+      [ids.buffer]);
+    first = false;
+    if (!done) await tick();
+  } while (k >= 0 && seq === latestSeq);
+}
+
+async function search({ seq, query, cats }) {
+  await tick(); // let queued keystrokes arrive first
+  if (seq !== latestSeq) return;
+  const parsed = parseQuery(query);
+  let hits = null; // null: no query, every entry
+  if (parsed.terms.length || parsed.phrases.length) {
+    await loadIndex();
+    if (parsed.phrases.length) await loadPositions();
+    if (seq !== latestSeq) return;
+    hits = runSearch(parsed);
+  }
+  await stream(seq, hits, cats, parsed);
+}
+
+self.onmessage = ev => {
+  const msg = ev.data;
+  if (msg.type === 'init') {
+    CATS = msg.cats;
+    YEARS = msg.years;
+    VERSION = msg.version;
+    purgeStale();
+    loadIndex().catch(() => {});
+  } else if (msg.type === 'entries') {
+    entries(msg);
+  } else if (msg.type === 'search') {
+    latestSeq = msg.seq;
+    search(msg);
+  }
+};
@@ -2,8 +2,8 @@
 # Zoolog PWA persistent server. Launched at login by the LaunchAgent
 # ~/Library/LaunchAgents/org.dmd.zoolog-pwa.plist (KeepAlive restarts it).
 #
-# Serves this directory on 127.0.0.1:PORT only; the phone reaches it through the
-# Tailscale HTTPS proxy (https://<machine>.<tailnet>.ts.net). tailscaled persists
+# Serves this directory (its dist/ build) on 127.0.0.1:PORT only; the phone
+# reaches it through the Tailscale HTTPS proxy (https://<machine>.<tailnet>.ts.net). tailscaled persists
 # the serve config across reboots itself, but we re-assert it here as a safety net.
 set -u
 PORT=8123
@@ -19,4 +19,8 @@ for ts in /opt/homebrew/bin/tailscale /usr/local/bin/tailscale \
   fi
 done
 
-exec /usr/bin/python3 -m http.server "$PORT" --bind 127.0.0.1 --directory "$DIR"
+# Serve the build_assets.py output (fingerprinted, precompressed, immutable
+# caching) when there is one, the source directory otherwise.
+SITE="$DIR"
+[ -f "$DIR/dist/assets.json" ] && SITE="$DIR/dist"
+exec /usr/bin/python3 "$DIR/../static_server.py" "$SITE" --port "$PORT" --bind 127.0.0.1
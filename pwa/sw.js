@@ -1,14 +1,17 @@
 /* Zoolog service worker — offline app shell + journal data. */
-const VERSION = 'zoolog-v5';
+const VERSION = 'zoolog-v10';
 const SHELL = [
   '.',
   'index.html',
   'styles.css',
   'app.js',
+  'search-worker.js',
   'manifest.webmanifest',
   'icons/icon-192.png',
-  'data/posts.json',
+  'data/list.json',
 ];
+// Year files, index.json and positions.json are fetched on demand and kept in
+// IndexedDB by search-worker.js; the data route below also caches them here.
 
 self.addEventListener('install', event => {
   event.waitUntil(
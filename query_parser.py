@@ -0,0 +1,364 @@
+"""
+Structured search queries for the Zoolog indexes (web/app.py and tui.py).
+
+A query is a list of whitespace-separated clauses:
+
+    pumpkin              word (stemmed, case/diacritic-insensitive)
+    pump*                prefix
+    "apple picking"      exact phrase
+    -soccer  NOT soccer  exclude posts containing the word/phrase
+    beach OR pool        either side; OR groups bind tighter than the implicit AND
+    category:J           category filter (A, D, J, G, AHNS, or US for A+D)
+    date:2019            date filter: YYYY, YYYY-MM, YYYY-MM-DD,
+    date:2019-06..2020   or a range of those (either end may be omitted)
+
+Every word and phrase is emitted as a double-quoted FTS5 string, so user input
+can never inject FTS5 syntax, and filters become parameterized SQL predicates
+on `posts` that SQLite can satisfy from its indexes.
+
+The same syntax is read in one of three modes (SEARCH_MODES):
+
+    words       whole tokens in posts_fts, stemmed (the default)
+    substring   any part of a word: "umpki" finds pumpkin, via the posts_trigram
+                index (trigram tokenizer); terms under 3 characters, which a
+                trigram index can't look up, fall back to LIKE
+    fuzzy       words, plus, for a word the index lacks or has in only a post
+                or two, the indexed terms within a small edit distance of it,
+                so "pumkin" also finds pumpkin (see Vocabulary)
+"""
+import re
+from collections import Counter
+from datetime import date
+
+CATEGORY_ALIASES = {
+    'a': ('A',),
+    'd': ('D',),
+    'j': ('J',),
+    'unclej': ('J',),
+    'g': ('G',),
+    'grandpa': ('G',),
+    'ahns': ('AHNS',),
+    'us': ('A', 'D'),
+}
+
+FIELDS = ('category', 'cat', 'date')
+
+# One clause: optional '-', then a phrase, a field:value, or a bare word
+CLAUSE_RE = re.compile(r'''
+    (?P<neg>-)?
+    (?:
+        "(?P<phrase>[^"]*)"?
+      | (?P<field>[A-Za-z]+):(?:"(?P<qvalue>[^"]*)"?|(?P<value>\S*))
+      | (?P<word>[^\s"]+)
+    )
+''', re.VERBOSE)
+
+DATE_RE = re.compile(r'^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$')
+
+SEARCH_MODES = ('words', 'substring', 'fuzzy')
+# Shortest string the trigram tokenizer can match
+TRIGRAM_MIN_LENGTH = 3
+# Most vocabulary terms a fuzzy word expands to, closest (then most common) first
+FUZZY_EXPANSIONS = 8
+# A fuzzy word found in at least this many posts is taken as spelled right
+# and not expanded (so "grandma" doesn't also find every "grandpa" post)
+FUZZY_KNOWN_DOCS = 3
+# posts_vocab holds Porter stems ("pumpkins" is indexed as pumpkin), so a word
+# is also compared without these endings: (suffix, replacement)
+STEM_SUFFIXES = (('ies', 'i'), ('ied', 'i'), ('ing', ''), ('es', ''), ('ed', ''), ('ly', ''), ('s', ''))
+
+
+class QueryError(ValueError):
+    """Raised for a well-formed clause with an invalid value (e.g. date:2019-13)."""
+
+
+def fts_string(text):
+    """Quote text as an FTS5 string literal"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _has_token(text):
+    return re.search(r'\w', text) is not None
+
+
+def _period_bounds(value):
+    """Return (start, end_exclusive) ISO dates for YYYY, YYYY-MM or YYYY-MM-DD"""
+    m = DATE_RE.match(value)
+    if not m:
+        raise QueryError(f"Invalid date '{value}'. Use YYYY, YYYY-MM or YYYY-MM-DD")
+    year, month, day = int(m.group(1)), m.group(2), m.group(3)
+    try:
+        if day:
+            start = date(year, int(month), int(day))
+            end = date.fromordinal(start.toordinal() + 1)
+        elif month:
+            start = date(year, int(month), 1)
+            end = date(year + (start.month == 12), start.month % 12 + 1, 1)
+        else:
+            start = date(year, 1, 1)
+            end = date(year + 1, 1, 1)
+    except ValueError as exc:
+        raise QueryError(f"Invalid date '{value}'") from exc
+    return start.isoformat(), end.isoformat()
+
+
+def _date_predicate(value):
+    """SQL predicate and params for a date: filter value"""
+    if '..' in value:
+        lo, hi = value.split('..', 1)
+        conds, params = [], []
+        if lo:
+            conds.append('posts.date >= ?')
+            params.append(_period_bounds(lo)[0])
+        if hi:
+            conds.append('posts.date < ?')
+            params.append(_period_bounds(hi)[1])
+        if not conds:
+            return None, []
+        return ' AND '.join(conds), params
+    start, end = _period_bounds(value)
+    return 'posts.date >= ? AND posts.date < ?', [start, end]
+
+
+def _category_predicate(value):
+    cats = CATEGORY_ALIASES.get(value.lower())
+    if not cats:
+        raise QueryError(f"Unknown category '{value}'")
+    return f"posts.category IN ({', '.join('?' * len(cats))})", list(cats)
+
+
+def _like_pattern(text):
+    return '%' + re.sub(r'([\\%_])', r'\\\1', text) + '%'
+
+
+def _substring_predicate(texts):
+    """SQL predicate and params for posts containing any of texts anywhere"""
+    preds, params = [], []
+    indexed = [t for t in texts if len(t) >= TRIGRAM_MIN_LENGTH]
+    if indexed:
+        preds.append('posts.id IN (SELECT rowid FROM posts_trigram WHERE posts_trigram MATCH ?)')
+        params.append(' OR '.join(fts_string(t) for t in indexed))
+    for text in texts:
+        if len(text) < TRIGRAM_MIN_LENGTH:
+            preds.append("posts.title LIKE ? ESCAPE '\\' OR posts.content LIKE ? ESCAPE '\\'")
+            params.extend([_like_pattern(text)] * 2)
+    return ' OR '.join(preds), params
+
+
+def _word_forms(word):
+    """word and word without each ending in STEM_SUFFIXES"""
+    forms = {word}
+    for suffix, replacement in STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            forms.add(word[:-len(suffix)] + replacement)
+    return forms
+
+
+def _trigrams(word):
+    """Trigrams of word padded with two spaces each side (len(word) + 2 of them)"""
+    padded = f'  {word}  '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def fuzzy_distance(word):
+    """Edit distance a fuzzy search tolerates for word: none for very short words"""
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (an adjacent swap is one edit) between
+    a and b, or limit + 1 as soon as it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = previous[j - 1] + (a[i - 1] != b[j - 1])
+            cost = min(cost, previous[j] + 1, current[j - 1] + 1)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class Vocabulary:
+    """The terms of an index (rows of an fts5vocab table) for fuzzy lookups.
+
+    Terms are indexed by their trigrams. A term within edit distance k of a
+    word shares at least max(len) + 2 - 4k of its padded trigrams (one edit
+    changes at most three, a swap four), so similar() only measures the terms
+    that pass that count instead of the whole vocabulary.
+    """
+
+    def __init__(self, rows):
+        self.terms = []
+        self.docs = []
+        self.grams = {}
+        self.positions = {}
+        for term, docs in rows:
+            if not term.isalpha():
+                continue
+            index = len(self.terms)
+            self.positions[term] = index
+            self.terms.append(term)
+            self.docs.append(docs)
+            for gram in set(_trigrams(term)):
+                self.grams.setdefault(gram, []).append(index)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def doc_count(self, word):
+        """Posts containing word (as typed or without an ending), at most"""
+        return max((self.docs[self.positions[form]] for form in _word_forms(word.lower())
+                    if form in self.positions), default=0)
+
+    def similar(self, word, limit=FUZZY_EXPANSIONS):
+        """Terms within fuzzy_distance(word) of word (or of word without an
+        ending in STEM_SUFFIXES), closest and most common first"""
+        word = word.lower()
+        k = fuzzy_distance(word)
+        if not k:
+            return []
+        forms = _word_forms(word)
+        best = {}
+        for form in forms:
+            grams = _trigrams(form)
+            # A repeated trigram counts once below, so the bound drops by the repeats
+            slack = 4 * k + len(grams) - len(set(grams))
+            shared = Counter()
+            for gram in set(grams):
+                shared.update(self.grams.get(gram, ()))
+            for index, count in shared.items():
+                term = self.terms[index]
+                if term in forms or count < max(len(form), len(term)) + 2 - slack:
+                    continue
+                distance = edit_distance(form, term, k)
+                if distance <= k and distance < best.get(index, k + 1):
+                    best[index] = distance
+        found = sorted((distance, -self.docs[index], self.terms[index]) for index, distance in best.items())
+        return [term for _, _, term in found[:limit]]
+
+
+def parse_query(query, mode='words', vocabulary=None):
+    """Parse a user search query.
+
+    Returns a dict with:
+      match       FTS5 MATCH expression, or None when no text terms remain
+      conditions  SQL predicates on `posts` (to AND into the WHERE clause)
+      params      parameters for `conditions`, in order
+      terms       positive words/phrases, for highlighting
+
+    `mode` is one of SEARCH_MODES. In substring mode the words and phrases
+    become predicates on posts_trigram instead (match is None); in fuzzy mode
+    a plain word found in fewer than FUZZY_KNOWN_DOCS posts also matches the
+    vocabulary.similar() terms. Those are index stems, so they stay out of
+    `terms`. Without a vocabulary, fuzzy searches like words.
+
+    Incomplete clauses (a dangling quote, `category:` with no value) are
+    tolerated so search-as-you-type never errors mid-word; invalid filter
+    values raise QueryError.
+    """
+    if mode not in SEARCH_MODES:
+        raise QueryError(f"Unknown search mode '{mode}'. Choose from: {', '.join(SEARCH_MODES)}")
+    substring = mode == 'substring'
+
+    groups = []      # list of OR-groups; each group is a list of FTS strings (texts in substring mode)
+    excluded = []    # FTS strings (texts) to exclude
+    conditions, params, terms = [], [], []
+    pending_or = False
+    negate_next = False
+
+    for m in CLAUSE_RE.finditer(query or ''):
+        negate = bool(m.group('neg')) or negate_next
+        negate_next = False
+        phrase, field, word = m.group('phrase'), m.group('field'), m.group('word')
+
+        if field is not None and field.lower() in FIELDS:
+            value = (m.group('qvalue') if m.group('qvalue') is not None else m.group('value') or '').strip()
+            if not value:
+                continue
+            if field.lower() == 'date':
+                pred, pred_params = _date_predicate(value)
+                if pred is None:
+                    continue
+            else:
+                pred, pred_params = _category_predicate(value)
+            conditions.append(f'NOT ({pred})' if negate else f'({pred})')
+            params.extend(pred_params)
+            continue
+        if field is not None:
+            # Not a known filter: search for the text as written
+            word = m.group(0).lstrip('-')
+
+        if phrase is not None:
+            text = ' '.join(phrase.split())
+            if not _has_token(text):
+                continue
+            fts = fts_string(text)
+        else:
+            if not negate and word in ('OR', '|'):
+                pending_or = bool(groups)
+                continue
+            if word == 'AND':
+                continue
+            if word == 'NOT':
+                negate_next = True
+                continue
+            prefix = word.endswith('*')
+            text = word.rstrip('*')
+            if not _has_token(text):
+                continue
+            fts = fts_string(text) + ('*' if prefix else '')
+            if (mode == 'fuzzy' and vocabulary is not None and not prefix and not negate
+                    and vocabulary.doc_count(text) < FUZZY_KNOWN_DOCS):
+                similar = vocabulary.similar(text)
+                if similar:
+                    fts = '(' + ' OR '.join([fts] + [fts_string(t) for t in similar]) + ')'
+
+        if substring:
+            fts = text
+        if negate:
+            excluded.append(fts)
+        else:
+            terms.append(text)
+            if pending_or:
+                groups[-1].append(fts)
+            else:
+                groups.append([fts])
+        pending_or = False
+
+    if substring:
+        for group in groups:
+            pred, pred_params = _substring_predicate(group)
+            conditions.append(f'({pred})')
+            params.extend(pred_params)
+        if excluded:
+            pred, pred_params = _substring_predicate(excluded)
+            conditions.append(f'NOT ({pred})')
+            params.extend(pred_params)
+        return {'match': None, 'conditions': conditions, 'params': params, 'terms': terms}
+
+    positive = ' AND '.join(
+        g[0] if len(g) == 1 else '(' + ' OR '.join(g) + ')' for g in groups
+    )
+    negative = ' OR '.join(excluded)
+
+    if positive and negative:
+        match = f'({positive}) NOT ({negative})'
+    elif positive:
+        match = positive
+    else:
+        match = None
+        if negative:
+            # FTS5 NOT is binary, so a purely negative query becomes a predicate
+            conditions.append('posts.id NOT IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)')
+            params.append(negative)
+
+    return {'match': match, 'conditions': conditions, 'params': params, 'terms': terms}
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Small static file server for the PWA (replaces python3 -m http.server).
+
+    ./static_server.py pwa/dist --port 8123 --bind 127.0.0.1
+
+Serves the output of build_assets.py:
+
+- a precompressed sibling (FILE.br, FILE.gz) when the client accepts it;
+  other text files over 1 KB (the data/ bundle, which is rebuilt whenever
+  mail comes in) are compressed on first request and kept in memory until
+  they change
+- fingerprinted names (app.1a2b3c4d5e.js) as Cache-Control: immutable, since
+  their content can never change under that name; everything else (index.html,
+  sw.js, data/) as no-cache, so it is revalidated on every load
+- a strong ETag per file and encoding, answering If-None-Match with 304
+
+Only the standard library is needed (brotli is used for on-the-fly
+compression when installed, gzip otherwise), so it runs under the system
+python3 from serve-daemon.sh.
+"""
+import argparse
+import email.utils
+import gzip
+import mimetypes
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{10}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".webmanifest", ".svg", ".txt", ".map"}
+COMPRESS_MIN_SIZE = 1024
+# On-the-fly compressed bodies kept in memory, by total size
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("text/javascript", ".js")
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q=0 excluded)"""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def precompressed(path, accepted):
+    """(file to send, Content-Encoding or None) for path, preferring .br then .gz"""
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted:
+            candidate = path.with_name(path.name + suffix)
+            if candidate.is_file():
+                return candidate, encoding
+    return path, None
+
+
+def cache_control(name):
+    return IMMUTABLE if FINGERPRINTED.search(name) else REVALIDATE
+
+
+class CompressedCache:
+    """LRU of on-the-fly compressed bodies keyed by (path, mtime, size, encoding)"""
+
+    def __init__(self, limit=MEMORY_CACHE_BYTES):
+        self.limit = limit
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, st, encoding):
+        key = (str(path), st.st_mtime_ns, st.st_size, encoding)
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+                return body
+        data = path.read_bytes()
+        if encoding == "br":
+            body = brotli.compress(data, quality=5)
+        else:
+            body = gzip.compress(data, compresslevel=6, mtime=0)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = body
+                self.size += len(body)
+            while self.size > self.limit and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+        return body
+
+
+COMPRESSED = CompressedCache()
+
+
+class Handler(SimpleHTTPRequestHandler):
+    server_version = "ZoologStatic"
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection for the whole shell
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return super().send_head()  # the usual redirect to dir/
+            path = path / "index.html"
+        if not path.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        source, encoding = precompressed(path, accepted)
+        st = source.stat()
+        body = None
+        if (encoding is None and path.suffix in COMPRESSIBLE and st.st_size >= COMPRESS_MIN_SIZE
+                and accepted & {"br", "gzip"}):
+            encoding = "br" if brotli and "br" in accepted else "gzip" if "gzip" in accepted else None
+            if encoding:
+                body = COMPRESSED.get(path, st, encoding)
+
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}{"-" + encoding if encoding else ""}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+            "Cache-Control": cache_control(path.name),
+        }
+        if path.suffix in COMPRESSIBLE:
+            headers["Vary"] = "Accept-Encoding"
+
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return None
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return _BytesFile(body)
+        self.send_header("Content-Length", str(st.st_size))
+        self.end_headers()
+        return open(source, "rb")
+
+
+class _BytesFile:
+    """What send_head returns for a body already in memory"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size=-1):
+        data, self.data = self.data, b""
+        return data
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a static site with precompressed assets.")
+    parser.add_argument("directory", type=Path, help="directory to serve")
+    parser.add_argument("--port", type=int, default=8123, help="port (default: 8123)")
+    parser.add_argument("--bind", default="127.0.0.1", help="address (default: 127.0.0.1)")
+    args = parser.parse_args()
+    if not args.directory.is_dir():
+        parser.error(f"not a directory: {args.directory}")
+
+    directory = os.fspath(args.directory.resolve())
+
+    class SiteHandler(Handler):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=directory, **kw)
+
+    with ThreadingHTTPServer((args.bind, args.port), SiteHandler) as httpd:
+        print(f"Serving {directory} on http://{args.bind}:{args.port}/", flush=True)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,51 +3,200 @@
 # dependencies = []
 # ///
 
-"""Show zoolog posts from this day in previous years."""
+"""Show zoolog posts from this day in previous years.
 
+    ./today_in_history.py                 # today
+    ./today_in_history.py 09-06           # MM-DD (or YYYY-MM-DD)
+    ./today_in_history.py --range week    # the 7 days starting today
+    ./today_in_history.py --range month   # the whole calendar month
+
+Posts are looked up in a small SQLite index keyed by month-day, stored next
+to this script. The index is refreshed only when the posts directory has
+changed since the last run (adding, removing or renaming a post changes it),
+so a daily run from cron or a widget is near-instant. `--reindex` rebuilds it
+from scratch, e.g. after editing a post in place.
+"""
+
+import argparse
+import calendar
+import os
 import quopri
+import sqlite3
 import sys
-from datetime import date
+from datetime import date, timedelta
 from pathlib import Path
 
 POSTS_DIR = Path(__file__).parent / "posts"
+INDEX_PATH = Path(__file__).parent / ".today_in_history.sqlite"
+
+RANGE_DAYS = {"day": 1, "week": 7}
 
-today = date.today()
-if len(sys.argv) > 1:
-    # Allow overriding with MM-DD or YYYY-MM-DD
-    arg = sys.argv[1]
-    parts = arg.split("-")
-    if len(parts) == 2:
-        today = today.replace(month=int(parts[0]), day=int(parts[1]))
-    elif len(parts) == 3:
-        today = date(int(parts[0]), int(parts[1]), int(parts[2]))
 
-month_day = today.strftime("%m-%d")
+def open_index(path=INDEX_PATH):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS posts (
+            filename TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            author TEXT NOT NULL,
+            body TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_posts_month_day ON posts(month, day, year);
+        CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value);
+    """)
+    return conn
 
-matches = []
-for f in sorted(POSTS_DIR.glob("*.txt")):
+
+def parse_post(path):
+    """Return (year, month, day, author, body) or None if the name doesn't fit"""
     # Filename: YYYY-MM-DD-X-YYYY-MM-DD.txt — use first date
-    name = f.stem
-    parts = name.split("-")
-    if len(parts) >= 4:
-        file_md = f"{parts[1]}-{parts[2]}"
-        if file_md == month_day:
-            year = parts[0]
-            author = parts[3]
-            matches.append((year, author, f))
-
-if not matches:
-    print(f"No posts found for {today.strftime('%B %d')}.")
-    sys.exit(0)
-
-print(f"=== Today in History: {today.strftime('%B %d')} ===\n")
-for year, author, path in matches:
+    parts = path.stem.split("-")
+    if len(parts) < 4:
+        return None
+    try:
+        year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
     raw = path.read_bytes()
-    content = quopri.decodestring(raw).decode("utf-8").strip()
+    content = quopri.decodestring(raw).decode("utf-8", errors="replace").strip()
     # Skip the header line (e.g. "# 2013-09-06 A")
     lines = content.split("\n")
     body = "\n".join(lines[1:]).strip() if len(lines) > 1 else content
-    years_ago = today.year - int(year)
-    print(f"--- {year} ({years_ago} year{'s' if years_ago != 1 else ''} ago) [{author}] ---")
-    print(body)
-    print()
+    return year, month, day, parts[3], body
+
+
+def refresh_index(conn, posts_dir=POSTS_DIR, force=False):
+    """Bring the index in step with posts_dir.
+
+    Skips all work when the directory's mtime matches the last refresh;
+    otherwise re-reads only files that are new or whose mtime changed.
+    """
+    dir_mtime = posts_dir.stat().st_mtime_ns
+    row = conn.execute("SELECT value FROM state WHERE key = 'dir_mtime_ns'").fetchone()
+    if force:
+        conn.execute("DELETE FROM posts")
+    elif row and row[0] == dir_mtime:
+        return
+
+    known = dict(conn.execute("SELECT filename, mtime_ns FROM posts"))
+    seen = set()
+    for entry in os.scandir(posts_dir):
+        if not entry.name.endswith(".txt") or not entry.is_file():
+            continue
+        seen.add(entry.name)
+        mtime = entry.stat().st_mtime_ns
+        if known.get(entry.name) == mtime:
+            continue
+        parsed = parse_post(Path(entry.path))
+        if parsed is None:
+            conn.execute("DELETE FROM posts WHERE filename = ?", (entry.name,))
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO posts (filename, mtime_ns, year, month, day, author, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry.name, mtime, *parsed),
+        )
+    gone = [(name,) for name in known.keys() - seen]
+    conn.executemany("DELETE FROM posts WHERE filename = ?", gone)
+    conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('dir_mtime_ns', ?)", (dir_mtime,))
+    conn.commit()
+
+
+def range_days(target, span):
+    """The dates covered by span ('day', 'week' or 'month') starting at target"""
+    if span == "month":
+        days = calendar.monthrange(target.year, target.month)[1]
+        return [target.replace(day=d) for d in range(1, days + 1)]
+    return [target + timedelta(days=n) for n in range(RANGE_DAYS[span])]
+
+
+def month_days(days):
+    """(month, day) -> the date in `days` it is shown under. Feb 29 posts also
+    show on Feb 28 in non-leap years."""
+    wanted = {(d.month, d.day): d for d in days}
+    for d in days:
+        if (d.month, d.day) == (2, 28) and not calendar.isleap(d.year):
+            wanted.setdefault((2, 29), d)
+    return wanted
+
+
+def find_posts(conn, days):
+    """Posts from any year on the month-days of `days`, grouped by day.
+
+    Returns [(day, [(year, author, body), ...]), ...] for days with posts.
+    """
+    wanted = month_days(days)
+    placeholders = ", ".join("(?, ?)" for _ in wanted)
+    params = [v for md in wanted for v in md]
+    rows = conn.execute(
+        f"SELECT month, day, year, author, body FROM posts "
+        f"WHERE (month, day) IN (VALUES {placeholders}) ORDER BY year, filename",
+        params,
+    )
+    grouped = {d: [] for d in days}
+    for month, day, year, author, body in rows:
+        grouped[wanted[(month, day)]].append((year, author, body))
+    return [(d, posts) for d, posts in grouped.items() if posts]
+
+
+def parse_date_arg(arg, today):
+    # Allow overriding with MM-DD or YYYY-MM-DD
+    parts = arg.split("-")
+    if len(parts) == 2:
+        return today.replace(month=int(parts[0]), day=int(parts[1]))
+    if len(parts) == 3:
+        return date(int(parts[0]), int(parts[1]), int(parts[2]))
+    raise ValueError(arg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show zoolog posts from this day in previous years.")
+    parser.add_argument("date", nargs="?", help="MM-DD or YYYY-MM-DD (default: today)")
+    parser.add_argument("--range", choices=("day", "week", "month"), default="day",
+                        help="one day, the 7 days from the date, or the date's whole month")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the index from scratch")
+    args = parser.parse_args()
+
+    today = date.today()
+    if args.date:
+        try:
+            today = parse_date_arg(args.date, today)
+        except ValueError:
+            parser.error(f"invalid date '{args.date}'; use MM-DD or YYYY-MM-DD")
+
+    if not POSTS_DIR.exists():
+        print(f"Posts directory not found: {POSTS_DIR}")
+        return 1
+    conn = open_index(INDEX_PATH)
+    refresh_index(conn, POSTS_DIR, force=args.reindex)
+    days = range_days(today, args.range)
+    found = find_posts(conn, days)
+
+    if args.range == "day":
+        label = today.strftime('%B %d')
+    elif args.range == "week":
+        label = f"{days[0].strftime('%B %d')} – {days[-1].strftime('%B %d')}"
+    else:
+        label = today.strftime('%B')
+
+    if not found:
+        print(f"No posts found for {label}.")
+        return 0
+
+    print(f"=== Today in History: {label} ===\n")
+    for day, posts in found:
+        if args.range != "day":
+            print(f"##### {day.strftime('%B %d')}\n")
+        for year, author, body in posts:
+            years_ago = day.year - year
+            print(f"--- {year} ({years_ago} year{'s' if years_ago != 1 else ''} ago) [{author}] ---")
+            print(body)
+            print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
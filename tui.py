@@ -30,13 +30,17 @@ from textual.widgets import (
 )
 from textual.widgets.option_list import Option
 
+from query_parser import QueryError, Vocabulary, parse_query
+
 # ---------------------------------------------------------------------------
 # Database helpers (adapted from web/app.py)
 # ---------------------------------------------------------------------------
 
 POSTS_DIR = Path(__file__).parent / "posts"
 DB_URI = "file:zoolog_tui?mode=memory&cache=shared"
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
 _PERSISTENT_CONN: sqlite3.Connection | None = None
+_VOCABULARY: Vocabulary | None = None
 
 
 def _ensure_conn() -> sqlite3.Connection:
@@ -54,12 +58,6 @@ def get_db() -> sqlite3.Connection:
     return conn
 
 
-def _clean(text: str) -> str:
-    if not text:
-        return ""
-    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text)).strip()
-
-
 def _extract(filename: str, content: str) -> dict | None:
     parts = filename.replace(".txt", "").split("-")
     if len(parts) < 6:
@@ -94,8 +92,7 @@ def _extract(filename: str, content: str) -> dict | None:
     excerpt = body[:200] + ("..." if len(body) > 200 else "")
     return dict(
         filename=filename, date=dt, category=cat, title=title,
-        content=body, clean_title=_clean(title), clean_content=_clean(body),
-        excerpt=excerpt, year=dt.year, month=dt.month, day=dt.day,
+        content=body, excerpt=excerpt, year=dt.year, month=dt.month, day=dt.day,
     )
 
 
@@ -104,31 +101,32 @@ def create_db(conn: sqlite3.Connection) -> None:
     c.execute("""CREATE TABLE IF NOT EXISTS posts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         filename TEXT UNIQUE NOT NULL, date TEXT NOT NULL, category TEXT NOT NULL,
-        title TEXT, content TEXT, clean_title TEXT, clean_content TEXT,
+        title TEXT, content TEXT,
         excerpt TEXT, year INTEGER, month INTEGER, day INTEGER,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
-    try:
-        c.execute("ALTER TABLE posts ADD COLUMN clean_title TEXT")
-    except sqlite3.OperationalError:
-        pass
-    try:
-        c.execute("ALTER TABLE posts ADD COLUMN clean_content TEXT")
-    except sqlite3.OperationalError:
-        pass
-    c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
-        filename, clean_title, clean_content, category,
-        content='posts', content_rowid='id')""")
+    c.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        filename, title, content, category,
+        content='posts', content_rowid='id', tokenize='{FTS_TOKENIZER}')""")
+    c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS posts_trigram USING fts5(
+        title, content, content='posts', content_rowid='id', tokenize='trigram')""")
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS posts_vocab USING fts5vocab(posts_fts, row)")
     c.execute("""CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
-        INSERT INTO posts_fts(rowid, filename, clean_title, clean_content, category)
-        VALUES (new.id, new.filename, new.clean_title, new.clean_content, new.category); END""")
+        INSERT INTO posts_fts(rowid, filename, title, content, category)
+        VALUES (new.id, new.filename, new.title, new.content, new.category);
+        INSERT INTO posts_trigram(rowid, title, content) VALUES (new.id, new.title, new.content); END""")
     c.execute("""CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
-        INSERT INTO posts_fts(posts_fts, rowid, filename, clean_title, clean_content, category)
-        VALUES('delete', old.id, old.filename, old.clean_title, old.clean_content, old.category); END""")
+        INSERT INTO posts_fts(posts_fts, rowid, filename, title, content, category)
+        VALUES('delete', old.id, old.filename, old.title, old.content, old.category);
+        INSERT INTO posts_trigram(posts_trigram, rowid, title, content)
+        VALUES('delete', old.id, old.title, old.content); END""")
     c.execute("""CREATE TRIGGER IF NOT EXISTS posts_au AFTER UPDATE ON posts BEGIN
-        INSERT INTO posts_fts(posts_fts, rowid, filename, clean_title, clean_content, category)
-        VALUES('delete', old.id, old.filename, old.clean_title, old.clean_content, old.category);
-        INSERT INTO posts_fts(rowid, filename, clean_title, clean_content, category)
-        VALUES (new.id, new.filename, new.clean_title, new.clean_content, new.category); END""")
+        INSERT INTO posts_fts(posts_fts, rowid, filename, title, content, category)
+        VALUES('delete', old.id, old.filename, old.title, old.content, old.category);
+        INSERT INTO posts_fts(rowid, filename, title, content, category)
+        VALUES (new.id, new.filename, new.title, new.content, new.category);
+        INSERT INTO posts_trigram(posts_trigram, rowid, title, content)
+        VALUES('delete', old.id, old.title, old.content);
+        INSERT INTO posts_trigram(rowid, title, content) VALUES (new.id, new.title, new.content); END""")
     c.execute("CREATE INDEX IF NOT EXISTS idx_posts_date ON posts(date)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_posts_category ON posts(category)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_posts_year_month ON posts(year, month)")
@@ -136,8 +134,10 @@ def create_db(conn: sqlite3.Connection) -> None:
 
 
 def index_posts() -> bool:
+    global _VOCABULARY
     if not POSTS_DIR.exists():
         return False
+    _VOCABULARY = None
     conn = _ensure_conn()
     create_db(conn)
     cur = conn.cursor()
@@ -150,10 +150,9 @@ def index_posts() -> bool:
             info = _extract(f.name, f.read_text("utf-8"))
             if info:
                 cur.execute(
-                    "INSERT INTO posts (filename,date,category,title,content,clean_title,clean_content,excerpt,year,month,day) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                    "INSERT INTO posts (filename,date,category,title,content,excerpt,year,month,day) VALUES (?,?,?,?,?,?,?,?,?)",
                     (info["filename"], info["date"].isoformat(), info["category"],
-                     info["title"], info["content"], info["clean_title"],
-                     info["clean_content"], info["excerpt"],
+                     info["title"], info["content"], info["excerpt"],
                      info["year"], info["month"], info["day"]),
                 )
                 n += 1
@@ -165,21 +164,31 @@ def index_posts() -> bool:
     return True
 
 
-def sanitize_fts(q: str) -> str:
-    if not q:
-        return q
-    for ch in ['*', '(', ')', ':', '"', '-']:
-        q = q.replace(ch, ' ')
-    for op in ['AND', 'OR', 'NOT', 'NEAR']:
-        q = q.replace(f' {op} ', ' ').replace(f' {op.lower()} ', ' ')
-    return ' '.join(q.split())
-
-
 # ---------------------------------------------------------------------------
 # Query helpers
 # ---------------------------------------------------------------------------
 
-def query_posts(search="", category="", start_date="", end_date="", limit=200, offset=0):
+def vocabulary(conn: sqlite3.Connection) -> Vocabulary:
+    """The posts_fts terms, for fuzzy searches; built once per index"""
+    global _VOCABULARY
+    if _VOCABULARY is None:
+        _VOCABULARY = Vocabulary(conn.execute("SELECT term, doc FROM posts_vocab").fetchall())
+    return _VOCABULARY
+
+
+def search_terms(search: str, mode: str = "words") -> list[str]:
+    if not search:
+        return []
+    conn = get_db()
+    try:
+        return parse_query(search, mode, vocabulary(conn) if mode == "fuzzy" else None)["terms"]
+    except QueryError:
+        return []
+    finally:
+        conn.close()
+
+
+def query_posts(search="", category="", start_date="", end_date="", limit=200, offset=0, mode="words"):
     conn = get_db()
     cur = conn.cursor()
     conds, params = [], []
@@ -202,11 +211,21 @@ def query_posts(search="", category="", start_date="", end_date="", limit=200, o
             conds.append("posts.date <= ?")
             params.append(end_date)
 
+    sq = None
     if search:
-        sq = sanitize_fts(search)
-        if not sq:
+        try:
+            parsed = parse_query(search, mode, vocabulary(conn) if mode == "fuzzy" else None)
+        except QueryError:
+            conn.close()
+            return [], 0
+        if not parsed["match"] and not parsed["conditions"]:
             conn.close()
             return [], 0
+        conds += parsed["conditions"]
+        params += parsed["params"]
+        sq = parsed["match"]
+
+    if sq:
         wc = ("AND " + " AND ".join(conds)) if conds else ""
         q = f"SELECT posts.* FROM posts_fts JOIN posts ON posts.id=posts_fts.rowid WHERE posts_fts MATCH ? {wc} ORDER BY date ASC LIMIT ? OFFSET ?"
         cur.execute(q, [sq] + params + [limit, offset])
@@ -254,6 +273,7 @@ def get_stats() -> dict:
 
 CATEGORY_COLORS = {"A": "green", "D": "cyan", "AHNS": "magenta", "J": "yellow", "G": "red", "US": "blue"}
 CATEGORIES = [("All", ""), ("A+D", "US"), ("A", "A"), ("D", "D"), ("AHNS", "AHNS"), ("Uncle J", "J"), ("Grandpa", "G")]
+SEARCH_MODES = [("Words", "words"), ("Substring", "substring"), ("Fuzzy", "fuzzy")]
 
 
 # ---------------------------------------------------------------------------
@@ -281,6 +301,9 @@ class ZoologApp(App):
     #category-select {
         width: 16;
     }
+    #mode-select {
+        width: 15;
+    }
     #date-from {
         width: 16;
     }
@@ -330,6 +353,7 @@ class ZoologApp(App):
         yield Header()
         with Horizontal(id="filter-bar"):
             yield Input(placeholder="Search...", id="search-input")
+            yield Select(SEARCH_MODES, value="words", id="mode-select", allow_blank=False)
             yield Select(CATEGORIES, value="", id="category-select", allow_blank=False)
             yield Input(placeholder="From YYYY-MM-DD", id="date-from")
             yield Input(placeholder="To YYYY-MM-DD", id="date-to")
@@ -343,6 +367,7 @@ class ZoologApp(App):
 
     def on_mount(self) -> None:
         self._search = ""
+        self._mode = "words"
         self._category = ""
         self._date_from = ""
         self._date_to = ""
@@ -357,6 +382,7 @@ class ZoologApp(App):
             category=self._category,
             start_date=self._date_from,
             end_date=self._date_to,
+            mode=self._mode,
         )
         self.call_from_thread(self._update_list, posts, total)
 
@@ -396,6 +422,12 @@ class ZoologApp(App):
             self._debounce_timer.stop()
         self._debounce_timer = self.set_timer(0.3, self.load_posts)
 
+    @on(Select.Changed, "#mode-select")
+    def _mode_changed(self, event: Select.Changed) -> None:
+        self._mode = event.value if event.value != Select.BLANK else "words"
+        if self._search:
+            self.load_posts()
+
     @on(Select.Changed, "#category-select")
     def _cat_changed(self, event: Select.Changed) -> None:
         self._category = event.value if event.value != Select.BLANK else ""
@@ -422,20 +454,19 @@ class ZoologApp(App):
     def _show_post(self, post_id: int) -> None:
         post = get_post(post_id)
         if post:
-            self.call_from_thread(self._render_post, post)
+            terms = search_terms(self._search, self._mode)
+            self.call_from_thread(self._render_post, post, terms)
 
-    def _render_post(self, post: dict) -> None:
+    def _render_post(self, post: dict, terms: list[str]) -> None:
         meta = self.query_one("#viewer-meta", Static)
         body = self.query_one("#viewer-body", Markdown)
         cat = post["category"]
         color = CATEGORY_COLORS.get(cat, "white")
         meta.update(f"[bold]{post['date'][:10]}[/bold]  [{color}][{cat}][/{color}]  [dim]{post['filename']}[/dim]")
         content = post["content"] or ""
-        if self._search:
-            terms = self._search.split()
-            for t in terms:
-                pattern = re.compile(re.escape(t), re.IGNORECASE)
-                content = pattern.sub(lambda m: f"**{m.group()}**", content)
+        for t in terms:
+            pattern = re.compile(re.escape(t), re.IGNORECASE)
+            content = pattern.sub(lambda m: f"**{m.group()}**", content)
         body.update(content)
         self.query_one("#viewer-panel", VerticalScroll).scroll_home()
 
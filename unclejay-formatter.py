@@ -1,17 +1,200 @@
 #!/usr/bin/env python3
+"""Split Uncle J export files into zoolog posts.
 
-from dateutil.parser import parse
-import sys
+    ./unclejay-formatter.py export.txt                    # posts in the current dir
+    ./unclejay-formatter.py -o posts 2013.txt 2014.txt    # several exports at once
+    ./unclejay-formatter.py -o posts --json dump.txt | \\
+        curl -s -H 'Content-Type: application/json' -d @- http://127.0.0.1:8000/api/ingest
+
+An export is a run of entries, each starting with a date line (e.g.
+"9/6/2013") followed by the entry text. Every entry becomes
+YYYY-MM-DD-J-YYYY-MM-DD.txt with a "# YYYY-MM-DD J" header; entries sharing a
+date end up in the same post, in export order, separated by a blank line.
+
+Each export is streamed line by line with one open handle for the post being
+written, and several exports are split in parallel. Posts are assembled in
+temp files and renamed into place, so readers never see a half-written post.
+A post whose content is unchanged is left alone (re-running an import is a
+no-op); new and changed post filenames are printed one per line, or as an
+/api/ingest body with --json, so the indexers only pick up what moved.
+"""
+
+import argparse
+import filecmp
+import json
+import os
 import re
-outfile = None
-with open(sys.argv[1], "r") as fp:
-    for line in fp.readlines():
-        if re.match(r"^\d+/\d+/\d+\s+$", line):
-            date = parse(line).strftime('%Y-%m-%d')
-            # start a new file; add some blank to prev first
-            if outfile:
-                open(outfile, "a").write("\n\n")
-            outfile = f"{date}-J-{date}.txt"
-            open(outfile, "a").write("# " + date + " J\n")
-        else:
-            open(outfile, "a").write(line)
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+
+DATE_LINE = re.compile(r"^\d+/\d+/\d+\s+$")
+MDY = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+# Characters per read when assembling a post from its parts
+COPY_CHUNK = 64 * 1024
+
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@lru_cache(maxsize=None)
+def parse_date(text):
+    """YYYY-MM-DD for an export date line (month/day/year)"""
+    m = MDY.match(text)
+    if m:
+        month, day, year = map(int, m.groups())
+        try:
+            return date(year, month, day).isoformat()
+        except ValueError:
+            pass
+    # Two-digit years and other oddities
+    from dateutil.parser import parse
+    return parse(text).strftime("%Y-%m-%d")
+
+
+def temp_in(directory):
+    """Open a new temp dotfile in directory for writing (text, utf-8)"""
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    os.chmod(tmp, 0o666 & ~UMASK)  # mkstemp creates 0600; match a plain open()
+    return tmp, os.fdopen(fd, "w", encoding="utf-8")
+
+
+def split_export(path, out_dir):
+    """Split one export into temp files in out_dir.
+
+    Returns ([(post filename, temp path), ...] in export order, number of
+    lines skipped before the first date line).
+    """
+    sections = []
+    out = None
+    skipped = 0
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as fp:
+            for line in fp:
+                if DATE_LINE.match(line):
+                    day = parse_date(line.strip())
+                    # start a new file; add some blank to prev first
+                    if out:
+                        out.write("\n\n")
+                        out.close()
+                    tmp, out = temp_in(out_dir)
+                    sections.append((f"{day}-J-{day}.txt", tmp))
+                    out.write(f"# {day} J\n")
+                elif out:
+                    out.write(line)
+                elif line.strip():
+                    skipped += 1
+    except BaseException:
+        if out:
+            out.close()
+        for _, tmp in sections:
+            os.unlink(tmp)
+        raise
+    if out:
+        out.close()
+    return sections, skipped
+
+
+def commit_post(name, parts, out_dir):
+    """Assemble a post from its temp parts and move it into place.
+
+    Returns 'new', 'changed' or 'unchanged'. The parts are consumed.
+    """
+    if len(parts) == 1:
+        tmp = parts[0]
+    else:
+        tmp, out = temp_in(out_dir)
+        with out:
+            tail = ""
+            for part in parts:
+                # A blank line between parts: one that ended its export has none of its own
+                if tail:
+                    out.write("\n" * (2 - (len(tail) - len(tail.rstrip("\n")))))
+                tail = ""
+                with open(part, "r", encoding="utf-8") as f:
+                    while chunk := f.read(COPY_CHUNK):
+                        out.write(chunk)
+                        tail = (tail + chunk)[-2:]
+        for part in parts:
+            os.unlink(part)
+
+    target = out_dir / name
+    if not target.exists():
+        status = "new"
+    elif filecmp.cmp(tmp, target, shallow=False):
+        os.unlink(tmp)
+        return "unchanged"
+    else:
+        status = "changed"
+    os.replace(tmp, target)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split Uncle J export files into zoolog posts.")
+    parser.add_argument("exports", nargs="+", type=Path, help="export file(s), merged in the order given")
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("."),
+                        help="where to write posts (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="exports to split in parallel (default: CPU count)")
+    parser.add_argument("--json", action="store_true",
+                        help='print {"files": [...new and changed...]} for /api/ingest')
+    args = parser.parse_args()
+
+    for export in args.exports:
+        if not export.is_file():
+            parser.error(f"export not found: {export}")
+    out_dir = args.output_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = max(1, min(args.jobs or 1, len(args.exports)))
+    results, error = [], None
+    if jobs == 1:
+        for export in args.exports:
+            try:
+                results.append(split_export(export, out_dir))
+            except Exception as e:
+                error = e
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(split_export, export, out_dir) for export in args.exports]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error = error or e
+    if error:
+        # Leave existing posts untouched if any export failed
+        for sections, _ in results:
+            for _, tmp in sections:
+                os.unlink(tmp)
+        raise error
+
+    posts = {}
+    for export, (sections, skipped) in zip(args.exports, results):
+        if skipped:
+            print(f"{export}: skipped {skipped} line(s) before the first date", file=sys.stderr)
+        for name, tmp in sections:
+            posts.setdefault(name, []).append(tmp)
+
+    status = {"new": [], "changed": [], "unchanged": []}
+    for name in sorted(posts):
+        status[commit_post(name, posts[name], out_dir)].append(name)
+
+    print(f"{len(posts)} posts: {len(status['new'])} new, {len(status['changed'])} changed, "
+          f"{len(status['unchanged'])} unchanged", file=sys.stderr)
+    files = status["new"] + status["changed"]
+    if args.json:
+        print(json.dumps({"files": files}))
+    else:
+        for name in files:
+            print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
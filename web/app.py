@@ -2,34 +2,74 @@
 # /// script
 # requires-python = ">=3.8"
 # dependencies = [
+#     "brotli>=1.1.0",
 #     "flask>=3.0.0",
 #     "markdown>=3.5.1",
 #     "tqdm>=4.66.0",
+#     "weasyprint>=60.0",
 # ]
 # ///
 """
 Zoolog Web Interface - Flask backend
 
 Security Notes:
-- All endpoints are GET/read-only, so CSRF protection is not required
-- If POST/PUT/DELETE endpoints are added in the future, implement CSRF protection
+- All endpoints except /api/ingest and /api/books are GET/read-only, so CSRF
+  protection is not required
+- POST /api/ingest only accepts requests from localhost with a JSON body; a JSON
+  content type cannot be sent cross-site without a CORS preflight, which this
+  app never grants, so it is not CSRF-reachable from a browser
+- POST /api/books likewise only accepts a JSON body, and at worst queues a
+  book render; the queue is bounded (BOOK_QUEUE_LIMIT)
+- If other POST/PUT/DELETE endpoints are added in the future, implement CSRF protection
+
+Instrumentation:
+- Every request, SQL statement and slow stage (markdown render, JSON encoding,
+  compression, photo subprocesses) is timed into in-process histograms,
+  exported in Prometheus text format at /api/metrics
+- Responses carry a Server-Timing header (db, render, json, compress, ...,
+  app = total time before the body is sent) visible in browser devtools
+- Statements slower than ZOOLOG_SLOW_QUERY_MS (default 100) are logged with
+  their EXPLAIN QUERY PLAN
 """
 import atexit
+import bisect
+import gzip
+import hashlib
+import json
+import mimetypes
 import os
+import sys
 import sqlite3
+import queue
 import quopri
 import re
-import shlex
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
 import webbrowser
+import zlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Response, g, has_request_context, render_template, jsonify, request, send_file, url_for
+from flask.json.provider import DefaultJSONProvider
+import brotli
 import markdown
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import export_posts
+import monthly
+import photo_renditions
+import preview
+import static_server
+from photo_renditions import DEFAULT_PHOTO_SIZE, PHOTO_NAME_RE, PHOTO_SIZES
+from query_parser import SEARCH_MODES, TRIGRAM_MIN_LENGTH, QueryError, Vocabulary, fts_string, parse_query
+from today_in_history import month_days, parse_date_arg, range_days
+
 app = Flask(__name__)
 
 # Configuration
@@ -38,18 +78,252 @@ _PERSISTENT_CONN = None
 POSTS_DIR = Path(__file__).parent.parent / 'posts'
 PANDOC_CSS_PATH = Path(__file__).parent.parent / 'pandoc.css'
 PHOTOS_DIR = Path(__file__).parent / 'photos'
+# Photos mailed in with posts (zoomail.py's PHOTOS store): kept for good, and
+# listed alongside the fetched ones
+MAIL_PHOTOS_DIR = Path(os.environ.get('ZOOLOG_MAIL_PHOTOS', Path(__file__).parent.parent / 'photos'))
+# build_assets.py output: fingerprinted, minified, precompressed copies of static/
+ASSETS_DIR = Path(__file__).parent / 'assets'
 SHORTCUT_NAME = "photosondate"
 
+# Photos named after a hash of the original and the renditions (PHOTO_NAME_RE)
+# always serve the same image and can be cached for good; anything else is revalidated.
+PHOTO_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+# Fingerprinted assets never change under their name
+ASSET_MAX_AGE = 60 * 60 * 24 * 365
+
+# Columns /api/posts may return via ?fields=, and the slim default the list view needs
+POST_LIST_FIELDS = ('id', 'filename', 'date', 'category', 'title', 'excerpt', 'content', 'year', 'month', 'day')
+DEFAULT_POST_LIST_FIELDS = ('id', 'date', 'category', 'title', 'excerpt')
+# NDJSON export records (export_posts.py's), unless ?fields= picks others from POST_LIST_FIELDS
+DEFAULT_EXPORT_FIELDS = export_posts.RECORD_FIELDS
+# Most posts /api/posts/batch renders in one request
+POST_BATCH_LIMIT = 20
+
+# FTS5 tokenizer: Porter stemming over unicode61 with diacritics folded
+FTS_TOKENIZER = 'porter unicode61 remove_diacritics 2'
+# bm25() weight per posts_fts column, in column order: title hits outrank body hits
+BM25_WEIGHTS = {'filename': 0.5, 'title': 4.0, 'content': 1.0, 'category': 0.5}
+# posts_vocab as a query_parser.Vocabulary, built on the first fuzzy search
+# after (re)indexing
+_VOCABULARY = None
+VOCABULARY_LOCK = threading.Lock()
+# With ?recency=1, a post's relevance is divided by (1 + RECENCY_DECAY * age in years)
+RECENCY_DECAY = 0.1
+SORT_MODES = ('date', 'relevance')
+ON_THIS_DAY_RANGES = ('day', 'week', 'month')
+
+# Custom books (/api/books): rendered by custom_book.py in a worker process,
+# cached on disk by a hash of the posts, least recently used evicted first
+CUSTOM_BOOK_SCRIPT = Path(__file__).resolve().parent.parent / 'custom_book.py'
+BOOK_CACHE_DIR = Path(os.environ.get('ZOOLOG_BOOK_CACHE', Path(__file__).parent / 'book-cache'))
+BOOK_CACHE_MAX_BYTES = int(os.environ.get('ZOOLOG_BOOK_CACHE_MB', '500')) * 1024 * 1024
+BOOK_QUEUE_LIMIT = 8
+# Books are named by a hash of their content, so they never change
+BOOK_MAX_AGE = 60 * 60 * 24 * 365
+BOOK_KEY_RE = re.compile(r'^[0-9a-f]{32}$')
+# Bump when custom_book.py's output changes so cached books are rebuilt
+BOOK_FORMAT = 1
+BOOK_TITLES = {'': 'Outer Dibblestan', 'US': 'Outer Dibblestan', 'A': 'Outer Dibblestan',
+               'D': 'Outer Dibblestan', 'J': 'Uncle J', 'G': 'Grandpa', 'AHNS': 'AHNS'}
+BOOK_JOBS = {}
+BOOK_QUEUE = queue.Queue()
+BOOK_LOCK = threading.Lock()
+_BOOK_WORKER = None
+
+# Response compression (see compress_response)
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/markdown', 'text/plain',
+                          'text/css', 'text/javascript', 'application/javascript'}
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Instrumentation (see /api/metrics and add_server_timing)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SLOW_QUERY_MS = float(os.environ.get('ZOOLOG_SLOW_QUERY_MS', '100'))
+# Multi-row VALUES lists (e.g. on-this-day) collapse to one row in statement labels
+VALUES_LIST_RE = re.compile(r'(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+')
+# ... as do IN (?, ?, ...) lists (batch ids) and multi-column SELECT lists (?fields=)
+IN_LIST_RE = re.compile(r'\bIN \(\?(?:, \?)*\)')
+SELECT_LIST_RE = re.compile(r'\bSELECT [\w.]+(?:, [\w.]+)+ FROM\b')
+# ... and runs of the same parenthesized predicate (one per search term) to one
+REPEATED_PREDICATE_RE = re.compile(r'(\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\))(?: AND \1)+')
+# Distinct statement labels kept before the rest are counted as 'other', so
+# queries built from user input (e.g. substring terms) can't grow the series forever
+MAX_STATEMENT_LABELS = 200
+METRICS_LOCK = threading.Lock()
+STARTED_AT = time.time()
+
 class PhotoFetchError(Exception):
     """Base exception for photo fetching issues."""
 
 class PhotoFetchTimeout(PhotoFetchError):
     """Raised when the photo fetching process times out."""
 
+class StalePostsError(Exception):
+    """Indexed posts whose files were removed (or changed) since indexing"""
+
+    def __init__(self, filenames, change='removed'):
+        self.filenames = filenames
+        super().__init__(f'{len(filenames)} selected post(s) were {change} since indexing '
+                         f'({", ".join(filenames[:5])}); reindex and try again')
+
+class Histogram:
+    """Prometheus-style latency histogram with one series per label tuple.
+
+    observe() is a bisect and a few integer increments under a lock, cheap
+    enough to call for every SQL statement.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., count above all buckets, sum]
+
+    def observe(self, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with METRICS_LOCK:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        """Text exposition lines for this histogram"""
+        with METRICS_LOCK:
+            snapshot = sorted((labels, list(series)) for labels, series in self.series.items())
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in snapshot:
+            base = ','.join(f'{n}="{prometheus_escape(v)}"' for n, v in zip(self.label_names, labels))
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                total += count
+                le = bound if isinstance(bound, str) else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{le}"}} {total}')
+            suffix = f'{{{base}}}' if base else ''
+            lines.append(f'{self.name}_sum{suffix} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{suffix} {total}')
+        return lines
+
+def prometheus_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REQUEST_SECONDS = Histogram(
+    'zoolog_http_request_duration_seconds',
+    'Time from request start until the response body was sent',
+    ('route', 'method', 'status'), REQUEST_BUCKETS)
+SQL_SECONDS = Histogram(
+    'zoolog_sql_statement_duration_seconds',
+    'SQLite execute() time (prepare and first step) per statement',
+    ('statement',), SQL_BUCKETS)
+STAGE_SECONDS = Histogram(
+    'zoolog_stage_duration_seconds',
+    'Time spent in instrumented stages: render, json, compress, shortcuts, magick',
+    ('stage',), REQUEST_BUCKETS)
+SLOW_QUERIES = {'count': 0}
+
+def add_request_timing(stage, seconds):
+    """Charge time to a Server-Timing entry of the current request, if any"""
+    if has_request_context():
+        timings = g.get('timings')
+        if timings is not None:
+            entry = timings.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+@contextmanager
+def timed_stage(stage):
+    """Time a block into the stage histogram and the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe((stage,), seconds)
+        add_request_timing(stage, seconds)
+
+STATEMENT_LABELS = set()
+
+@lru_cache(maxsize=512)
+def statement_label(sql):
+    """Stable, whitespace-normalized statement text used as the metrics label"""
+    label = VALUES_LIST_RE.sub(r'\1, ...', ' '.join(sql.split()))
+    label = SELECT_LIST_RE.sub('SELECT ... FROM', IN_LIST_RE.sub('IN (...)', label))
+    label = REPEATED_PREDICATE_RE.sub(r'\1 AND ...', label)
+    with METRICS_LOCK:
+        if label not in STATEMENT_LABELS:
+            if len(STATEMENT_LABELS) >= MAX_STATEMENT_LABELS:
+                return 'other'
+            STATEMENT_LABELS.add(label)
+    return label
+
+def record_statement(conn, sql, parameters, seconds):
+    label = statement_label(sql)
+    SQL_SECONDS.observe((label,), seconds)
+    add_request_timing('db', seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        with METRICS_LOCK:
+            SLOW_QUERIES['count'] += 1
+        log_slow_query(conn, label, sql, parameters, seconds)
+
+def log_slow_query(conn, label, sql, parameters, seconds):
+    """Log a slow statement with its query plan"""
+    try:
+        plan_rows = conn.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        plan = '\n    '.join(row[-1] for row in plan_rows) or '(empty)'
+    except sqlite3.Error as exc:
+        plan = f'(unavailable: {exc})'
+    shown = repr(parameters)
+    if len(shown) > 200:
+        shown = shown[:200] + '...'
+    app.logger.warning('Slow query (%.1f ms): %s\n  params: %s\n  plan:\n    %s',
+                       seconds * 1000, label, shown, plan)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records every execute() into SQL_SECONDS"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_statement(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # No single parameter set to explain; time only
+            seconds = time.perf_counter() - start
+            SQL_SECONDS.observe((statement_label(sql),), seconds)
+            add_request_timing('db', seconds)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (and execute() shortcut) are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its encoding time charged to the 'json' stage"""
+
+    def dumps(self, obj, **kwargs):
+        with timed_stage('json'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
 def get_db():
     """Get database connection"""
     ensure_persistent_connection()
-    conn = sqlite3.connect(DB_URI, uri=True)
+    conn = sqlite3.connect(DB_URI, uri=True, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -57,7 +331,7 @@ def ensure_persistent_connection():
     """Ensure the shared in-memory database stays alive for the process lifetime"""
     global _PERSISTENT_CONN
     if _PERSISTENT_CONN is None:
-        _PERSISTENT_CONN = sqlite3.connect(DB_URI, uri=True, check_same_thread=False)
+        _PERSISTENT_CONN = sqlite3.connect(DB_URI, uri=True, check_same_thread=False, factory=TimedConnection)
         _PERSISTENT_CONN.row_factory = sqlite3.Row
     return _PERSISTENT_CONN
 
@@ -82,12 +356,13 @@ def fetch_photos_for_date(date_str, timeout=15):
         shortcuts_output = tmp_path / "out"
 
         try:
-            result = subprocess.run(
-                ["shortcuts", "run", SHORTCUT_NAME, "-i", date_str, "-o", str(shortcuts_output)],
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            with timed_stage('shortcuts'):
+                result = subprocess.run(
+                        ["shortcuts", "run", SHORTCUT_NAME, "-i", date_str, "-o", str(shortcuts_output)],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
         except FileNotFoundError as exc:
             raise PhotoFetchError("The 'shortcuts' command is not available on this system.") from exc
         except subprocess.TimeoutExpired as exc:
@@ -110,42 +385,21 @@ def fetch_photos_for_date(date_str, timeout=15):
 
         converted_files = []
         for idx, src in enumerate(sorted(photos), start=1):
-            dest = tmp_path / f"{date_str}-{idx}.jpg"
+            name = photo_renditions.photo_name(date_str, idx, src)
             try:
-                convert = subprocess.run(
-                    ["magick", str(src), "-resize", "1000x", str(dest)],
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout
-                )
+                photo_renditions.render(src, name, tmp_path, timeout, timed=lambda: timed_stage('magick'))
             except FileNotFoundError as exc:
                 raise PhotoFetchError("ImageMagick 'magick' command is required but was not found.") from exc
             except subprocess.TimeoutExpired as exc:
                 raise PhotoFetchTimeout("Timed out while resizing photos with ImageMagick.") from exc
+            except photo_renditions.RenditionError as exc:
+                raise PhotoFetchError(f"ImageMagick conversion failed: {exc}") from exc
+            converted_files.append(name)
 
-            if convert.returncode != 0:
-                stderr = convert.stderr.strip() if convert.stderr else "Unknown ImageMagick error."
-                raise PhotoFetchError(f"ImageMagick conversion failed: {stderr}")
-
-            converted_files.append(dest)
-
-        final_names = []
-        for converted in sorted(converted_files):
-            final_path = destination_dir / converted.name
-            shutil.move(str(converted), final_path)
-            final_names.append(final_path.name)
-
-        return final_names
-
-def clean_text_for_search(text):
-    """Clean text for search indexing by removing punctuation and normalizing"""
-    if not text:
-        return ""
+        # The default size goes last: its presence is what marks a date as cached.
+        photo_renditions.install(tmp_path, converted_files, destination_dir)
 
-    # Remove punctuation and normalize whitespace
-    cleaned = re.sub(r'[^\w\s]', ' ', text)
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    return cleaned.strip()
+        return sorted(converted_files)
 
 def extract_post_info(filename, content):
     """Extract metadata from post filename and content"""
@@ -201,22 +455,18 @@ def extract_post_info(filename, content):
     # Create excerpt (first 200 chars) from content (excluding first line)
     excerpt = content_text[:200] + "..." if len(content_text) > 200 else content_text
 
-    # Clean content for search indexing (remove punctuation)
-    clean_content = clean_text_for_search(content_text)
-    clean_title = clean_text_for_search(title)
-
     return {
         'filename': filename,
         'date': post_date,
         'category': category,
         'title': title,
         'content': content_text,
-        'clean_content': clean_content,
-        'clean_title': clean_title,
         'excerpt': excerpt,
         'year': post_date.year,
         'month': post_date.month,
-        'day': post_date.day
+        'day': post_date.day,
+        # Of the file as stored, so month ETags change whenever a post does
+        'content_hash': hashlib.sha1(content.encode('utf-8')).hexdigest()
     }
 
 def create_database(conn):
@@ -232,57 +482,73 @@ def create_database(conn):
             category TEXT NOT NULL,
             title TEXT,
             content TEXT,
-            clean_title TEXT,
-            clean_content TEXT,
             excerpt TEXT,
             year INTEGER,
             month INTEGER,
             day INTEGER,
+            content_hash TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
 
-    # Add missing columns if they don't exist
-    try:
-        cursor.execute('ALTER TABLE posts ADD COLUMN clean_title TEXT')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-
-    try:
-        cursor.execute('ALTER TABLE posts ADD COLUMN clean_content TEXT')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    # Full-text search over the stored title/content. The tokenizer handles
+    # punctuation, case, diacritics and stemming, so no cleaned copy is kept.
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+            filename, title, content, category,
+            content='posts',
+            content_rowid='id',
+            tokenize='{FTS_TOKENIZER}'
+        )
+    ''')
 
-    # Full-text search virtual table using cleaned content
+    # Substring search (?mode=substring): every trigram of the title and
+    # content, so a MATCH finds any run of 3+ characters, not just whole words
     cursor.execute('''
-        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
-            filename, clean_title, clean_content, category,
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_trigram USING fts5(
+            title, content,
             content='posts',
-            content_rowid='id'
+            content_rowid='id',
+            tokenize='trigram'
         )
     ''')
 
-    # Triggers to keep FTS in sync
+    # The terms in posts_fts, for expanding ?mode=fuzzy words (see search_vocabulary)
+    cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS posts_vocab USING fts5vocab(posts_fts, row)')
+
+    # Make posts_fts.rank a column-weighted bm25() score
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS.values())
+    cursor.execute("INSERT INTO posts_fts(posts_fts, rank) VALUES('rank', ?)", [f'bm25({weights})'])
+
+    # Triggers to keep both FTS indexes in sync
     cursor.execute('''
         CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
-            INSERT INTO posts_fts(rowid, filename, clean_title, clean_content, category)
-            VALUES (new.id, new.filename, new.clean_title, new.clean_content, new.category);
+            INSERT INTO posts_fts(rowid, filename, title, content, category)
+            VALUES (new.id, new.filename, new.title, new.content, new.category);
+            INSERT INTO posts_trigram(rowid, title, content)
+            VALUES (new.id, new.title, new.content);
         END
     ''')
 
     cursor.execute('''
         CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
-            INSERT INTO posts_fts(posts_fts, rowid, filename, clean_title, clean_content, category)
-            VALUES('delete', old.id, old.filename, old.clean_title, old.clean_content, old.category);
+            INSERT INTO posts_fts(posts_fts, rowid, filename, title, content, category)
+            VALUES('delete', old.id, old.filename, old.title, old.content, old.category);
+            INSERT INTO posts_trigram(posts_trigram, rowid, title, content)
+            VALUES('delete', old.id, old.title, old.content);
         END
     ''')
 
     cursor.execute('''
         CREATE TRIGGER IF NOT EXISTS posts_au AFTER UPDATE ON posts BEGIN
-            INSERT INTO posts_fts(posts_fts, rowid, filename, clean_title, clean_content, category)
-            VALUES('delete', old.id, old.filename, old.clean_title, old.clean_content, old.category);
-            INSERT INTO posts_fts(rowid, filename, clean_title, clean_content, category)
-            VALUES (new.id, new.filename, new.clean_title, new.clean_content, new.category);
+            INSERT INTO posts_fts(posts_fts, rowid, filename, title, content, category)
+            VALUES('delete', old.id, old.filename, old.title, old.content, old.category);
+            INSERT INTO posts_fts(rowid, filename, title, content, category)
+            VALUES (new.id, new.filename, new.title, new.content, new.category);
+            INSERT INTO posts_trigram(posts_trigram, rowid, title, content)
+            VALUES('delete', old.id, old.title, old.content);
+            INSERT INTO posts_trigram(rowid, title, content)
+            VALUES (new.id, new.title, new.content);
         END
     ''')
 
@@ -290,8 +556,58 @@ def create_database(conn):
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_date ON posts(date)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_category ON posts(category)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_year_month ON posts(year, month)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_month_day ON posts(month, day)')
+
+    conn.commit()
 
+def post_row(post_info):
+    """Column values for inserting post_info into posts, in schema order"""
+    return (
+        post_info['filename'],
+        post_info['date'].isoformat(),
+        post_info['category'],
+        post_info['title'],
+        post_info['content'],
+        post_info['excerpt'],
+        post_info['year'],
+        post_info['month'],
+        post_info['day'],
+        post_info['content_hash']
+    )
+
+def upsert_posts(filenames):
+    """Index (or re-index) individual files from POSTS_DIR without a full rebuild.
+
+    Returns (indexed, skipped) lists of filenames. The FTS triggers keep
+    posts_fts in step, so new posts are searchable as soon as this commits.
+    """
+    conn = ensure_persistent_connection()
+    cursor = conn.cursor()
+    indexed, skipped = [], []
+    for name in filenames:
+        path = POSTS_DIR / name
+        # Bare .txt names inside POSTS_DIR only
+        if Path(name).name != name or not name.endswith('.txt') or not path.is_file():
+            skipped.append(name)
+            continue
+        post_info = extract_post_info(name, path.read_text(encoding='utf-8'))
+        if not post_info:
+            skipped.append(name)
+            continue
+        cursor.execute('''
+            INSERT INTO posts (filename, date, category, title, content, excerpt, year, month, day, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                date = excluded.date, category = excluded.category, title = excluded.title,
+                content = excluded.content, excerpt = excluded.excerpt,
+                year = excluded.year, month = excluded.month, day = excluded.day,
+                content_hash = excluded.content_hash
+        ''', post_row(post_info))
+        indexed.append(name)
     conn.commit()
+    if indexed:
+        invalidate_vocabulary()
+    return indexed, skipped
 
 def index_posts():
     """Index all posts in the posts directory"""
@@ -321,21 +637,9 @@ def index_posts():
             post_info = extract_post_info(txt_file.name, content)
             if post_info:
                 cursor.execute('''
-                    INSERT INTO posts (filename, date, category, title, content, clean_title, clean_content, excerpt, year, month, day)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    post_info['filename'],
-                    post_info['date'].isoformat(),
-                    post_info['category'],
-                    post_info['title'],
-                    post_info['content'],
-                    post_info['clean_title'],
-                    post_info['clean_content'],
-                    post_info['excerpt'],
-                    post_info['year'],
-                    post_info['month'],
-                    post_info['day']
-                ))
+                    INSERT INTO posts (filename, date, category, title, content, excerpt, year, month, day, content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', post_row(post_info))
                 indexed_count += 1
 
                 if indexed_count % 1000 == 0:
@@ -348,6 +652,7 @@ def index_posts():
             error_count += 1
 
     conn.commit()
+    invalidate_vocabulary()
 
     # Get stats
     cursor.execute('SELECT COUNT(*) FROM posts')
@@ -370,30 +675,127 @@ def index_posts():
 
     return True
 
-def sanitize_fts_query(query):
-    """Sanitize FTS search query to prevent injection attacks"""
-    if not query:
-        return query
+def search_vocabulary():
+    """The posts_fts terms as a Vocabulary, cached until the index changes"""
+    global _VOCABULARY
+    with VOCABULARY_LOCK:
+        if _VOCABULARY is None:
+            conn = get_db()
+            try:
+                with timed_stage('vocabulary'):
+                    rows = conn.execute('SELECT term, doc FROM posts_vocab').fetchall()
+                    _VOCABULARY = Vocabulary(rows)
+            finally:
+                conn.close()
+        return _VOCABULARY
+
+def invalidate_vocabulary():
+    global _VOCABULARY
+    with VOCABULARY_LOCK:
+        _VOCABULARY = None
+
+def parse_search(search, mode):
+    """parse_query() for the search box in the given ?mode="""
+    return parse_query(search, mode, search_vocabulary() if mode == 'fuzzy' else None)
+
+def build_post_filters(args):
+    """Translate request filter args into (conditions, params, match).
+
+    `conditions`/`params` are SQL predicates on `posts`; `match` is the FTS5
+    MATCH expression for the search box, or None when it has no text terms.
+    Search syntax (phrases, prefix*, -exclusion, OR, category:/date:) is
+    handled by query_parser, which quotes every term so FTS5 operators can't
+    be injected; ?mode= picks whole words, substrings or fuzzy matching.
+    Raises QueryError for invalid filter values.
+    """
+    category = args.get('category', '')
+    start_date = args.get('start_date', '')
+    end_date = args.get('end_date', '')
+    search = args.get('search', '')
+    mode = args.get('mode', '') or 'words'
+    if mode not in SEARCH_MODES:
+        raise QueryError(f"Invalid mode. Choose from: {', '.join(SEARCH_MODES)}")
+
+    conditions = []
+    params = []
+
+    if category:
+        if category == 'US':
+            conditions.append('posts.category IN (?, ?)')
+            params.extend(['A', 'D'])
+        else:
+            conditions.append('posts.category = ?')
+            params.append(category)
+
+    if start_date:
+        conditions.append('posts.date >= ?')
+        params.append(start_date)
+
+    if end_date:
+        # Make end_date inclusive by treating it as < next_day
+        try:
+            # Parse the date and add one day
+            date_obj = datetime.strptime(end_date, '%Y-%m-%d')
+            next_day = date_obj + timedelta(days=1)
+            conditions.append('posts.date < ?')
+            params.append(next_day.strftime('%Y-%m-%d'))
+        except ValueError:
+            # Fallback to original behavior if date parsing fails
+            conditions.append('posts.date <= ?')
+            params.append(end_date)
 
-    # Remove potentially dangerous FTS operators and syntax
-    # Allow only alphanumeric, spaces, and basic punctuation
-    # Remove FTS special characters: " * ( ) : - AND OR NOT NEAR
-    dangerous_chars = ['*', '(', ')', ':', '"', '-', "'"]
-    sanitized = query
+    match = None
+    if search:
+        parsed = parse_search(search, mode)
+        if not parsed['match'] and not parsed['conditions']:
+            # Nothing searchable left in the query (e.g. only punctuation)
+            conditions.append('0')
+        conditions.extend(parsed['conditions'])
+        params.extend(parsed['params'])
+        match = parsed['match']
+
+    return conditions, params, match
+
+def find_adjacent_posts(cursor, post_date, conditions, params, match):
+    """Return the (previous, next) rows by date among posts matching the filters"""
+    if match:
+        where_clause = ''.join(' AND ' + c for c in conditions)
+        query = '''
+            SELECT posts.id, posts.title, posts.date
+            FROM posts_fts
+            JOIN posts ON posts.id = posts_fts.rowid
+            WHERE posts_fts MATCH ? AND posts.date {op} ?
+            ''' + where_clause + '''
+            ORDER BY posts.date {order}
+            LIMIT 1
+        '''
+        base_params = [match]
+    else:
+        where_clause = ''.join(' AND ' + c for c in conditions)
+        query = 'SELECT id, title, date FROM posts WHERE date {op} ?' + where_clause + ' ORDER BY date {order} LIMIT 1'
+        base_params = []
 
-    for char in dangerous_chars:
-        sanitized = sanitized.replace(char, ' ')
+    # Previous post (earlier date)
+    cursor.execute(query.format(op='<', order='DESC'), base_params + [post_date] + params)
+    prev_post = cursor.fetchone()
 
-    # Remove FTS operator keywords by replacing with spaces
-    operators = ['AND', 'OR', 'NOT', 'NEAR']
-    for op in operators:
-        sanitized = sanitized.replace(f' {op} ', ' ')
-        sanitized = sanitized.replace(f' {op.lower()} ', ' ')
+    # Next post (later date)
+    cursor.execute(query.format(op='>', order='ASC'), base_params + [post_date] + params)
+    next_post = cursor.fetchone()
 
-    # Collapse multiple spaces and trim
-    sanitized = ' '.join(sanitized.split())
+    return prev_post, next_post
 
-    return sanitized
+def relevance_order(recency=False):
+    """ORDER BY expression for relevance ranking of an FTS match.
+
+    posts_fts.rank is the column-weighted bm25() configured in create_database;
+    it is negative, smaller being better. The recency boost shrinks the
+    magnitude for older posts so that, at equal relevance, newer ones win.
+    """
+    if not recency:
+        return 'posts_fts.rank ASC, posts.date DESC'
+    age_years = "(julianday('now') - julianday(posts.date)) / 365.25"
+    return f'posts_fts.rank / (1 + {RECENCY_DECAY} * {age_years}) ASC, posts.date DESC'
 
 def process_post_content(content):
     """Process post content like make_omnibus: decode quoted-printable and convert markdown to HTML"""
@@ -436,6 +838,157 @@ def process_post_content(content):
     
     return full_html
 
+def parse_fields(fields_param, allowed, default):
+    """Parse a comma-separated ?fields= projection; None if it names an unknown field"""
+    if not fields_param:
+        return list(default)
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+    if not fields or any(f not in allowed for f in fields):
+        return None
+    # Always include the id so clients can open the post
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+def stream_json_list(key, rows, meta):
+    """Yield a JSON object {**meta, key: [rows...]} one row at a time.
+
+    Large pages are never materialized as a single string; `rows` is consumed
+    lazily (typically straight from a cursor).
+    """
+    head = json.dumps(meta, separators=(',', ':'))
+    yield head[:-1] + (',' if meta else '') + json.dumps(key) + ':['
+    first = True
+    for row in rows:
+        yield ('' if first else ',') + json.dumps(row, separators=(',', ':'))
+        first = False
+    yield ']}'
+
+def choose_content_encoding():
+    """Pick the best compression the client accepts ('br', 'gzip' or None)"""
+    accepted = request.accept_encodings
+    if accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of str/bytes chunks incrementally"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out = process(chunk)
+        if out:
+            yield out
+    yield finish()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.timings = {}
+
+@app.after_request
+def add_server_timing(response):
+    """Server-Timing header and request histogram.
+
+    Registered before compress_response so it runs after it (Flask runs
+    after_request hooks in reverse) and compression is included. A streamed
+    body is produced after the headers are sent, so its time only shows up
+    in the histogram, which is observed when the response is closed.
+    """
+    start = g.get('request_start')
+    if start is None:
+        return response
+    parts = [f'{stage};dur={seconds * 1000:.2f};desc="{count}x"'
+             for stage, (seconds, count) in g.timings.items()]
+    parts.append(f'app;dur={(time.perf_counter() - start) * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(parts)
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    labels = (route, request.method, str(response.status_code))
+    response.call_on_close(lambda: REQUEST_SECONDS.observe(labels, time.perf_counter() - start))
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress text/JSON responses with brotli or gzip when the client allows it"""
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_content_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        with timed_stage('compress'):
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+            else:
+                response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+_ASSET_MANIFEST = {'mtime': None, 'names': {}}
+
+def asset_manifest():
+    """assets.json from the last build_assets.py run (re-read when it changes)"""
+    try:
+        mtime = (ASSETS_DIR / 'assets.json').stat().st_mtime_ns
+    except OSError:
+        return {}
+    if mtime != _ASSET_MANIFEST['mtime']:
+        _ASSET_MANIFEST['names'] = json.loads((ASSETS_DIR / 'assets.json').read_text(encoding='utf-8'))
+        _ASSET_MANIFEST['mtime'] = mtime
+    return _ASSET_MANIFEST['names']
+
+@app.context_processor
+def asset_helpers():
+    """asset_url('app.js') in templates: the fingerprinted build if there is one, else static/"""
+    def asset_url(name):
+        built = asset_manifest().get(name)
+        return f'/assets/{built}' if built else url_for('static', filename=name)
+    return {'asset_url': asset_url}
+
+@app.route('/assets/<filename>')
+def serve_asset(filename):
+    """A built asset, precompressed when the client allows; immutable under its fingerprinted name"""
+    if filename.startswith('.') or filename.endswith(('.br', '.gz')) or filename == 'assets.json':
+        return jsonify({'error': 'Asset not found'}), 404
+    path = ASSETS_DIR / filename
+    if not path.is_file():
+        return jsonify({'error': 'Asset not found'}), 404
+    accepted = {encoding for encoding in ('br', 'gzip') if request.accept_encodings[encoding]}
+    source, encoding = static_server.precompressed(path, accepted)
+    response = send_file(source, mimetype=mimetypes.guess_type(filename)[0], conditional=True, etag=True,
+                         max_age=ASSET_MAX_AGE if static_server.FINGERPRINTED.search(filename) else 0)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if static_server.FINGERPRINTED.search(filename):
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
 @app.route('/')
 def index():
     """Main page"""
@@ -485,17 +1038,70 @@ def api_timeline():
         }
     })
 
+@app.route('/api/on-this-day')
+def api_on_this_day():
+    """Posts from every year on a month-day, or on each day of a week/month"""
+    span = request.args.get('range', 'day')
+    if span not in ON_THIS_DAY_RANGES:
+        return jsonify({'error': f"Invalid range '{span}'. Use one of: {', '.join(ON_THIS_DAY_RANGES)}"}), 400
+    today = datetime.now().date()
+    date_param = request.args.get('date', '')
+    try:
+        target = parse_date_arg(date_param, today) if date_param else today
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use MM-DD or YYYY-MM-DD'}), 400
+
+    days = range_days(target, span)
+    wanted = month_days(days)
+    placeholders = ', '.join('(?, ?)' for _ in wanted)
+    params = [v for md in wanted for v in md]
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT id, date, category, title, excerpt, year, month, day
+        FROM posts
+        WHERE (month, day) IN (VALUES {placeholders})
+        ORDER BY date
+    ''', params)
+
+    grouped = {d: [] for d in days}
+    for row in cursor.fetchall():
+        shown_on = wanted[(row['month'], row['day'])]
+        grouped[shown_on].append({
+            'id': row['id'],
+            'date': row['date'],
+            'category': row['category'],
+            'title': row['title'],
+            'excerpt': row['excerpt'],
+            'years_ago': shown_on.year - row['year']
+        })
+    conn.close()
+
+    return jsonify({
+        'date': target.isoformat(),
+        'range': span,
+        'days': [{'date': d.isoformat(), 'posts': posts} for d, posts in grouped.items() if posts],
+        'total': sum(len(posts) for posts in grouped.values())
+    })
+
 @app.route('/api/posts')
 def api_posts():
     """Get filtered posts"""
     conn = get_db()
     cursor = conn.cursor()
-    
-    # Get query parameters
-    category = request.args.get('category', '')
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    search = request.args.get('search', '')
+
+    fields = parse_fields(request.args.get('fields', ''), POST_LIST_FIELDS, DEFAULT_POST_LIST_FIELDS)
+    if fields is None:
+        conn.close()
+        return jsonify({'error': f"Invalid fields. Choose from: {', '.join(POST_LIST_FIELDS)}"}), 400
+    columns = ', '.join(f'posts.{f}' for f in fields)
+
+    sort = request.args.get('sort', 'date')
+    if sort not in SORT_MODES:
+        conn.close()
+        return jsonify({'error': f"Invalid sort. Choose from: {', '.join(SORT_MODES)}"}), 400
+    recency = request.args.get('recency', '') in ('1', 'true')
 
     # Validate and sanitize limit parameter
     try:
@@ -513,257 +1119,65 @@ def api_posts():
     except (ValueError, TypeError):
         offset = 0
     
-    # Build query
-    conditions = []
-    params = []
-    
-    if category:
-        if category == 'US':
-            conditions.append('posts.category IN (?, ?)')
-            params.extend(['A', 'D'])
-        else:
-            conditions.append('posts.category = ?')
-            params.append(category)
-    
-    if start_date:
-        conditions.append('posts.date >= ?')
-        params.append(start_date)
-    
-    if end_date:
-        # Make end_date inclusive by treating it as < next_day
-        try:
-            # Parse the date and add one day
-            date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-            next_day = date_obj + timedelta(days=1)
-            conditions.append('posts.date < ?')
-            params.append(next_day.strftime('%Y-%m-%d'))
-        except ValueError:
-            # Fallback to original behavior if date parsing fails
-            conditions.append('posts.date <= ?')
-            params.append(end_date)
-    
-    if search:
-        # Sanitize search query to prevent FTS injection
-        sanitized_search = sanitize_fts_query(search)
-        if not sanitized_search:
-            # Return empty results if search is empty after sanitization
-            conn.close()
-            return jsonify({
-                'posts': [],
-                'total': 0,
-                'limit': limit,
-                'offset': offset
-            })
-
-        # Use FTS for search, sorted by date ascending
-        if conditions:
-            where_clause = 'AND ' + ' AND '.join(conditions)
-            query = '''
-                SELECT posts.*, posts_fts.rank
-                FROM posts_fts
-                JOIN posts ON posts.id = posts_fts.rowid
-                WHERE posts_fts MATCH ?
-                ''' + where_clause + '''
-                ORDER BY date ASC
-                LIMIT ? OFFSET ?
-            '''
-        else:
-            query = '''
-                SELECT posts.*, posts_fts.rank
-                FROM posts_fts
-                JOIN posts ON posts.id = posts_fts.rowid
-                WHERE posts_fts MATCH ?
-                ORDER BY date ASC
-                LIMIT ? OFFSET ?
-            '''
-        cursor.execute(query, [sanitized_search] + params + [limit, offset])
+    try:
+        conditions, params, match = build_post_filters(request.args)
+    except QueryError as exc:
+        conn.close()
+        return jsonify({'error': str(exc)}), 400
+
+    if match:
+        # Use FTS for search, sorted by date ascending or by weighted bm25 rank
+        where_clause = ('AND ' + ' AND '.join(conditions)) if conditions else ''
+        order_by = relevance_order(recency) if sort == 'relevance' else 'date ASC'
+        count_query = '''
+            SELECT COUNT(*)
+            FROM posts_fts
+            JOIN posts ON posts.id = posts_fts.rowid
+            WHERE posts_fts MATCH ?
+            ''' + where_clause
+        query = '''
+            SELECT ''' + columns + '''
+            FROM posts_fts
+            JOIN posts ON posts.id = posts_fts.rowid
+            WHERE posts_fts MATCH ?
+            ''' + where_clause + '''
+            ORDER BY ''' + order_by + '''
+            LIMIT ? OFFSET ?
+        '''
+        params = [match] + params
     else:
         # Regular query
-        if conditions:
-            where_clause = 'WHERE ' + ' AND '.join(conditions)
-            query = 'SELECT * FROM posts ' + where_clause + ' ORDER BY date ASC LIMIT ? OFFSET ?'
-        else:
-            query = 'SELECT * FROM posts ORDER BY date ASC LIMIT ? OFFSET ?'
-        cursor.execute(query, params + [limit, offset])
-    
-    posts = []
-    for row in cursor.fetchall():
-        posts.append({
-            'id': row['id'],
-            'filename': row['filename'],
-            'date': row['date'],
-            'category': row['category'],
-            'title': row['title'],
-            'excerpt': row['excerpt'],
-            'year': row['year'],
-            'month': row['month'],
-            'day': row['day']
-        })
-    
+        where_clause = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        count_query = 'SELECT COUNT(*) FROM posts ' + where_clause
+        query = 'SELECT ' + columns + ' FROM posts ' + where_clause + ' ORDER BY date ASC LIMIT ? OFFSET ?'
+
     # Get total count
-    if search:
-        if conditions:
-            where_clause = 'AND ' + ' AND '.join(conditions)
-            count_query = '''
-                SELECT COUNT(*)
-                FROM posts_fts
-                JOIN posts ON posts.id = posts_fts.rowid
-                WHERE posts_fts MATCH ?
-                ''' + where_clause
-        else:
-            count_query = '''
-                SELECT COUNT(*)
-                FROM posts_fts
-                JOIN posts ON posts.id = posts_fts.rowid
-                WHERE posts_fts MATCH ?
-            '''
-        cursor.execute(count_query, [sanitized_search] + params)
-    else:
-        if conditions:
-            where_clause = 'WHERE ' + ' AND '.join(conditions)
-            count_query = 'SELECT COUNT(*) FROM posts ' + where_clause
-        else:
-            count_query = 'SELECT COUNT(*) FROM posts'
-        cursor.execute(count_query, params)
-    
+    cursor.execute(count_query, params)
     total = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    return jsonify({
-        'posts': posts,
-        'total': total,
-        'limit': limit,
-        'offset': offset
-    })
 
-@app.route('/api/post/<int:post_id>')
-def api_post(post_id):
-    """Get single post with full content"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM posts WHERE id = ?', [post_id])
-    row = cursor.fetchone()
-    
-    if not row:
-        return jsonify({'error': 'Post not found'}), 404
-    
-    # Get search context from query parameters
-    category = request.args.get('category', '')
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    search = request.args.get('search', '')
-    
-    # Build conditions for navigation within search results
-    conditions = []
-    params = []
-    
-    if category:
-        if category == 'US':
-            conditions.append('posts.category IN (?, ?)')
-            params.extend(['A', 'D'])
-        else:
-            conditions.append('posts.category = ?')
-            params.append(category)
-    
-    if start_date:
-        conditions.append('posts.date >= ?')
-        params.append(start_date)
-    
-    if end_date:
-        # Make end_date inclusive by treating it as < next_day
+    cursor.execute(query, params + [limit, offset])
+
+    def rows():
+        # Stream straight from the cursor so a 1000-row page is never held twice
         try:
-            # Parse the date and add one day
-            date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-            next_day = date_obj + timedelta(days=1)
-            conditions.append('posts.date < ?')
-            params.append(next_day.strftime('%Y-%m-%d'))
-        except ValueError:
-            # Fallback to original behavior if date parsing fails
-            conditions.append('posts.date <= ?')
-            params.append(end_date)
-    
+            for row in cursor:
+                yield dict(zip(fields, row))
+        finally:
+            conn.close()
+
+    return Response(
+        stream_json_list('posts', rows(), {'total': total, 'limit': limit, 'offset': offset}),
+        mimetype='application/json'
+    )
+
+def post_detail(cursor, row, conditions, params, match, search, mode):
+    """The /api/post payload for a posts row: rendered post, prev/next in the filter context"""
     # Get adjacent posts within search context
-    if search:
-        # Sanitize search query to prevent FTS injection
-        sanitized_search = sanitize_fts_query(search)
-
-        if sanitized_search:
-            # Previous post in search results (earlier date)
-            if conditions:
-                where_clause = 'AND ' + ' AND '.join(conditions)
-                prev_query = '''
-                    SELECT posts.id, posts.title, posts.date
-                    FROM posts_fts
-                    JOIN posts ON posts.id = posts_fts.rowid
-                    WHERE posts_fts MATCH ? AND posts.date < ?
-                    ''' + where_clause + '''
-                    ORDER BY posts.date DESC
-                    LIMIT 1
-                '''
-            else:
-                prev_query = '''
-                    SELECT posts.id, posts.title, posts.date
-                    FROM posts_fts
-                    JOIN posts ON posts.id = posts_fts.rowid
-                    WHERE posts_fts MATCH ? AND posts.date < ?
-                    ORDER BY posts.date DESC
-                    LIMIT 1
-                '''
-            cursor.execute(prev_query, [sanitized_search, row['date']] + params)
-            prev_post = cursor.fetchone()
-
-            # Next post in search results (later date)
-            if conditions:
-                where_clause = 'AND ' + ' AND '.join(conditions)
-                next_query = '''
-                    SELECT posts.id, posts.title, posts.date
-                    FROM posts_fts
-                    JOIN posts ON posts.id = posts_fts.rowid
-                    WHERE posts_fts MATCH ? AND posts.date > ?
-                    ''' + where_clause + '''
-                    ORDER BY posts.date ASC
-                    LIMIT 1
-                '''
-            else:
-                next_query = '''
-                    SELECT posts.id, posts.title, posts.date
-                    FROM posts_fts
-                    JOIN posts ON posts.id = posts_fts.rowid
-                    WHERE posts_fts MATCH ? AND posts.date > ?
-                    ORDER BY posts.date ASC
-                    LIMIT 1
-                '''
-            cursor.execute(next_query, [sanitized_search, row['date']] + params)
-            next_post = cursor.fetchone()
-        else:
-            # If search is empty after sanitization, no navigation
-            prev_post = None
-            next_post = None
-    else:
-        # Regular navigation within filtered results
-        if conditions:
-            where_clause = 'WHERE ' + ' AND '.join(conditions) + ' AND date < ?'
-            prev_query = 'SELECT id, title, date FROM posts ' + where_clause + ' ORDER BY date DESC LIMIT 1'
-        else:
-            prev_query = 'SELECT id, title, date FROM posts WHERE date < ? ORDER BY date DESC LIMIT 1'
-        cursor.execute(prev_query, params + [row['date']])
-        prev_post = cursor.fetchone()
-
-        # Next post (later date)
-        if conditions:
-            where_clause = 'WHERE ' + ' AND '.join(conditions) + ' AND date > ?'
-            next_query = 'SELECT id, title, date FROM posts ' + where_clause + ' ORDER BY date ASC LIMIT 1'
-        else:
-            next_query = 'SELECT id, title, date FROM posts WHERE date > ? ORDER BY date ASC LIMIT 1'
-        cursor.execute(next_query, params + [row['date']])
-        next_post = cursor.fetchone()
-    
-    conn.close()
-    
+    prev_post, next_post = find_adjacent_posts(cursor, row['date'], conditions, params, match)
+
     # Process content like make_omnibus
-    html_content = process_post_content(row['content'])
+    with timed_stage('render'):
+        html_content = process_post_content(row['content'])
     
     post = {
         'id': row['id'],
@@ -794,16 +1208,465 @@ def api_post(post_id):
             'date': next_post['date']
         }
     
-    # Add search context for highlighting
+    # Add search context for highlighting (words and phrases, not filters/exclusions)
     if search:
-        # Extract search terms, handling quoted phrases
-        try:
-            result['search_terms'] = shlex.split(search)
-        except ValueError:
-            result['search_terms'] = search.replace('"', '').replace("'", '').split()
+        result['search_terms'] = parse_search(search, mode)['terms']
+        result['search_mode'] = mode
+    
+    return result
+
+@app.route('/api/post/<int:post_id>')
+def api_post(post_id):
+    """Get single post with full content"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM posts WHERE id = ?', [post_id])
+    row = cursor.fetchone()
+    
+    if not row:
+        conn.close()
+        return jsonify({'error': 'Post not found'}), 404
     
+    # Get search context from query parameters
+    try:
+        conditions, params, match = build_post_filters(request.args)
+    except QueryError as exc:
+        conn.close()
+        return jsonify({'error': str(exc)}), 400
+
+    result = post_detail(cursor, row, conditions, params, match,
+                         request.args.get('search', ''), request.args.get('mode', '') or 'words')
+    conn.close()
     return jsonify(result)
 
+@app.route('/api/posts/batch')
+def api_posts_batch():
+    """Several posts as /api/post returns them, in one round trip (the reader's prefetch)"""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.args.get('ids', '').split(',') if i.strip()))
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of post ids'}), 400
+    if not ids or len(ids) > POST_BATCH_LIMIT:
+        return jsonify({'error': f'Give between 1 and {POST_BATCH_LIMIT} ids'}), 400
+    try:
+        conditions, params, match = build_post_filters(request.args)
+    except QueryError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM posts WHERE id IN ({', '.join('?' * len(ids))})", ids)
+    rows = {row['id']: row for row in cursor.fetchall()}
+    search = request.args.get('search', '')
+    mode = request.args.get('mode', '') or 'words'
+    # In the order asked for; unknown ids are left out
+    posts = [post_detail(cursor, rows[i], conditions, params, match, search, mode) for i in ids if i in rows]
+    conn.close()
+    return jsonify({'posts': posts})
+
+def read_post_files(filenames):
+    """Raw texts of indexed posts, as the book pipeline reads them.
+
+    The index keeps decoded content without the '# date category' heading the
+    book layout is built on, so renders go back to the files. Raises
+    StalePostsError when files were removed since indexing, rather than
+    rendering fewer posts than were selected.
+    """
+    texts, missing = [], []
+    for name in filenames:
+        try:
+            texts.append((POSTS_DIR / name).read_text(encoding='utf-8', errors='replace'))
+        except FileNotFoundError:
+            missing.append(name)
+    if missing:
+        app.logger.warning('Indexed posts missing from %s: %s', POSTS_DIR, ', '.join(missing))
+        raise StalePostsError(missing)
+    return texts
+
+@app.route('/api/export')
+def api_export():
+    """Stream every post matching the filters as NDJSON, Markdown or a zip (see export_posts.py)"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export_posts.FORMATS:
+        return jsonify({'error': f"Invalid format. Choose from: {', '.join(export_posts.FORMATS)}"}), 400
+    fields = parse_fields(request.args.get('fields', ''), POST_LIST_FIELDS, DEFAULT_EXPORT_FIELDS)
+    if fields is None:
+        return jsonify({'error': f"Invalid fields. Choose from: {', '.join(POST_LIST_FIELDS)}"}), 400
+    if fmt != 'ndjson':
+        fields = ['filename']
+    try:
+        conditions, params, match = build_post_filters(request.args)
+    except QueryError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if match:
+        source = 'posts_fts JOIN posts ON posts.id = posts_fts.rowid WHERE posts_fts MATCH ?'
+        params = [match] + params
+    else:
+        source = 'posts WHERE 1'
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT ' + ', '.join(f'posts.{f}' for f in fields) + ' FROM ' + source
+                   + ''.join(' AND ' + c for c in conditions) + ' ORDER BY posts.filename', params)
+
+    def rows():
+        # Straight from the cursor: one post in memory at a time, however many match
+        try:
+            for row in cursor:
+                record = dict(zip(fields, row))
+                if 'date' in record:
+                    record['date'] = record['date'][:10]  # YYYY-MM-DD, as export_posts.py writes it
+                yield record
+        finally:
+            conn.close()
+
+    if fmt == 'ndjson':
+        body = export_posts.ndjson_lines(rows())
+    elif fmt == 'markdown':
+        files = export_posts.read_texts(POSTS_DIR / row['filename'] for row in rows())
+        body = export_posts.markdown_chunks(text for _, text in files)
+    else:
+        body = export_posts.zip_chunks((row['filename'], POSTS_DIR / row['filename']) for row in rows())
+    mimetype, extension = export_posts.FORMATS[fmt]
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="zoolog-export.{extension}"',
+        'Cache-Control': 'no-store',
+    })
+
+def month_files(cursor, month):
+    """(filenames, etag) of a YYYY-MM month's compilation, from the index alone"""
+    cursor.execute('SELECT filename, content_hash FROM posts WHERE year = ? AND month = ? ORDER BY filename',
+                   [int(month[:4]), int(month[5:])])
+    rows = [row for row in cursor.fetchall() if monthly.in_monthly(row['filename'])]
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(f"{row['filename']}\0{row['content_hash']}\n".encode('utf-8'))
+    return [row['filename'] for row in rows], digest.hexdigest()[:32]
+
+@app.route('/api/monthly')
+def api_monthly_list():
+    """Months that have a compilation, with their post counts"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT filename FROM posts ORDER BY filename')
+    counts = {}
+    for (filename,) in cursor:
+        if monthly.in_monthly(filename):
+            counts[filename[:7]] = counts.get(filename[:7], 0) + 1
+    conn.close()
+    return jsonify({'months': [{'month': month, 'posts': count, 'url': f'/api/monthly/{month}'}
+                               for month, count in counts.items()]})
+
+@app.route('/api/monthly/<month>')
+def api_monthly(month):
+    """A month's -A- and -D- posts, concatenated and decoded like monthly/YYYY-MM.txt.
+
+    The ETag comes from the index (the month's filenames and content hashes),
+    so a revalidation is answered with a 304 without opening a post.
+    """
+    if not monthly.MONTH.match(month):
+        return jsonify({'error': 'Invalid month, expected YYYY-MM'}), 400
+    conn = get_db()
+    filenames, etag = month_files(conn.cursor(), month)
+    conn.close()
+    if not filenames:
+        return jsonify({'error': f'No posts in {month}'}), 404
+
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    headers['Content-Disposition'] = f'inline; filename="{month}.txt"'
+    body = monthly.compile_month(POSTS_DIR / name for name in filenames)
+    return Response(body, mimetype='text/plain', headers=headers)
+
+@app.route('/api/preview.pdf')
+def api_preview_pdf():
+    """A date window of posts rendered like the books (see preview.py)"""
+    try:
+        weeks = int(request.args['weeks']) if request.args.get('weeks') else None
+        first, last = preview.window(datetime.now().date(), weeks, request.args.get('month'),
+                                     request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError as exc:
+        return jsonify({'error': f'Invalid preview window: {exc}. Use weeks=N, month=YYYY-MM '
+                                 'or start_date/end_date=YYYY-MM-DD'}), 400
+    category = request.args.get('category', '')
+    if category and category not in preview.CATEGORIES:
+        return jsonify({'error': f"Invalid category. Choose from: {', '.join(preview.CATEGORIES)}"}), 400
+
+    unavailable = preview.pdf_unavailable()
+    if unavailable:
+        return jsonify({'error': f'PDF rendering is unavailable: {unavailable}'}), 503
+
+    filters = {'category': category, 'search': request.args.get('search', ''),
+               'mode': request.args.get('mode', ''),
+               'start_date': first.isoformat(), 'end_date': last.isoformat()}
+    try:
+        conditions, params, match = build_post_filters(filters)
+    except QueryError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if match:
+        source = 'posts_fts JOIN posts ON posts.id = posts_fts.rowid WHERE posts_fts MATCH ? AND '
+        params = [match] + params
+    else:
+        source = 'posts WHERE '
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT posts.filename FROM ' + source + ' AND '.join(conditions)
+                   + ' ORDER BY posts.filename LIMIT ?', params + [preview.MAX_POSTS + 1])
+    filenames = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    if len(filenames) > preview.MAX_POSTS:
+        return jsonify({'error': f'A preview is limited to {preview.MAX_POSTS} posts; narrow the window'}), 400
+    try:
+        texts = read_post_files(filenames)
+    except StalePostsError as exc:
+        return jsonify({'error': str(exc)}), 409
+
+    with timed_stage('render'):
+        html = preview.render_html(texts)
+    with timed_stage('pdf'):
+        pdf, pages = preview.render_pdf(html)
+    return Response(pdf, mimetype='application/pdf', headers={
+        'Content-Disposition': f'inline; filename="preview-{first}-{last}.pdf"',
+        'Cache-Control': 'no-store',
+        'X-Preview-Posts': str(len(texts)),
+        'X-Preview-Pages': str(pages),
+    })
+
+def book_selection(conn, filters):
+    """(key, posts, title, subtitle) for the posts a filter selects.
+
+    posts is [(filename, content_hash)]. The key hashes the cover text and
+    those pairs from the index alone (as month_files does), so a cached book
+    is found without reading any post, any edit, addition or removal makes a
+    new book, and the same posts reached through a different filter share
+    one. Raises QueryError.
+    """
+    conditions, params, match = build_post_filters(filters)
+    if match:
+        source = 'posts_fts JOIN posts ON posts.id = posts_fts.rowid WHERE posts_fts MATCH ?'
+        params = [match] + params
+    else:
+        source = 'posts WHERE 1'
+    cursor = conn.cursor()
+    cursor.execute('SELECT posts.filename, posts.year, posts.content_hash FROM ' + source
+                   + ''.join(' AND ' + c for c in conditions) + ' ORDER BY posts.filename', params)
+    rows = cursor.fetchall()
+
+    title = BOOK_TITLES[filters['category']]
+    years = sorted({row['year'] for row in rows})
+    subtitle = ''
+    if years:
+        subtitle = str(years[0]) if years[0] == years[-1] else f'{years[0]} - {years[-1]}'
+    if filters['search']:
+        subtitle += f' \u00b7 \u201c{filters["search"]}\u201d'
+    digest = hashlib.sha256(f'{BOOK_FORMAT}\0{title}\0{subtitle}\0'.encode('utf-8'))
+    posts = [(row['filename'], row['content_hash']) for row in rows]
+    for filename, content_hash in posts:
+        digest.update(f'{filename}\0{content_hash}\n'.encode('utf-8'))
+    return digest.hexdigest()[:32], posts, title, subtitle
+
+def read_book_posts(posts):
+    """Raw texts of a book's (filename, content_hash) posts, in the worker.
+
+    Raises StalePostsError when a file was removed or no longer matches the
+    hash the book's key was made from, so a book is never cached under a
+    key that doesn't describe it.
+    """
+    texts = read_post_files(filename for filename, _ in posts)
+    changed = [filename for (filename, content_hash), text in zip(posts, texts)
+               if hashlib.sha1(text.encode('utf-8')).hexdigest() != content_hash]
+    if changed:
+        app.logger.warning('Indexed posts changed in %s: %s', POSTS_DIR, ', '.join(changed))
+        raise StalePostsError(changed, 'changed')
+    return texts
+
+def book_path(key):
+    return BOOK_CACHE_DIR / f'{key}.pdf'
+
+def book_status(job):
+    """Public view of a book job; call with BOOK_LOCK held"""
+    status = dict(job)
+    if job['status'] == 'done':
+        status['url'] = f"/api/books/{job['id']}.pdf"
+    elif job['status'] == 'queued':
+        status['position'] = 1 + sum(j['status'] == 'queued' and j['queued_at'] < job['queued_at']
+                                     for j in BOOK_JOBS.values())
+    return status
+
+def touch_book(path):
+    """Mark a cached book as recently used (eviction goes by mtime)"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def evict_book_cache(keep=None):
+    """Delete the least recently used books until the cache fits BOOK_CACHE_MAX_BYTES"""
+    books = []
+    for path in BOOK_CACHE_DIR.glob('*.pdf'):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        books.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in books)
+    for _, size, path in sorted(books):
+        if total <= BOOK_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        with BOOK_LOCK:
+            if BOOK_JOBS.get(path.stem, {}).get('status') == 'done':
+                del BOOK_JOBS[path.stem]
+
+def render_custom_book(job, posts):
+    """Run custom_book.py for a job, following its progress; returns an error or None"""
+    try:
+        texts = read_book_posts(posts)
+    except StalePostsError as exc:
+        return str(exc)
+    BOOK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=BOOK_CACHE_DIR, prefix='.', suffix='.json') as spec, \
+            tempfile.TemporaryFile() as stderr:
+        json.dump(texts, spec)
+        spec.flush()
+        proc = subprocess.Popen(
+            [sys.executable, str(CUSTOM_BOOK_SCRIPT), str(book_path(job['id'])),
+             '--title', job['title'], '--subtitle', job['subtitle'], '--texts-json', spec.name, '--progress'],
+            stdout=subprocess.PIPE, stderr=stderr, text=True, encoding='utf-8')
+        for line in proc.stdout:
+            try:
+                progress = json.loads(line)
+            except ValueError:
+                continue
+            with BOOK_LOCK:
+                job.update(progress)
+        if proc.wait() == 0:
+            return None
+        stderr.seek(0)
+        lines = stderr.read().decode('utf-8', 'replace').strip().splitlines()
+        return lines[-1] if lines else f'custom_book.py exited with {proc.returncode}'
+
+def run_book_jobs():
+    """Worker thread: render queued books one at a time, each in its own process"""
+    while True:
+        job, posts = BOOK_QUEUE.get()
+        with BOOK_LOCK:
+            job.update(status='running', stage='starting', started_at=time.time())
+        start = time.perf_counter()
+        try:
+            error = render_custom_book(job, posts)
+        except Exception as exc:
+            error = str(exc)
+        STAGE_SECONDS.observe(('book',), time.perf_counter() - start)
+        with BOOK_LOCK:
+            job.update(status='failed' if error else 'done', finished_at=time.time())
+            if error:
+                job['error'] = error
+        if not error:
+            evict_book_cache(keep=book_path(job['id']))
+
+def ensure_book_worker():
+    global _BOOK_WORKER
+    with BOOK_LOCK:
+        if _BOOK_WORKER is None:
+            _BOOK_WORKER = threading.Thread(target=run_book_jobs, name='book-worker', daemon=True)
+            _BOOK_WORKER.start()
+
+@app.route('/api/books', methods=['POST'])
+def api_books_create():
+    """Queue a book for a filter (category, start_date, end_date, search, mode), or return the cached one"""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object body'}), 400
+    filters = {k: str(body.get(k) or '') for k in ('category', 'start_date', 'end_date', 'search', 'mode')}
+    if filters['category'] not in BOOK_TITLES:
+        return jsonify({'error': f"Invalid category. Choose from: {', '.join(c for c in BOOK_TITLES if c)}"}), 400
+    unavailable = preview.pdf_unavailable()
+    if unavailable:
+        return jsonify({'error': f'PDF rendering is unavailable: {unavailable}'}), 503
+
+    conn = get_db()
+    try:
+        key, posts, title, subtitle = book_selection(conn, filters)
+    except QueryError as exc:
+        return jsonify({'error': str(exc)}), 400
+    finally:
+        conn.close()
+    if not posts:
+        return jsonify({'error': 'No posts match these filters'}), 404
+
+    path = book_path(key)
+    with BOOK_LOCK:
+        job = BOOK_JOBS.get(key)
+        if job and job['status'] in ('queued', 'running'):
+            return jsonify(book_status(job)), 202
+        if path.exists():
+            if not job:
+                job = BOOK_JOBS[key] = {'id': key, 'status': 'done', 'title': title, 'subtitle': subtitle,
+                                        'posts': len(posts), 'bytes': path.stat().st_size}
+            touch_book(path)
+            return jsonify(book_status(job))
+        if sum(j['status'] == 'queued' for j in BOOK_JOBS.values()) >= BOOK_QUEUE_LIMIT:
+            return jsonify({'error': 'Too many books queued; try again shortly'}), 503, {'Retry-After': '30'}
+        job = BOOK_JOBS[key] = {'id': key, 'status': 'queued', 'stage': 'queued', 'title': title,
+                                'subtitle': subtitle, 'posts': len(posts), 'queued_at': time.time()}
+        BOOK_QUEUE.put((job, posts))
+        status = book_status(job)
+    ensure_book_worker()
+    return jsonify(status), 202, {'Location': f'/api/books/{key}'}
+
+@app.route('/api/books/<key>')
+def api_books_status(key):
+    """Progress of a book job: queued (with position), running (stage), done (url) or failed (error)"""
+    if not BOOK_KEY_RE.match(key):
+        return jsonify({'error': 'Invalid book id'}), 400
+    with BOOK_LOCK:
+        job = BOOK_JOBS.get(key)
+        status = book_status(job) if job else None
+    if status:
+        return jsonify(status)
+    path = book_path(key)
+    if path.exists():
+        return jsonify({'id': key, 'status': 'done', 'bytes': path.stat().st_size, 'url': f'/api/books/{key}.pdf'})
+    return jsonify({'error': 'Book not found'}), 404
+
+@app.route('/api/books/<key>.pdf')
+def api_books_pdf(key):
+    """The finished book; immutable, since its id is a hash of its content"""
+    if not BOOK_KEY_RE.match(key):
+        return jsonify({'error': 'Invalid book id'}), 400
+    path = book_path(key)
+    if not path.exists():
+        with BOOK_LOCK:
+            job = BOOK_JOBS.get(key)
+        if job and job['status'] in ('queued', 'running'):
+            return jsonify({'error': 'Book is not ready yet', 'status': job['status']}), 409
+        return jsonify({'error': 'Book not found'}), 404
+    touch_book(path)
+    return send_file(path, mimetype='application/pdf', conditional=True, etag=key,
+                     max_age=BOOK_MAX_AGE, download_name=f'zoolog-{key[:8]}.pdf')
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """Index newly written post files (called by the zoomail.py ingest daemon).
+
+    Body: {"files": ["2024-01-20-J-2024-01-20.txt", ...]}, names relative to posts/.
+    """
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True)
+    files = data.get('files') if isinstance(data, dict) else None
+    if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+        return jsonify({'error': 'Expected a JSON body {"files": [filename, ...]}'}), 400
+
+    indexed, skipped = upsert_posts(files)
+    return jsonify({'indexed': indexed, 'skipped': skipped})
+
 @app.route('/api/search/suggestions')
 def api_search_suggestions():
     """Get search suggestions"""
@@ -814,18 +1677,27 @@ def api_search_suggestions():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get common words/phrases from cleaned titles and content
-    cursor.execute('''
-        SELECT clean_title, clean_content FROM posts 
-        WHERE clean_title LIKE ? OR clean_content LIKE ?
-        LIMIT 10
-    ''', [f'%{query}%', f'%{query}%'])
+    # Get common words/phrases from titles and content: posts containing the
+    # text, found through the trigram index (too short for it: LIKE)
+    if len(query) >= TRIGRAM_MIN_LENGTH:
+        cursor.execute('''
+            SELECT posts.title, posts.content FROM posts_trigram
+            JOIN posts ON posts.id = posts_trigram.rowid
+            WHERE posts_trigram MATCH ?
+            LIMIT 10
+        ''', [fts_string(query)])
+    else:
+        cursor.execute('''
+            SELECT title, content FROM posts 
+            WHERE title LIKE ? OR content LIKE ?
+            LIMIT 10
+        ''', [f'%{query}%', f'%{query}%'])
     
     suggestions = set()
     for row in cursor.fetchall():
-        # Simple word extraction for suggestions from cleaned text
-        text = (row['clean_title'] or '') + ' ' + (row['clean_content'] or '')
-        words = text.lower().split()
+        # Simple word extraction for suggestions
+        text = (row['title'] or '') + ' ' + (row['content'] or '')
+        words = re.findall(r'\w+', text.lower())
         for word in words:
             if query.lower() in word and len(word) > 2:
                 suggestions.add(word)
@@ -833,6 +1705,10 @@ def api_search_suggestions():
             break
     
     conn.close()
+
+    # Nothing contains it, so it may be misspelled: offer the nearest indexed words
+    if not suggestions and query.isalpha():
+        suggestions.update(search_vocabulary().similar(query, limit=10))
     
     return jsonify(list(suggestions)[:10])
 
@@ -881,19 +1757,42 @@ def api_stats():
         'yearly_counts': yearly_counts
     })
 
+@app.route('/api/metrics')
+def api_metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    lines = []
+    for histogram in (REQUEST_SECONDS, SQL_SECONDS, STAGE_SECONDS):
+        lines.extend(histogram.render())
+    with METRICS_LOCK:
+        slow = SLOW_QUERIES['count']
+    lines += [
+        f'# HELP zoolog_slow_queries_total Statements slower than {SLOW_QUERY_MS:g} ms',
+        '# TYPE zoolog_slow_queries_total counter',
+        f'zoolog_slow_queries_total {slow}',
+        '# HELP zoolog_process_start_time_seconds Unix time the server started',
+        '# TYPE zoolog_process_start_time_seconds gauge',
+        f'zoolog_process_start_time_seconds {STARTED_AT:.3f}',
+    ]
+    return Response('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def mailed_photos(date):
+    """Names of the photos mailed in for a date, from MAIL_PHOTOS_DIR"""
+    listed = MAIL_PHOTOS_DIR / date / DEFAULT_PHOTO_SIZE
+    return sorted(f.name for f in listed.glob('*.jpg')) if listed.is_dir() else []
+
 @app.route('/api/photos/<date>')
 def api_photos(date):
-    """Get photos for a specific date"""
+    """Get photos for a specific date: the fetched ones, then any mailed in"""
     try:
         # Validate date format
         datetime.strptime(date, '%Y-%m-%d')
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    date_photos_dir = PHOTOS_DIR / date
+    date_photos_dir = PHOTOS_DIR / date / DEFAULT_PHOTO_SIZE
     cached = True
 
-    # Fetch photos if they are not already cached
+    # Fetch photos if they are not already cached (mailed photos don't count)
     if not (date_photos_dir.exists() and any(date_photos_dir.glob('*.jpg'))):
         try:
             fetch_photos_for_date(date)
@@ -901,21 +1800,21 @@ def api_photos(date):
         except PhotoFetchTimeout as exc:
             return jsonify({
                 'date': date,
-                'photos': [],
+                'photos': mailed_photos(date),
                 'error': str(exc),
                 'cached': False
             }), 500
         except PhotoFetchError as exc:
             return jsonify({
                 'date': date,
-                'photos': [],
+                'photos': mailed_photos(date),
                 'error': str(exc),
                 'cached': False
             }), 500
         except Exception as exc:
             return jsonify({
                 'date': date,
-                'photos': [],
+                'photos': mailed_photos(date),
                 'error': f'Unexpected error: {exc}',
                 'cached': False
             }), 500
@@ -925,22 +1824,28 @@ def api_photos(date):
         photo_files = sorted(f.name for f in date_photos_dir.glob('*.jpg'))
     else:
         photo_files = []
+    photo_files += [name for name in mailed_photos(date) if name not in photo_files]
 
     return jsonify({
         'date': date,
         'photos': photo_files,
+        'sizes': list(PHOTO_SIZES),
         'cached': cached
     })
 
 @app.route('/photos/<date>/<filename>')
 def serve_photo(date, filename):
-    """Serve photo files"""
+    """Serve photo files, optionally at a smaller size (?size=thumb|medium|full)"""
     try:
         # Validate date format
         datetime.strptime(date, '%Y-%m-%d')
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
 
+    size = request.args.get('size', DEFAULT_PHOTO_SIZE)
+    if size not in PHOTO_SIZES:
+        return jsonify({'error': 'Invalid size'}), 400
+
     # Security: ensure filename is just a filename (no path traversal)
     if '/' in filename or '\\' in filename or filename.startswith('.'):
         return jsonify({'error': 'Invalid filename'}), 400
@@ -949,14 +1854,18 @@ def serve_photo(date, filename):
     if not all(c.isalnum() or c in '.-_' for c in filename):
         return jsonify({'error': 'Invalid filename'}), 400
 
-    # Construct path and resolve to prevent path traversal
-    photo_path = (PHOTOS_DIR / date / filename).resolve()
+    # Construct path and resolve to prevent path traversal; a name not in the
+    # fetched cache may be a mailed photo
+    for store in (PHOTOS_DIR, MAIL_PHOTOS_DIR):
+        photo_path = (store / date / size / filename).resolve()
 
-    # Ensure the resolved path is within PHOTOS_DIR
-    try:
-        photo_path.relative_to(PHOTOS_DIR.resolve())
-    except ValueError:
-        return jsonify({'error': 'Invalid path'}), 403
+        # Ensure the resolved path is within the store
+        try:
+            photo_path.relative_to(store.resolve())
+        except ValueError:
+            return jsonify({'error': 'Invalid path'}), 403
+        if photo_path.exists():
+            break
 
     if not photo_path.exists():
         return jsonify({'error': 'Photo not found'}), 404
@@ -965,7 +1874,21 @@ def serve_photo(date, filename):
     if not photo_path.is_file():
         return jsonify({'error': 'Invalid resource'}), 403
 
-    return send_file(photo_path, mimetype='image/jpeg')
+    # Conditional responses give ETag/Last-Modified revalidation and Range
+    # support; a content-hashed name also lets the browser skip the round trip.
+    hashed = PHOTO_NAME_RE.match(filename) is not None
+    response = send_file(
+        photo_path,
+        mimetype='image/jpeg',
+        conditional=True,
+        etag=True,
+        max_age=PHOTO_CACHE_MAX_AGE if hashed else 0
+    )
+    if hashed:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 if __name__ == '__main__':
     # Run indexer at startup (only in the reloader process to avoid running twice)
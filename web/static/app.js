@@ -9,12 +9,18 @@ class ZoologApp {
         const endDateParam = urlParams.get('end_date');
         const categoryParam = urlParams.get('category');
         const searchParam = urlParams.get('search');
+        const sortParam = urlParams.get('sort');
+        const recencyParam = urlParams.get('recency');
+        const modeParam = urlParams.get('mode');
         
         this.currentQuery = {
             search: searchParam || '',
             category: categoryParam || '',
             start_date: startDateParam || '',
             end_date: endDateParam || '',
+            sort: sortParam || 'date',
+            recency: recencyParam || '',
+            mode: modeParam || '',
             offset: 0,
             limit: limitParam ? parseInt(limitParam) : 200
         };
@@ -30,6 +36,9 @@ class ZoologApp {
         this.photosByDate = new Map(); // Store photos by date
         this.currentPhotoFetch = null; // Track current photo fetch request
         this.MAX_CACHED_DATES = 50; // Limit cache to 50 dates to prevent memory leak
+        this.postCache = new Map(); // Rendered posts by id + filter context, oldest first
+        this.pendingPosts = new Map(); // Prefetches in flight, so a click can await them
+        this.MAX_CACHED_POSTS = 50;
 
         this.init();
     }
@@ -306,12 +315,20 @@ class ZoologApp {
         if (reset) {
             this.posts = [];
             this.currentQuery.offset = 0;
+            this.postCache.clear(); // New results; don't show posts rendered before
         }
         
         try {
             const params = new URLSearchParams(this.currentQuery);
             const response = await fetch(`/api/posts?${params}`);
             const data = await response.json();
+
+            if (data.error) {
+                // e.g. an invalid date: filter in the search box
+                console.warn('Search error:', data.error);
+                data.posts = [];
+                data.total = 0;
+            }
             
             if (reset) {
                 this.posts = data.posts;
@@ -393,20 +410,77 @@ class ZoologApp {
         countElement.textContent = `(${this.posts.length} of ${this.totalPosts})`;
     }
     
+    postContextParams() {
+        // The filter context decides a post's prev/next, so it is part of the cache key
+        return new URLSearchParams({
+            search: this.currentQuery.search,
+            category: this.currentQuery.category,
+            start_date: this.currentQuery.start_date,
+            end_date: this.currentQuery.end_date,
+            mode: this.currentQuery.mode
+        });
+    }
+
+    cachePost(key, data) {
+        this.postCache.delete(key);
+        this.postCache.set(key, data);
+        if (this.postCache.size > this.MAX_CACHED_POSTS) {
+            this.postCache.delete(this.postCache.keys().next().value);
+        }
+    }
+
+    async fetchPost(postId, params) {
+        const key = `${postId}?${params}`;
+        if (this.postCache.has(key)) {
+            const data = this.postCache.get(key);
+            this.cachePost(key, data); // Mark as recently used
+            return data;
+        }
+        if (this.pendingPosts.has(key)) {
+            const data = await this.pendingPosts.get(key);
+            if (data) return data;
+        }
+        const response = await fetch(`/api/post/${postId}?${params}`);
+        const data = await response.json();
+        if (!data.error) this.cachePost(key, data);
+        return data;
+    }
+
+    prefetchNeighbours() {
+        // Fetch the prev/next posts in one batch so arrow keys and j/k open them instantly
+        if (!this.currentPost) return;
+        const params = this.postContextParams();
+        const ids = ['prev', 'next']
+            .map(direction => this.currentPost[direction])
+            .filter(neighbour => neighbour)
+            .map(neighbour => neighbour.id)
+            .filter(id => !this.postCache.has(`${id}?${params}`) && !this.pendingPosts.has(`${id}?${params}`));
+        if (ids.length === 0) return;
+
+        const batch = fetch(`/api/posts/batch?ids=${ids.join(',')}&${params}`)
+            .then(response => response.json())
+            .then(data => {
+                (data.posts || []).forEach(item => this.cachePost(`${item.post.id}?${params}`, item));
+                return data.posts || [];
+            })
+            .catch(error => {
+                console.warn('Error prefetching posts:', error);
+                return [];
+            });
+        ids.forEach(id => {
+            const key = `${id}?${params}`;
+            const pending = batch.then(posts => posts.find(item => item.post.id === id) || null);
+            this.pendingPosts.set(key, pending);
+            pending.finally(() => this.pendingPosts.delete(key));
+        });
+    }
+
     async openPost(postId) {
         this.showLoading();
         
         try {
             // Pass current search context to get correct prev/next posts
-            const params = new URLSearchParams({
-                search: this.currentQuery.search,
-                category: this.currentQuery.category,
-                start_date: this.currentQuery.start_date,
-                end_date: this.currentQuery.end_date
-            });
-            
-            const response = await fetch(`/api/post/${postId}?${params}`);
-            const data = await response.json();
+            const data = await this.fetchPost(postId, this.postContextParams());
             
             if (data.error) {
                 alert('Post not found');
@@ -417,6 +491,7 @@ class ZoologApp {
             this.renderPost();
             this.highlightCurrentPost();
             this.showPostViewer();
+            this.prefetchNeighbours();
             
             // Load photos for this date asynchronously (don't await)
             const postDate = data.post.date.split('T')[0]; // Extract YYYY-MM-DD from ISO datetime
@@ -429,7 +504,7 @@ class ZoologApp {
         }
     }
     
-    highlightSearchTerms(html, searchTerms) {
+    highlightSearchTerms(html, searchTerms, searchMode) {
         if (!searchTerms || searchTerms.length === 0) return html;
 
         // Create a DOM parser to properly handle HTML
@@ -440,7 +515,10 @@ class ZoologApp {
             if (term.length > 1) {
                 // Escape special regex characters in the search term
                 const escapedTerm = term.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
-                const regex = new RegExp(`\\b(${escapedTerm})\\b`, 'gi');
+                // Substring searches match inside words, so highlight there too
+                const regex = searchMode === 'substring'
+                    ? new RegExp(`(${escapedTerm})`, 'gi')
+                    : new RegExp(`\\b(${escapedTerm})\\b`, 'gi');
 
                 // Walk through all text nodes
                 const walker = document.createTreeWalker(
@@ -488,7 +566,7 @@ class ZoologApp {
         // Highlight search terms if they exist
         let htmlContent = post.html_content;
         if (this.currentPost.search_terms) {
-            htmlContent = this.highlightSearchTerms(htmlContent, this.currentPost.search_terms);
+            htmlContent = this.highlightSearchTerms(htmlContent, this.currentPost.search_terms, this.currentPost.search_mode);
         }
         
         postContent.innerHTML = `
@@ -608,7 +686,7 @@ class ZoologApp {
         document.getElementById('search-input').value = '';
         document.getElementById('category-filter').value = '';
 
-        // Get limit from URL params
+        // Get limit and sort mode from URL params
         const urlParams = new URLSearchParams(window.location.search);
         const limitParam = urlParams.get('limit');
 
@@ -617,6 +695,9 @@ class ZoologApp {
             category: '',
             start_date: '',
             end_date: '',
+            sort: urlParams.get('sort') || 'date',
+            recency: urlParams.get('recency') || '',
+            mode: urlParams.get('mode') || '',
             offset: 0,
             limit: limitParam ? parseInt(limitParam) : 200
         };
@@ -734,6 +815,8 @@ class ZoologApp {
                 const photos = data.photos.map(filename => ({
                     filename: filename,
                     url: `/photos/${date}/${filename}`,
+                    thumbUrl: `/photos/${date}/${filename}?size=thumb`,
+                    fullUrl: `/photos/${date}/${filename}?size=full`,
                     date: date
                 }));
                 this.cachePhotos(date, photos);
@@ -807,9 +890,11 @@ class ZoologApp {
         
         this.currentPhotos.forEach((photo, index) => {
             const img = document.createElement('img');
-            img.src = photo.url;
+            img.src = photo.thumbUrl;
             img.alt = `Photo from ${date}`;
             img.className = 'photo-thumbnail';
+            img.loading = 'lazy';
+            img.decoding = 'async';
             img.dataset.index = index;
             
             img.addEventListener('click', () => {
@@ -849,6 +934,9 @@ class ZoologApp {
         const prevBtn = document.getElementById('lightbox-prev');
         const nextBtn = document.getElementById('lightbox-next');
         
+        // Let the browser pick the full-size rendition only on large/high-DPI screens
+        lightboxImage.srcset = `${photo.url} 1000w, ${photo.fullUrl} 2000w`;
+        lightboxImage.sizes = '100vw';
         lightboxImage.src = photo.url;
         lightboxImage.alt = `Photo from ${photo.date}`;
         
@@ -1,61 +1,681 @@
 #!/usr/bin/env python3
+"""
+Zoomail ingest daemon: turns journal emails into posts/*.txt.
 
-import io
-import email
-from glob import glob
+Keeps a mailbox connection open and waits for new mail with IMAP IDLE,
+falling back to POP3 polling when the server has no IMAP. New messages are
+handled in batches: each post is written atomically (temp file + rename),
+then the batch is deleted from the mailbox, and the web app and the PWA
+bundle are told about the new files so entries show up within seconds.
+
+    ./zoomail.py                 # run forever
+    ./zoomail.py --once          # drain the mailbox and exit (the old behaviour)
+    ./zoomail.py --maildir DIR   # read a local Maildir instead of a server
+
+The Maildir mode is a stand-in mail server for testing: drop an .eml file
+into DIR/new/ and it is ingested on the next poll.
+
+Messages are streamed from the server in chunks into an incremental MIME
+parser, one at a time. The post text is the first plain-text body found
+anywhere in the (possibly nested) multipart tree, falling back to HTML.
+Every attachment is kept under attachments/<post>/. The parser holds each
+part's encoded payload while the message is parsed, so memory grows with the
+message; the decoded copy is written out a line at a time. Photos of
+PHOTO_MIN_KB or more are also rendered into the photo store
+(photos/YYYY-MM-DD/<size>/, see photo_renditions.py), which the web app lists
+alongside the photos it fetches for a date. Posts are written
+quoted-printable, like every other post file.
+
+Configuration (zoomail.ini):
+
+    [email]
+    USER = ...
+    PASS = ...
+    SERVER = mail.example.com
+    PROTOCOL = auto        # auto (IMAP, else POP3), imap or pop3
+    SSL = no
+    MAILBOX = INBOX        # IMAP folder
+
+    [ingest]
+    POSTS = posts                                 # relative to this script
+    PHOTOS = photos                               # photo store, relative to this script
+    ATTACHMENTS = attachments
+    PHOTO_MIN_KB = 100                            # smaller images are attachments
+    BATCH_SIZE = 20
+    POLL_INTERVAL = 60                            # seconds, POP3/Maildir
+    IDLE_TIMEOUT = 1500                           # seconds, re-issue IDLE
+    NOTIFY = http://localhost:8000/api/ingest     # space-separated, or empty
+    PWA = yes                                     # rebuild pwa/data after a batch
+"""
+
+import argparse
+import base64
+import configparser
+import email.policy
+import email.utils
+import imaplib
+import json
+import mailbox
+import mimetypes
+import os
 import poplib
-import time
+import quopri
 import re
-import configparser
+import select
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from email.parser import BytesFeedParser
+from html.parser import HTMLParser
+from pathlib import Path
+
+import photo_renditions
+
+ROOT = Path(__file__).resolve().parent
+PWA_BUILD = ROOT / "pwa" / "build_data.py"
+
+DEFAULTS = {
+    "email": {
+        "PROTOCOL": "auto",
+        "SSL": "no",
+        "MAILBOX": "INBOX",
+    },
+    "ingest": {
+        "POSTS": "posts",
+        "PHOTOS": "photos",
+        "ATTACHMENTS": "attachments",
+        "PHOTO_MIN_KB": "100",
+        "BATCH_SIZE": "20",
+        "POLL_INTERVAL": "60",
+        "IDLE_TIMEOUT": "1500",
+        "NOTIFY": "http://localhost:8000/api/ingest",
+        "PWA": "yes",
+    },
+}
+
+# Seconds to wait before reconnecting after a connection error, doubling up to the max
+RETRY_DELAY = 5
+RETRY_MAX = 300
+
+# Bytes per read when streaming a message from the mailbox
+CHUNK_SIZE = 256 * 1024
+
+# Seconds ImageMagick may take per rendition
+MAGICK_TIMEOUT = 60
+
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def log(*args):
+    print(*args, flush=True)
+
+
+# ---------------------------------------------------------------------------
+# Mail -> post
+# ---------------------------------------------------------------------------
+
+def parse_message(chunks):
+    """Feed an iterable of byte chunks through the incremental MIME parser"""
+    parser = BytesFeedParser(policy=email.policy.default)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("br", "p", "div", "li", "tr"):
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        self.parts.append(data)
 
-POSTS = "/Users/dmd/Dropbox/dashare/zoolog/posts"
-
-config = configparser.ConfigParser()
-config.read('zoomail.ini')
-USER = config['email']['USER']
-PASS = config['email']['PASS']
-SERVER = config['email']['SERVER']
-
-pop = poplib.POP3(SERVER)
-pop.user(USER)
-pop.pass_(PASS)
-resp, items, octets = pop.list()
-print("connected ok to zoomail server")
-
-for item in items:
-    mid = int(item.split()[0])
-    resp, text, octets = pop.retr(mid)
-    text = b"\n".join(text)
-    msg = email.message_from_string(text.decode("utf-8"))
-
-    if type(msg.get_payload()) is list:
-        # multipart message; get the plain version
-        for part in msg.get_payload():
-            if part.get_content_type() == "text/plain":
-                plainbody = part.get_payload()
+
+def html_to_text(html):
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    return re.sub(r"\n{3,}", "\n\n", "".join(extractor.parts)).strip()
+
+
+def part_text(part):
+    """Decoded text of a text/* part, tolerating bad or unknown charsets"""
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeError):
+        return (part.get_payload(decode=True) or b"").decode("utf-8", "replace")
+
+
+def quote_filtered(text):
+    """Yield the lines of text minus quoted replies and the reply line"""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        end = len(text) if end < 0 else end
+        line = text[start:end]
+        start = end + 1
+        if "zooreport@" not in line and not line.startswith(">"):
+            yield line
+
+
+def message_to_post(msg):
+    """Return (filename, text, date) for a parsed message.
+
+    Missing or malformed Subject/Date headers fall back to defaults rather than
+    dropping the post.
+    """
+    body = msg.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        plainbody = ""
+    elif body.get_content_subtype() == "html":
+        plainbody = html_to_text(part_text(body))
     else:
-        plainbody = msg.get_payload()
-
-    # get rid of the reply line
-    cleanedbody = "\n".join(
-        [
-            line
-            for line in plainbody.split("\n")
-            if "zooreport@" not in line and not line.startswith(">")
-        ]
-    ).rstrip() + "\n"
-
-    subject = msg.get("Subject").replace("Re: ", "")
+        plainbody = part_text(body)
+    cleanedbody = "\n".join(quote_filtered(plainbody.replace("\r\n", "\n"))).rstrip() + "\n"
+
+    subject = str(msg.get("Subject") or "untitled").replace("Re: ", "")
     stripsubject = re.sub("[^0-9a-zA-Z]+", "-", subject)
-    headerdate = time.strftime("%Y-%m-%d", email.utils.parsedate(msg["Date"]))
+    try:
+        sent = msg["Date"].datetime
+    except (AttributeError, TypeError, ValueError):
+        sent = None
+    headerdate = sent.strftime("%Y-%m-%d") if sent else time.strftime("%Y-%m-%d")
+
+    # Post files are quoted-printable (every reader decodes them); the body was decoded above
+    output = quopri.encodestring("\n".join(("# " + subject, "", cleanedbody)).encode("utf-8")).decode("ascii")
+    return stripsubject + "-" + headerdate + ".txt", output, headerdate
+
+
+class _PayloadReader:
+    """Binary readline() over a transfer-encoded str payload without copying it"""
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def readline(self, size=-1):
+        end = self.text.find("\n", self.pos)
+        end = len(self.text) if end < 0 else end + 1
+        line = self.text[self.pos:end]
+        self.pos = end
+        # The parser keeps undecodable bytes as surrogates; this restores them
+        return line.encode("ascii", "surrogateescape")
+
+    def read(self, size=-1):
+        return self.readline()
+
+
+def spool_part(part, dest):
+    """Decode a leaf part's payload into dest (atomically), a line at a time,
+    then drop the encoded payload from the message. Returns the byte size."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    encoding = part.get("Content-Transfer-Encoding", "7bit").strip().lower()
+    reader = _PayloadReader(part.get_payload())
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix="." + dest.name + ".", suffix=".tmp")
+    try:
+        os.chmod(tmp, 0o666 & ~UMASK)
+        with os.fdopen(fd, "wb") as out:
+            if encoding == "base64":
+                base64.decode(reader, out)
+            elif encoding == "quoted-printable":
+                quopri.decode(reader, out)
+            else:
+                for line in iter(reader.readline, b""):
+                    out.write(line)
+            size = out.tell()
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    part.set_payload("")
+    return size
+
+
+def attachment_name(part, n):
+    """Safe filename for a part: its own name if it has one, else part-N.ext"""
+    name = part.get_filename()
+    name = re.sub(r"[^\w.-]+", "_", Path(name).name).strip("._") if name else ""
+    if not name:
+        ext = mimetypes.guess_extension(part.get_content_type()) or ".bin"
+        name = f"part-{n}{ext}"
+    return name
+
+
+def store_photo(src, photos_dir, headerdate):
+    """Render the image at src into the photo store; returns the default-size path.
+
+    The renditions go to photos_dir/<date>/<size>/ as DATE-N-<hash>.jpg (see
+    photo_renditions), N following the date's mailed photos. Raises OSError,
+    subprocess.SubprocessError or photo_renditions.RenditionError.
+    """
+    date_dir = photos_dir / headerdate
+    listed = date_dir / photo_renditions.DEFAULT_PHOTO_SIZE
+    n = len(list(listed.glob("*.jpg"))) + 1 if listed.is_dir() else 1
+    name = photo_renditions.photo_name(headerdate, n, src)
+    date_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=date_dir, prefix=".") as tmp:
+        photo_renditions.render(src, name, Path(tmp), MAGICK_TIMEOUT)
+        photo_renditions.install(Path(tmp), [name], date_dir)
+    return listed / name
+
+
+def save_attachments(msg, stem, headerdate, photos_dir, attachments_dir, photo_min_bytes):
+    """Spool every non-body leaf part of msg to attachments_dir/<stem>/.
+
+    Images of photo_min_bytes or more are also added to the photo store in
+    photos_dir (see store_photo). A part that fails to decode, or a photo
+    ImageMagick can't render, is logged and skipped. Returns the paths written.
+    """
+    body = msg.get_body(preferencelist=("plain", "html"))
+    saved = []
+    for n, part in enumerate(msg.walk(), start=1):
+        if part.is_multipart() or part is body:
+            continue
+        if part.get_content_maintype() == "text" and part.get_content_disposition() != "attachment":
+            continue  # alternative renderings of the body
+        name = attachment_name(part, n)
+        try:
+            dest = attachments_dir / stem / name
+            size = spool_part(part, dest)
+        except (ValueError, OSError) as e:
+            log(f"could not save attachment '{name}': {e}")
+            continue
+        saved.append(dest)
+        if part.get_content_maintype() == "image" and size >= photo_min_bytes:
+            try:
+                saved.append(store_photo(dest, photos_dir, headerdate))
+            except (OSError, subprocess.SubprocessError, photo_renditions.RenditionError) as e:
+                log(f"could not add photo '{name}' to {photos_dir}: {e}")
+    return saved
+
+
+def write_atomic(path, text):
+    """Write text to path so readers only ever see the old or the complete new file.
+
+    The temp file is a dotfile in the same directory (so the rename is atomic and
+    `*.txt` globs never pick it up) and is fsynced before it replaces the target.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix="." + path.name + ".", suffix=".tmp")
+    try:
+        os.chmod(tmp, 0o666 & ~UMASK)  # mkstemp creates 0600; match a plain open()
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Mail sources
+#
+# Each source lists up to `limit` message keys with fetch(limit), yields one
+# message's raw bytes in chunks with stream(key), deletes processed keys with
+# delete(keys), and blocks in wait(timeout) until new mail may have arrived.
+# ---------------------------------------------------------------------------
+
+class ImapSource:
+    """Persistent IMAP connection; waits with IDLE when the server supports it"""
+
+    name = "IMAP"
+
+    def __init__(self, server, user, password, mailbox="INBOX", use_ssl=False, idle_timeout=1500):
+        self.server, self.user, self.password = server, user, password
+        self.mailbox = mailbox
+        self.use_ssl = use_ssl
+        self.idle_timeout = idle_timeout
+        self.conn = None
+
+    def connect(self):
+        cls = imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4
+        self.conn = cls(self.server)
+        self.conn.login(self.user, self.password)
+        self.conn.select(self.mailbox)
+
+    def fetch(self, limit):
+        _, data = self.conn.uid("SEARCH", None, "ALL")
+        return data[0].split()[:limit]
+
+    def stream(self, uid):
+        # Partial fetches, so a large message never arrives as one literal
+        offset = 0
+        while True:
+            _, data = self.conn.uid("FETCH", uid, f"(BODY.PEEK[]<{offset}.{CHUNK_SIZE}>)")
+            chunk = next((item[1] for item in data if isinstance(item, tuple)), b"")
+            if chunk:
+                yield chunk
+            if len(chunk) < CHUNK_SIZE:
+                return
+            offset += len(chunk)
+
+    def delete(self, keys):
+        if keys:
+            self.conn.uid("STORE", b",".join(keys), "+FLAGS", "(\\Deleted)")
+            self.conn.expunge()
+
+    def wait(self, timeout):
+        if "IDLE" not in self.conn.capabilities:
+            time.sleep(timeout)
+            return
+        self._idle(min(timeout, self.idle_timeout))
+
+    def _idle(self, timeout):
+        """RFC 2177 IDLE until the server reports new mail or timeout expires"""
+        conn = self.conn
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+        if not conn.readline().startswith(b"+"):
+            raise imaplib.IMAP4.error("server refused IDLE")
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._readable(remaining):
+                break
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(b"*") and b"EXISTS" in line:
+                break
+        conn.send(b"DONE\r\n")
+        while not conn.readline().startswith(tag):
+            pass
+
+    def _readable(self, timeout):
+        """Whether a response line can be read within timeout.
+
+        imaplib reads through a buffered file (and SSL has its own record
+        buffer), so a line may already be waiting in either while select()
+        sees nothing left on the socket.
+        """
+        conn = self.conn
+        sock = conn.sock
+        if getattr(sock, "pending", None) and sock.pending():
+            return True
+        previous = sock.gettimeout()
+        sock.settimeout(0)  # so peek() returns what is buffered instead of waiting for more
+        try:
+            if conn.file.peek(1):
+                return True
+        except (BlockingIOError, ssl.SSLWantReadError):
+            pass
+        finally:
+            sock.settimeout(previous)
+        return bool(select.select([sock], [], [], timeout)[0])
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+            self.conn = None
+
+
+class Pop3Source:
+    """POP3 polling. Deletions only take effect at QUIT, so every poll is its
+    own session and a batch is committed by closing it."""
+
+    name = "POP3"
+
+    def __init__(self, server, user, password, use_ssl=False):
+        self.server, self.user, self.password = server, user, password
+        self.use_ssl = use_ssl
+        self.conn = None
+        self.numbers = {}  # UIDL id -> message number in the current session
+
+    def connect(self):
+        cls = poplib.POP3_SSL if self.use_ssl else poplib.POP3
+        self.conn = cls(self.server)
+        self.conn.user(self.user)
+        self.conn.pass_(self.password)
+
+    def fetch(self, limit):
+        # Message numbers change between sessions; UIDL ids are the stable keys
+        if self.conn is None:
+            self.connect()
+        _, items, _ = self.conn.uidl()
+        self.numbers = {}
+        for item in items:
+            num, uid = item.split()[:2]
+            self.numbers[uid] = int(num)
+        return list(self.numbers)[:limit]
+
+    def stream(self, uid):
+        # RETR line by line (poplib's retr() collects the whole message)
+        conn = self.conn
+        conn._putcmd(f"RETR {self.numbers[uid]}")
+        conn._getresp()
+        pending = []
+        size = 0
+        while True:
+            line, _ = conn._getline()
+            if line == b".":
+                break
+            if line.startswith(b".."):
+                line = line[1:]  # byte-stuffed
+            pending.append(line + b"\r\n")
+            size += len(line) + 2
+            if size >= CHUNK_SIZE:
+                yield b"".join(pending)
+                pending, size = [], 0
+        if pending:
+            yield b"".join(pending)
+
+    def delete(self, keys):
+        for uid in keys:
+            self.conn.dele(self.numbers[uid])
+        self.close()
+
+    def wait(self, timeout):
+        self.close()
+        time.sleep(timeout)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.quit()
+            except (poplib.error_proto, OSError):
+                pass
+            self.conn = None
+
+
+class MaildirSource:
+    """A local Maildir standing in for the mail server (for testing)"""
+
+    name = "Maildir"
+
+    def __init__(self, path):
+        self.box = mailbox.Maildir(path, create=True)
+
+    def connect(self):
+        pass
+
+    def fetch(self, limit):
+        return sorted(self.box.iterkeys())[:limit]
+
+    def stream(self, key):
+        with self.box.get_file(key) as f:
+            yield from iter(lambda: f.read(CHUNK_SIZE), b"")
+
+    def delete(self, keys):
+        for key in keys:
+            self.box.discard(key)
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+
+def open_source(config, maildir=None):
+    if maildir:
+        source = MaildirSource(maildir)
+        source.connect()
+        return source
+
+    em = config["email"]
+    use_ssl = em.getboolean("SSL")
+    protocol = em["PROTOCOL"].lower()
+    if protocol in ("auto", "imap"):
+        source = ImapSource(em["SERVER"], em["USER"], em["PASS"], em["MAILBOX"], use_ssl,
+                            config["ingest"].getint("IDLE_TIMEOUT"))
+        try:
+            source.connect()
+            return source
+        except (imaplib.IMAP4.error, OSError) as e:
+            if protocol == "imap":
+                raise
+            log(f"IMAP unavailable ({e}); falling back to POP3 polling")
+    source = Pop3Source(em["SERVER"], em["USER"], em["PASS"], use_ssl)
+    source.connect()
+    return source
+
+
+# ---------------------------------------------------------------------------
+# Indexer notification
+# ---------------------------------------------------------------------------
+
+class Notifier:
+    """Tells the web app (POST /api/ingest) and the PWA bundle about new posts"""
+
+    def __init__(self, urls, rebuild_pwa):
+        self.urls = urls
+        self.rebuild_pwa = rebuild_pwa
+
+    def __call__(self, filenames):
+        if not filenames:
+            return
+        body = json.dumps({"files": filenames}).encode("utf-8")
+        for url in self.urls:
+            req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=10) as res:
+                    indexed = json.load(res).get("indexed", [])
+                log(f"{url}: indexed {len(indexed)} posts")
+            except (OSError, ValueError) as e:
+                # Not running is fine: the web app indexes everything at startup
+                log(f"{url}: not notified ({e})")
+        if self.rebuild_pwa and PWA_BUILD.exists():
+            result = subprocess.run([sys.executable, str(PWA_BUILD)], capture_output=True, text=True)
+            if result.returncode == 0:
+                log("rebuilt PWA data bundle")
+            else:
+                log(f"PWA data rebuild failed:\n{result.stdout}{result.stderr}")
+
+
+# ---------------------------------------------------------------------------
+# Main loop
+# ---------------------------------------------------------------------------
+
+def ingest_batch(source, keys, dirs, failed):
+    """Ingest one batch of messages; returns the post filenames written.
+
+    Messages are streamed and parsed one at a time, and only deleted from the
+    mailbox once their post is safely on disk. A message that cannot be
+    ingested stays in the mailbox and is skipped for the rest of this run.
+    """
+    written, done = [], []
+    for key in keys:
+        try:
+            msg = parse_message(source.stream(key))
+            filename, text, headerdate = message_to_post(msg)
+            saved = save_attachments(msg, Path(filename).stem, headerdate,
+                                     dirs["photos"], dirs["attachments"], dirs["photo_min_bytes"])
+            del msg
+            write_atomic(dirs["posts"] / filename, text)
+        except (imaplib.IMAP4.abort, poplib.error_proto, OSError):
+            raise  # connection trouble: reconnect and retry the message
+        except Exception as e:
+            log(f"could not ingest message {key!r}: {e}")
+            failed.add(key)
+            continue
+        log(f"wrote '{dirs['posts'] / filename}'" + (f" (+{len(saved)} files)" if saved else ""))
+        written.append(filename)
+        done.append(key)
+    source.delete(done)
+    if done:
+        log(f"deleted {len(done)} emails")
+    return written
+
+
+def run(config, maildir=None, once=False, notify=True):
+    ing = config["ingest"]
+    dirs = {
+        "posts": ROOT / ing["POSTS"],
+        "photos": ROOT / ing["PHOTOS"],
+        "attachments": ROOT / ing["ATTACHMENTS"],
+        "photo_min_bytes": ing.getint("PHOTO_MIN_KB") * 1024,
+    }
+    dirs["posts"].mkdir(parents=True, exist_ok=True)
+    batch_size = ing.getint("BATCH_SIZE")
+    poll_interval = ing.getint("POLL_INTERVAL")
+    notifier = Notifier(ing["NOTIFY"].split() if notify else [], notify and ing.getboolean("PWA"))
+
+    failed = set()
+    retry = RETRY_DELAY
+    source = None
+    while True:
+        try:
+            if source is None:
+                source = open_source(config, maildir)
+                log(f"connected ok to zoomail server ({source.name})")
+            keys = [k for k in source.fetch(batch_size + len(failed)) if k not in failed][:batch_size]
+            retry = RETRY_DELAY
+            if keys:
+                notifier(ingest_batch(source, keys, dirs, failed))
+                continue  # drain before waiting
+            if once:
+                break
+            source.wait(poll_interval)
+        except (imaplib.IMAP4.error, poplib.error_proto, OSError) as e:
+            if once:
+                raise
+            log(f"mail connection error: {e}; reconnecting in {retry}s")
+            if source is not None:
+                source.close()
+                source = None
+            time.sleep(retry)
+            retry = min(retry * 2, RETRY_MAX)
+    source.close()
+    print("finished with zoomail server")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest journal emails into posts/")
+    parser.add_argument("--config", default=str(ROOT / "zoomail.ini"), help="path to zoomail.ini")
+    parser.add_argument("--once", action="store_true", help="drain the mailbox once and exit")
+    parser.add_argument("--maildir", help="read this local Maildir instead of the mail server")
+    parser.add_argument("--no-notify", action="store_true", help="don't notify the web app or rebuild the PWA data")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read_dict(DEFAULTS)
+    config.read(args.config)
+    if not args.maildir and not all(config["email"].get(k) for k in ("USER", "PASS", "SERVER")):
+        parser.error(f"{args.config} needs USER, PASS and SERVER in [email] (or use --maildir)")
 
-    output = "\n".join(("# " + subject.replace("Re: ", ""), "", cleanedbody))
+    try:
+        run(config, maildir=args.maildir, once=args.once, notify=not args.no_notify)
+    except KeyboardInterrupt:
+        pass
+    return 0
 
-    filename = POSTS + "/" + stripsubject + "-" + headerdate + ".txt"
-    print(f"writing '{filename}'")
-    open(filename, "w").write(output)
-    pop.dele(mid)
-    print("deleted email " + str(mid))
 
-pop.quit()
-print("finished with zoomail server")
+if __name__ == "__main__":
+    raise SystemExit(main())